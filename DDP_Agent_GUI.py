@@ -1,30 +1,34 @@
 # DDP_Agent_GUI.py
 # THE FINAL STANDALONE AGENT APPLICATION (Simple, Stable Startup)
 
+# Wiping and certification live in ddp_wipe/agent.py (shared with the headless
+# `python -m ddp_wipe` CLI); this module is only the Tk front end.
+
 import tkinter as tk
 from tkinter import ttk, messagebox
-import subprocess # Essential for running the shell commands
-import requests # Required for cloud communication
-import json
 import time
-from hashlib import sha256
-import os
-from datetime import datetime
 import threading
 import platform 
 import sys 
+import queue
+import logging
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+from ddp_wipe import agent
+from ddp_wipe.agent import WIPE_ALGORITHMS, WipeAgent
 
 # --- CONFIGURATION (App is now truly universal) ---
-CLOUD_API_MINT_URL = "http://127.0.0.1:8080/api/v1/mint/local-wipe-and-mint/" 
+CLOUD_API_BATCH_URL = "http://127.0.0.1:8080/api/v1/mint/batch/" # The agent wipes locally; the hub only mints
 DEVICE_ID = "UNIVERSAL-AGENT-" + str(time.time()).replace('.', '')
 WIPE_TARGET_PATH = "/mnt/target/user_data/" 
-CERT_BACKUP_PATH = "/mnt/usb_drive/ddp_certificate_backup.json" 
-
-WIPE_ALGORITHMS = {
-    'NIST': {'name': 'NIST SP 800-88 Purge', 'passes': '1 Pass (Random)', 'description': 'Industry standard for modern drives (SSDs/HDDs).'},
-    'DOD': {'name': 'DoD 5220.22-M', 'passes': '3 Passes (Pattern)', 'description': 'Legacy military standard for maximum assurance on older HDDs.'},
-    'CE': {'name': 'Cryptographic Erase (CE)', 'passes': 'Key Destroy', 'description': 'Fastest, most secure wipe for encrypted storage (Android/SSDs).'},
-}
+WIPES_PER_CONTROLLER = 2 # Concurrent wipes per HBA/NVMe/USB controller; drives on one controller share its bandwidth
+# Outbox, autotune cache and checkpoint journals: see the paths in ddp_wipe/agent.py (USB stick, else ~)
+UI_PUMP_MS = 100 # Worker threads queue log/progress updates; the Tk loop applies them in one batch per tick
+UI_PUMP_MAX_ITEMS = 200 # UI calls per tick, so a burst of them can't stall the window (the rest waits a tick)
+CONSOLE_MAX_LINES = 1000 # Visible console is a ring buffer; the full log goes to the rotating file
+LOG_FILE_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUPS = 3
 # --- END CONFIGURATION ---
 
 # --- MAIN APPLICATION CLASS (The App) ---
@@ -34,14 +38,38 @@ class DDPWipeAgent(tk.Tk):
     def __init__(self):
         super().__init__()
         self.title("DDP Secure Wipe Agent")
-        self.geometry("600x680") 
+        self.geometry("640x820") 
         self.configure(bg='#f0f4f7')
         
         self.host_os = self._identify_system() 
+        # Only the Tk main loop touches widgets; everyone else queues. Console lines and
+        # drive rows are coalesced as they arrive, so a slow UI can't grow them without bound.
+        self.ui_queue = queue.SimpleQueue()
+        self._ui_lock = threading.Lock()
+        self._console_lines = deque(maxlen=CONSOLE_MAX_LINES)
+        self._console_dropped = 0
+        self._drive_rows = {}
+        self.file_log = self._open_log_file()
         
         # 1. BUILD THE UI ELEMENTS (Loads immediately)
         self._build_ui()
         self._set_initial_state()
+        self.after(UI_PUMP_MS, self._pump_ui_queue)
+
+        # 2. THE WIPE-AND-CERTIFY CORE (state on the USB stick when it's mounted)
+        self.agent = WipeAgent(
+            device_id=DEVICE_ID,
+            outbox_path=agent.OUTBOX_PATH,
+            hub_batch_url=CLOUD_API_BATCH_URL,
+            tune_cache_path=agent.usable_path(agent.AUTOTUNE_CACHE_PATH, agent.AUTOTUNE_FALLBACK_PATH),
+            journal_dir=agent.usable_path(agent.JOURNAL_DIR, agent.JOURNAL_FALLBACK_DIR),
+            wipes_per_controller=WIPES_PER_CONTROLLER,
+            log=self.log,
+        )
+
+        # 3. OPEN THE CERTIFICATE OUTBOX & START THE BACKGROUND RESYNC
+        self.agent.open_outbox(fallback_path=agent.OUTBOX_FALLBACK_PATH)
+        self.agent.flusher.start()
 
     # --- SYSTEM IDENTIFICATION LOGIC ---
     def _identify_system(self):
@@ -80,18 +108,21 @@ class DDPWipeAgent(tk.Tk):
         # 2. Drive Selection (Now for Partitions/Device Types)
         frame1 = ttk.Frame(self, padding="10 10 10 10")
         frame1.pack(fill='x')
-        ttk.Label(frame1, text="1. Select Target Partition/Drive:").pack(anchor='w', pady=5) 
-        self.drive_var = tk.StringVar(value="/dev/sda (Full Disk)")
-        drives = [
+        ttk.Label(frame1, text="1. Select Target Partitions/Drives (all selected are wiped together):").pack(anchor='w', pady=5) 
+        drives = self.drives = [
             ("Full Device Wipe (HDD/SSD)", "/dev/sda (Full Disk)"), 
+            ("Second Bay (HDD/SSD)", "/dev/sdb (Full Disk)"),
+            ("NVMe Drive", "/dev/nvme0n1 (Full Disk)"),
             ("Android eMMC Storage", "/dev/mmcblk0"),
             ("Windows C: Partition", "/dev/sda1"),
             ("Linux Root Partition", "/dev/sda2"),
         ]
-        self.drive_combo = ttk.Combobox(frame1, textvariable=self.drive_var, 
-                                        values=[name for name, id in drives], state='readonly')
-        self.drive_combo.current(0)
-        self.drive_combo.pack(fill='x', pady=5)
+        self.drive_list = tk.Listbox(frame1, selectmode=tk.MULTIPLE, exportselection=False,
+                                     height=len(drives), bg='white', fg='#111')
+        for name, _ in drives:
+            self.drive_list.insert(tk.END, name)
+        self.drive_list.selection_set(0)
+        self.drive_list.pack(fill='x', pady=5)
 
         # 3. Algorithm Selection (Refocused to Step 2)
         frame3 = ttk.Frame(self, padding="10 10 10 10")
@@ -128,7 +159,17 @@ class DDPWipeAgent(tk.Tk):
                                      state=tk.DISABLED) 
         self.btn_certify.pack(fill='x', pady=(5, 10), padx=10)
 
-        # 5. Output Console
+        # 5. Per-drive progress + station throughput
+        self.drive_table = ttk.Treeview(self, columns=('controller', 'state', 'progress', 'speed'), height=4)
+        for column, heading, width in (('#0', 'Drive', 160), ('controller', 'Controller', 170), ('state', 'State', 80),
+                                       ('progress', 'Progress', 110), ('speed', 'MB/s', 70)):
+            self.drive_table.heading(column, text=heading)
+            self.drive_table.column(column, width=width, anchor='w')
+        self.drive_table.pack(fill='x', padx=10, pady=(5, 0))
+        self.station_label = ttk.Label(self, text="Station throughput: idle", font=('Arial', 10, 'bold'))
+        self.station_label.pack(anchor='w', padx=10, pady=(2, 5))
+
+        # 6. Output Console
         self.output_text = tk.Text(self, height=8, bg='#333', fg='#00ff00', 
                                    font=('Consolas', 10), bd=0, relief='flat')
         self.output_text.pack(fill='both', expand=True, padx=10, pady=5)
@@ -143,9 +184,72 @@ class DDPWipeAgent(tk.Tk):
         algo = next((a for a in WIPE_ALGORITHMS.values() if a['name'] == selected_name), WIPE_ALGORITHMS['NIST'])
         self.algo_info_label.config(text=f"Passes: {algo['passes']} | {algo['description']}")
 
+    def _selected_drives(self):
+        """[(display name, device path)] for the drives picked in the list."""
+        return [(self.drives[i][0], self.drives[i][1].split()[0]) for i in self.drive_list.curselection()]
+
+    def _open_log_file(self):
+        file_log = logging.getLogger('ddp_agent')
+        file_log.setLevel(logging.INFO)
+        file_log.propagate = False
+        for path in (agent.usable_path(agent.LOG_PATH, agent.LOG_FALLBACK_PATH), agent.LOG_FALLBACK_PATH):
+            try:
+                handler = RotatingFileHandler(path, maxBytes=LOG_FILE_BYTES, backupCount=LOG_FILE_BACKUPS, encoding='utf-8')
+            except OSError as e:
+                print(f"Agent log file {path} unavailable: {e}")
+                continue
+            handler.setFormatter(logging.Formatter('%(asctime)s %(threadName)s %(message)s'))
+            file_log.addHandler(handler)
+            break
+        return file_log
+
     def log(self, message):
-        self.output_text.insert(tk.END, message + "\n")
-        self.output_text.see(tk.END)
+        """Safe from any thread: written to the log file now, shown by the next UI pump."""
+        self.file_log.info(message)
+        with self._ui_lock:
+            if len(self._console_lines) == CONSOLE_MAX_LINES:
+                self._console_dropped += 1 # Would scroll out of the console before it is shown
+            self._console_lines.append(message)
+
+    def _ui_call(self, func, *args):
+        """Runs func(*args) on the Tk main loop (dialogs, buttons) from a worker thread."""
+        self.ui_queue.put(('call', func, args))
+
+    def _pump_ui_queue(self):
+        """Applies queued updates in one batch: one console insert, the latest state per drive row."""
+        self.after(UI_PUMP_MS, self._pump_ui_queue) # First: a modal dialog below must not stop the pump
+        with self._ui_lock:
+            lines, dropped = list(self._console_lines), self._console_dropped
+            rows = self._drive_rows
+            self._console_lines.clear()
+            self._console_dropped = 0
+            self._drive_rows = {}
+        for _ in range(UI_PUMP_MAX_ITEMS):
+            try:
+                _, func, args = self.ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.after_idle(self._run_ui_call, func, args) # Dialogs run after the pump has returned
+
+        if dropped:
+            lines.insert(0, f"… {dropped} line(s) not shown; see the log file.")
+        if lines:
+            self.output_text.insert(tk.END, "\n".join(lines) + "\n")
+            excess = int(self.output_text.index('end-1c').split('.')[0]) - 1 - CONSOLE_MAX_LINES
+            if excess > 0:
+                self.output_text.delete('1.0', f'{excess + 1}.0')
+            self.output_text.see(tk.END)
+        for target, values in rows.items():
+            if self.drive_table.exists(target):
+                self.drive_table.item(target, values=values)
+        if rows and self.agent.scheduler is not None:
+            self.station_label.config(text=f"Station throughput: {self.agent.scheduler.throughput() / 1e6:.1f} MB/s")
+
+    def _run_ui_call(self, func, args):
+        try:
+            func(*args)
+        except Exception as e:
+            print(f"UI update failed: {e}")
         
     # --- STEP 1 LOGIC ---
     def step1_delete_files(self):
@@ -154,7 +258,7 @@ class DDPWipeAgent(tk.Tk):
         if not messagebox.askyesno("Confirmation", "Permanently delete ALL user files on the selected drive? This clears files before wiping residue."):
             return
 
-        self.log(f"Simulating mounting and deleting all files on {self.drive_combo.get()}...")
+        self.log(f"Simulating mounting and deleting all files on {', '.join(name for name, _ in self._selected_drives())}...")
         
         time.sleep(1) 
         self.log(f"✅ SUCCESS: All files deleted.")
@@ -165,98 +269,73 @@ class DDPWipeAgent(tk.Tk):
         
     # --- WIPE THREAD STARTER ---
     def _start_wipe_thread(self):
-        selected_drive_name = self.drive_combo.get()
+        selected = self._selected_drives()
+        if not selected:
+            messagebox.showwarning("No Drive Selected", "Select at least one drive to wipe.")
+            return
+        names = "\n".join(f"  • {name} ({path})" for name, path in selected)
         if not messagebox.askyesno("FINAL WARNING: IRREVERSIBLE ACTION", 
-                                   f"You are about to securely wipe: {selected_drive_name}.\n\nALL DATA WILL BE DESTROYED. PROCEED?"):
+                                   f"You are about to securely wipe {len(selected)} drive(s):\n{names}\n\nALL DATA WILL BE DESTROYED. PROCEED?"):
             return
         
         self.btn_certify.config(state=tk.DISABLED)
         self.btn_delete.config(state=tk.DISABLED)
+        self.drive_table.delete(*self.drive_table.get_children())
+        for name, path in selected:
+            self.drive_table.insert('', tk.END, iid=path, text=name, values=('', 'queued', '', ''))
         
-        wipe_thread = threading.Thread(target=self.execute_full_wipe)
+        algorithm_name = self.algo_var.get() # Tk variables are read on the main loop only
+        wipe_thread = threading.Thread(target=self.execute_full_wipe, args=(selected, algorithm_name))
         wipe_thread.start()
 
-    # --- EXECUTION LOGIC (The Core Wipe) ---
-    def execute_full_wipe(self):
+    # --- EXECUTION LOGIC (The Core Wipe, every selected drive at once) ---
+    def execute_full_wipe(self, selected, algorithm_name):
         self.log("\n--- EXECUTING FULL DATA DESTRUCTION & CERTIFICATION ---")
 
-        selected_drive_name = self.drive_combo.get()
-        algorithm_name = self.algo_var.get()
-        target_path_id = selected_drive_name.split()[0] 
+        algorithm_key = next((k for k, a in WIPE_ALGORITHMS.items() if a['name'] == algorithm_name), 'NIST')
+        self.queued_for_minting = []
         
-        self.log(f"Wiping Target: {selected_drive_name} ({target_path_id}) using {algorithm_name}...")
+        self.log(f"Wiping {len(selected)} drive(s) using {algorithm_name} "
+                 f"(at most {WIPES_PER_CONTROLLER} at a time per controller)...")
         self.log("⏳ Executing IRREVERSIBLE wipe. DO NOT POWER OFF.")
 
-        # SIMULATION CODE
-        try:
-            time.sleep(5) 
-            wipe_status = "SUCCESS"
-            wipe_log = f"Full wipe executed using {algorithm_name} on {selected_drive_name}. Verification passed."
-            self.log(f"✅ VERIFICATION: Wipe completed successfully.")
-            
-        except subprocess.CalledProcessError as e:
-            wipe_status = "FAILURE"
-            wipe_log = f"Secure Wipe Shell Command Failed: {e.stderr.decode() or 'No error output.'}"
-            self.log(f"❌ FAILURE: Wipe failed. {log_data}")
-            
-        # --- PROCEED TO CERTIFICATION ---
-        self._certify_wipe(wipe_status, wipe_log, selected_drive_name, algorithm_name)
-
-    # --- CERTIFICATION LOGIC ---
-    def _certify_wipe(self, status, log_data, drive_name, algo_name):
-        
-        cert_data = {
-            "imei_serial": f"{DEVICE_ID}-{drive_name.split()[0].replace('/', '')}",
-            "wipe_status": status,
-            "wipe_standard": algo_name,
-            "verification_log": log_data,
-            "timestamp": datetime.now().isoformat(),
-        }
-        
-        json_string = json.dumps(cert_data, sort_keys=True)
-        dlt_hash = sha256(json_string.encode('utf-8')).hexdigest()
-        cert_data['dlt_hash'] = dlt_hash
-        
-        self.log(f"\n[CERT] Local Hash Generated: {dlt_hash[:16]}...")
-        
-        # 2. LOCAL BACKUP (Saves the certificate to the pendrive)
         try:
-            with open(CERT_BACKUP_PATH, 'w') as f:
-                json.dump(cert_data, f, indent=4)
-            self.log(f"💾 Backup saved to USB: {CERT_BACKUP_PATH}")
-        except Exception as e:
-            self.log(f"❌ ERROR: Could not save local backup! {e}")
+            station = self.agent.run(selected, algorithm_key, on_progress=self._show_drive, on_finished=self._finish_drive)
+        except ValueError as e:
+            self.log(f"❌ FAILURE: {e}")
+            self._ui_call(self.btn_certify.config, {'state': tk.NORMAL})
+            return
 
-        # 3. CLOUD MINTING (Simulates talking to the cloud API)
-        if status == "SUCCESS":
-            self.log("[API] Attempting to mint passport on Cloud Server...")
-            try:
-                response = requests.post(CLOUD_API_MINT_URL, json=cert_data, timeout=20)
-                
-                if response.status_code == 201:
-                    self.log(f"✅ CERTIFIED: DDP Minted! (Cloud Record CONFIRMED)")
-                    messagebox.showinfo("Success", "Certification COMPLETE. Ready to reboot.")
-                else:
-                    self.log(f"⚠️ CLOUD FAILURE: Status {response.status_code}. Record saved locally.")
-                    messagebox.showwarning("Warning", "Certification saved locally only. Cloud connection failed.")
-
-            except requests.exceptions.ConnectionError:
-                self.log("❌ CLOUD OFFLINE: Certification saved locally. Cannot connect to API.")
-                messagebox.showwarning("Warning", "Server Offline. Certification saved locally only.")
-        
-        self.btn_certify.config(state=tk.NORMAL)
+        self.log(f"\n📊 STATION: {station.summary()}")
+        self._ui_call(self.station_label.config, {'text': f"Station throughput: {station.throughput / 1e6:.1f} MB/s "
+                                                          f"({station.bytes_written / 1e9:.2f} GB in {station.seconds:.0f} s)"})
+        if self.queued_for_minting:
+            self.log("[API] Certificates queued for minting; syncing in the background...")
+            self.agent.flusher.kick()
+            self._ui_call(messagebox.showinfo, "Success",
+                          f"{len(self.queued_for_minting)} of {len(selected)} certificate(s) saved. "
+                          "They will be minted as soon as the hub is reachable.")
+        self._ui_call(self.btn_certify.config, {'state': tk.NORMAL})
+
+    def _show_drive(self, job):
+        progress = job.progress
+        label = f"{job.percent:.1f}%" + (f" (pass {progress.pass_index}/{progress.pass_count})" if progress else "")
+        speed = f"{progress.throughput / 1e6:.1f}" if progress else ""
+        with self._ui_lock:
+            self._drive_rows[job.target] = (job.controller, job.state, label, speed) # Reports supersede each other
+
+    def _finish_drive(self, job, cert, queued):
+        """Called as soon as one drive is wiped and certified (the others keep running)."""
+        self._show_drive(job)
+        if cert is None:
+            self._ui_call(messagebox.showerror, "Error", f"Certificate for {job.target} could NOT be saved locally. Do not reboot.")
+        elif queued:
+            self.queued_for_minting.append(job.target)
 
 
 if __name__ == "__main__":
     
-    # 1. Check for shell access
-    try:
-        subprocess.run("echo", shell=True, check=True)
-    except Exception:
-        messagebox.showerror("Setup Error", "Failed to start shell interpreter. Check Python configuration.")
-        sys.exit(1)
-
-    # 2. Start the App
+    # Start the App (the wipe engine needs no shell; headless runs use `python -m ddp_wipe`)
     try:
         app = DDPWipeAgent()
         app.mainloop()
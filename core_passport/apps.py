@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CorePassportConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core_passport'
+
+    def ready(self):
+        from . import signals  # noqa: F401 -- registers cache invalidation and query metrics receivers
@@ -0,0 +1,168 @@
+# core_passport/audit.py
+#
+# Ledger integrity audit: recomputes every chain_hash, checks each prev_hash
+# link and each stored Merkle leaf.
+#
+# Rows are streamed from the database in leaf order, cut into chunks, and the
+# hashing runs on a process pool. Workers get plain tuples and only import
+# hashing.py, so they need no Django setup and no database connection. Chunk
+# results are folded back in order, which lets the caller checkpoint the last
+# fully audited leaf and resume an interrupted audit from there.
+
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from hashlib import sha256
+
+from .hashing import HASH_VERSION, canonical_payload, chain_hash
+
+CHUNK_SIZE = 5000
+MAX_REPORTED_PROBLEMS = 1000
+
+ROW_FIELDS = (
+    'leaf_index', 'imei_serial', 'mint_date', 'is_certified', 'wipe_standard', 'prev_hash',
+    'verification_coverage', 'verification_mismatches', 'verification_digest',
+    'chain_hash', 'hash_version',
+)
+
+
+def audit_chunk(rows, prev_chain_hash, leaf_hashes, seen_v2=False):
+    """Pure worker: checks one chunk of ROW_FIELDS tuples.
+
+    `prev_chain_hash` is the chain_hash of the row before the chunk ('' at the
+    genesis); `leaf_hashes` maps leaf_index -> stored level-0 Merkle hash (hex);
+    `seen_v2` says whether any earlier leaf was already hashed at HASH_VERSION.
+    Returns (checked, legacy, problems, seen_v2) where problems are
+    (leaf_index, imei, kind).
+    """
+    checked = legacy = 0
+    problems = []
+    for (leaf_index, imei, mint_date, certified, standard, prev, coverage, mismatches, digest,
+         stored_hash, version) in rows:
+        checked += 1
+        if prev != prev_chain_hash:
+            problems.append((leaf_index, imei, 'broken_link'))
+        if version == HASH_VERSION:
+            seen_v2 = True
+            payload = canonical_payload(imei, mint_date, certified, standard, prev, coverage, mismatches, digest)
+            if chain_hash(payload) != stored_hash:
+                problems.append((leaf_index, imei, 'hash_mismatch'))
+        elif version == 1 and not seen_v2:
+            legacy += 1  # version 1 hashed an unstored timestamp; only its link can be checked
+        else:
+            # Minting never goes back to version 1, so a legacy leaf after the first
+            # version 2 leaf is a relabelled one hiding an unverifiable edit
+            problems.append((leaf_index, imei, 'version_downgrade'))
+        expected_leaf = sha256(b'\x00' + bytes.fromhex(stored_hash)).hexdigest()
+        if leaf_hashes.get(leaf_index) != expected_leaf:
+            problems.append((leaf_index, imei, 'merkle_leaf_mismatch'))
+        prev_chain_hash = stored_hash
+    return checked, legacy, problems, seen_v2
+
+
+@dataclass
+class AuditState:
+    """Running totals; also the checkpoint file's content."""
+    last_leaf_index: int = -1
+    last_chain_hash: str = ''
+    checked: int = 0
+    legacy: int = 0
+    seen_v2: bool = False
+    problem_count: int = 0
+    problems: list = field(default_factory=list)
+
+    def fold(self, last_row, result):
+        checked, legacy, problems, seen_v2 = result
+        self.seen_v2 = self.seen_v2 or seen_v2
+        self.checked += checked
+        self.legacy += legacy
+        self.problem_count += len(problems)
+        room = MAX_REPORTED_PROBLEMS - len(self.problems)
+        self.problems.extend(list(p) for p in problems[:max(room, 0)])
+        self.last_leaf_index = last_row[0]
+        self.last_chain_hash = last_row[9]
+
+    @property
+    def ok(self):
+        return self.problem_count == 0
+
+    def save(self, path):
+        """Atomically replaces the checkpoint file."""
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(asdict(self), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(**json.load(f))
+
+
+def iter_chunks(after_leaf_index=-1, chunk_size=CHUNK_SIZE):
+    """(rows, leaf_hashes) per chunk of ledgered passports, in leaf order."""
+    from .models import DigitalPassport, MerkleNode  # Local import: workers never load the ORM
+
+    rows = (
+        DigitalPassport.objects.filter(leaf_index__gt=after_leaf_index)
+        .order_by('leaf_index').values_list(*ROW_FIELDS).iterator(chunk_size=chunk_size)
+    )
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk, _leaf_hashes(MerkleNode, chunk)
+            chunk = []
+    if chunk:
+        yield chunk, _leaf_hashes(MerkleNode, chunk)
+
+
+def _leaf_hashes(MerkleNode, chunk):
+    return dict(
+        MerkleNode.objects.filter(level=0, index__range=(chunk[0][0], chunk[-1][0])).values_list('index', 'hash')
+    )
+
+
+def run_audit(state=None, workers=None, chunk_size=CHUNK_SIZE, on_chunk=None):
+    """Audits every leaf after `state.last_leaf_index`; returns the final AuditState.
+
+    `workers` <= 1 audits inline. `on_chunk(state)` runs after each chunk is
+    folded in (e.g. to write a checkpoint).
+    """
+    state = state or AuditState()
+    chunks = iter_chunks(state.last_leaf_index, chunk_size)
+
+    if workers is not None and workers <= 1:
+        prev = state.last_chain_hash
+        for rows, leaves in chunks:
+            state.fold(rows[-1], audit_chunk(rows, prev, leaves, state.seen_v2))
+            prev = rows[-1][9]
+            if on_chunk:
+                on_chunk(state)
+        return state
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+        max_in_flight = 2 * workers  # bounds memory: never more than this many chunks loaded
+        prev, seen_v2 = state.last_chain_hash, state.seen_v2
+        for rows, leaves in chunks:
+            in_flight.append((rows[-1], pool.submit(audit_chunk, rows, prev, leaves, seen_v2)))
+            prev = rows[-1][9]
+            seen_v2 = seen_v2 or any(row[10] == HASH_VERSION for row in rows)
+            while len(in_flight) >= max_in_flight:
+                _fold_next(state, in_flight, on_chunk)
+        while in_flight:
+            _fold_next(state, in_flight, on_chunk)
+    return state
+
+
+def _fold_next(state, in_flight, on_chunk):
+    last_row, future = in_flight.popleft()
+    state.fold(last_row, future.result())
+    if on_chunk:
+        on_chunk(state)
@@ -0,0 +1,187 @@
+# core_passport/benchmarks.py
+#
+# Load-test scenarios for the hub API, driven through the Django test client.
+#
+# Each scenario fires requests from N worker threads (each thread gets its own
+# DB connection, like a threaded server would) and reports latency
+# percentiles, requests per second, query counts and the status mix as a
+# JSON-ready dict. Run them with `manage.py benchmark`, which builds a
+# throwaway test database first, so the numbers compare backends (whatever
+# DATABASES points at) and releases, not the data in the live ledger.
+
+import math
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from .models import DigitalPassport, EventLog
+
+MINT_URL = '/api/v1/mint/'
+DETAIL_URL = '/api/v1/view/{imei}/'
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples, elapsed):
+    """samples: [(seconds, queries, status), ...] -> stats dict (latencies in ms)."""
+    latencies = sorted(s[0] * 1000 for s in samples)
+    queries = [s[1] for s in samples]
+    return {
+        "requests": len(samples),
+        "seconds": round(elapsed, 4),
+        "rps": round(len(samples) / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            "p50": _round(percentile(latencies, 50)),
+            "p95": _round(percentile(latencies, 95)),
+            "p99": _round(percentile(latencies, 99)),
+            "max": _round(latencies[-1] if latencies else None),
+        },
+        "queries": {
+            "mean": round(sum(queries) / len(queries), 2) if queries else None,
+            "max": max(queries, default=None),
+        },
+        "statuses": {str(code): n for code, n in sorted(Counter(s[2] for s in samples).items())},
+    }
+
+
+def _round(value):
+    return round(value, 3) if value is not None else None
+
+
+def _timed(client, method, url, **kwargs):
+    with CaptureQueriesContext(connection) as queries:  # `connection` is this thread's own
+        started = time.perf_counter()
+        response = getattr(client, method)(url, **kwargs)
+        seconds = time.perf_counter() - started
+    return seconds, len(queries), response.status_code
+
+
+def drive(calls, workers):
+    """Runs every zero-arg callable in `calls` on `workers` threads; returns (samples, elapsed)."""
+    local = threading.local()
+
+    def run(call):
+        if not hasattr(local, 'client'):
+            local.client = Client(raise_request_exception=False)  # a 500 is a result, not a crash
+        return call(local.client)
+
+    started = time.perf_counter()
+    if workers <= 1:
+        samples = [run(call) for call in calls]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ddp-bench') as pool:
+            samples = list(pool.map(_closing(run), calls))
+    return samples, time.perf_counter() - started
+
+
+def _closing(fn):
+    """Worker threads own their connection; close it when the thread's work is done."""
+    def wrapper(call):
+        try:
+            return fn(call)
+        finally:
+            connection.close()
+    return wrapper
+
+
+def _mint_body(imei):
+    return {
+        "imei_serial": imei,
+        "wipe_status": "SUCCESS",
+        "wipe_standard": "NIST SP 800-88 Purge",
+        "verification_log": "benchmark",
+    }
+
+
+# --- SCENARIOS ---
+
+def mint_throughput(requests=500, workers=4, conflict_rate=0.2):
+    """Mints fresh IMEIs with `conflict_rate` of the requests re-sending an already minted one."""
+    run_id = uuid.uuid4().hex[:8]
+    fresh = max(1, round(requests * (1 - conflict_rate)))
+    imeis = [f"BENCH-{run_id}-{i}" for i in range(fresh)]
+    # Conflicts point at IMEIs minted earlier in the list, so most hit an existing row
+    imeis += [imeis[i % fresh] for i in range(requests - fresh)]
+
+    calls = [
+        (lambda client, imei=imei: _timed(client, 'post', MINT_URL, data=_mint_body(imei), content_type='application/json'))
+        for imei in imeis
+    ]
+    samples, elapsed = drive(calls, workers)
+    result = summarize(samples, elapsed)
+    result.update({"workers": workers, "conflict_rate": conflict_rate})
+    return result
+
+
+def detail_latency(history_sizes=(0, 100, 1000), requests=100, workers=4):
+    """Passport page latency as the event history grows, cold (cache cleared) and warm."""
+    results = []
+    for size in history_sizes:
+        passport = DigitalPassport.objects.create(
+            imei_serial=f"BENCH-DETAIL-{uuid.uuid4().hex[:8]}-{size}", wipe_standard="benchmark", is_certified=True,
+        )
+        EventLog.objects.bulk_create(
+            EventLog(passport=passport, event_type="REPAIR", event_data={"description": f"event {i}"})
+            for i in range(size)
+        )
+        url = DETAIL_URL.format(imei=passport.imei_serial)
+
+        def cold(client):
+            cache.clear()
+            return _timed(client, 'get', url)
+
+        cold_samples, cold_elapsed = drive([cold] * requests, workers)
+        warm_samples, warm_elapsed = drive([lambda client: _timed(client, 'get', url)] * requests, workers)
+        results.append({
+            "events": size,
+            "cold": summarize(cold_samples, cold_elapsed),
+            "warm": summarize(warm_samples, warm_elapsed),
+        })
+    return {"workers": workers, "history": results}
+
+
+def mint_race(rounds=20, workers=8):
+    """`workers` threads mint the same IMEI at the same instant, `rounds` times.
+
+    Exactly one 201 per round is correct; anything else is a race (double
+    mint) or an unhandled error (500).
+    """
+    run_id = uuid.uuid4().hex[:8]
+    samples, bad_rounds = [], 0
+    started = time.perf_counter()
+    for round_no in range(rounds):
+        imei = f"BENCH-RACE-{run_id}-{round_no}"
+        barrier = threading.Barrier(workers)
+
+        def racer(client, imei=imei, barrier=barrier):
+            barrier.wait()
+            return _timed(client, 'post', MINT_URL, data=_mint_body(imei), content_type='application/json')
+
+        round_samples, _ = drive([racer] * workers, workers)
+        samples += round_samples
+        minted = sum(1 for s in round_samples if s[2] == 201)
+        if minted != 1 or DigitalPassport.objects.filter(imei_serial=imei).count() != 1:
+            bad_rounds += 1
+    result = summarize(samples, time.perf_counter() - started)
+    result.update({"workers": workers, "rounds": rounds, "bad_rounds": bad_rounds})
+    return result
+
+
+SCENARIOS = {
+    'mint': mint_throughput,
+    'detail': detail_latency,
+    'race': mint_race,
+}
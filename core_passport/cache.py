@@ -0,0 +1,38 @@
+# core_passport/cache.py
+#
+# Server-side cache of rendered passport detail pages.
+#
+# A passport never changes after minting; only new EventLog rows change its
+# page. The rendered HTML is cached together with its validators (ETag and
+# Last-Modified) so a repeat view - conditional or not - costs no queries.
+# Anything that writes events must call invalidate_passport_detail()
+# (signals.py does it for save()/delete(); bulk paths call it directly).
+
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import quote_etag
+
+
+def detail_cache_key(imei_serial):
+    # Hash the serial: cache backends such as memcached reject spaces/control characters in keys
+    return "ddp:passport-detail:" + sha256(imei_serial.encode('utf-8')).hexdigest()
+
+
+def make_etag(chain_hash, last_event):
+    """Strong ETag from the immutable chain hash plus the newest event timestamp."""
+    stamp = last_event.isoformat() if last_event else ''
+    return quote_etag(sha256(f"{chain_hash}|{stamp}".encode('utf-8')).hexdigest()[:32])
+
+
+def get_detail_page(imei_serial):
+    return cache.get(detail_cache_key(imei_serial))
+
+
+def set_detail_page(imei_serial, entry):
+    cache.set(detail_cache_key(imei_serial), entry, getattr(settings, 'DDP_DETAIL_CACHE_TIMEOUT', 3600))
+
+
+def invalidate_passport_detail(imei_serials):
+    cache.delete_many([detail_cache_key(imei) for imei in imei_serials])
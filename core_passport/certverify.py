@@ -0,0 +1,154 @@
+# core_passport/certverify.py
+#
+# Offline, parallel verification of exported passport certificates.
+#
+#   python -m core_passport.certverify ledger.ndjson[.gz] --public-key hub_key.pem [--workers 8]
+#
+# Takes an NDJSON export (manage.py export_ledger, or /api/v1/ledger/export/)
+# and the hub's public key (/api/v1/ledger/signing-key/). For every record it
+# recomputes the chain hash from the exported fields and checks the Ed25519
+# signature over it. No Django, no database and no network: a buyer can
+# check a whole resale lot on a laptop. Needs the `cryptography` package.
+
+import argparse
+import gzip
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from core_passport.hashing import HASH_VERSION, canonical_payload, chain_hash, key_id, signed_message
+
+CHUNK_SIZE = 2000
+
+_public_key = None  # per worker process
+
+
+def load_public_key(data):
+    """Accepts a PEM public key, or the 64-char hex of the raw key."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+
+    text = data.strip()
+    if len(text) == 64 and all(c in '0123456789abcdefABCDEF' for c in text):
+        return Ed25519PublicKey.from_public_bytes(bytes.fromhex(text))
+    key = serialization.load_pem_public_key(data.encode('ascii') if isinstance(data, str) else data)
+    if not isinstance(key, Ed25519PublicKey):
+        raise ValueError("Not an Ed25519 public key.")
+    return key
+
+
+def _init_worker(key_text):
+    global _public_key
+    _public_key = load_public_key(key_text)
+
+
+def check_record(record, public_key, expected_key_id):
+    """Returns None when the certificate is valid, else the reason it is not."""
+    stored = record.get('chain_hash') or ''
+    version = record.get('hash_version')
+    if version not in (1, HASH_VERSION):
+        return f'malformed: unknown hash_version {version!r}'
+    if version != HASH_VERSION and record.get('signature'):
+        # Signing came after version 2, and the signature covers only chain_hash:
+        # a "legacy" signed record is a relabelled one whose fields can't be checked
+        return 'version_downgrade'
+    if version == HASH_VERSION:
+        payload = canonical_payload(
+            record['imei_serial'], datetime.fromisoformat(record['mint_date']), record['is_certified'],
+            record['wipe_standard'], record['prev_hash'], record.get('verification_coverage'),
+            record.get('verification_mismatches'), record.get('verification_digest') or '',
+        )
+        if chain_hash(payload) != stored:
+            return 'hash_mismatch'
+    signature = record.get('signature')
+    if not signature:
+        return 'unsigned'
+    if record.get('signing_key_id') and record['signing_key_id'] != expected_key_id:
+        return 'other_key'
+    from cryptography.exceptions import InvalidSignature
+    try:
+        public_key.verify(bytes.fromhex(signature), signed_message(stored))
+    except (InvalidSignature, ValueError):
+        return 'bad_signature'
+    return None
+
+
+def check_chunk(records, expected_key_id):
+    """Worker: [(imei, reason)] for every invalid record in the chunk."""
+    problems = []
+    for record in records:
+        try:
+            reason = check_record(record, _public_key, expected_key_id)
+        except (KeyError, TypeError, ValueError) as e:
+            reason = f'malformed: {e}'
+        if reason:
+            problems.append((record.get('imei_serial'), reason))
+    return len(records), problems
+
+
+def iter_chunks(path, chunk_size=CHUNK_SIZE):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        chunk = []
+        for line in f:
+            if line.strip():
+                chunk.append(json.loads(line))
+                if len(chunk) == chunk_size:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+
+
+def iter_results(path, key_text, workers=None, chunk_size=CHUNK_SIZE):
+    """Yields (checked, [(imei, reason), ...]) per chunk of an NDJSON export, in file order.
+
+    Chunks are read only as workers free up (at most 2 per worker in flight, as
+    in audit.run_audit), so memory stays bounded whatever the export size.
+    """
+    from cryptography.hazmat.primitives import serialization
+    raw = load_public_key(key_text).public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+    expected = key_id(raw)
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(key_text,)) as pool:
+        in_flight = deque()
+        max_in_flight = 2 * workers
+        for chunk in iter_chunks(path, chunk_size):
+            in_flight.append(pool.submit(check_chunk, chunk, expected))
+            while len(in_flight) >= max_in_flight:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def verify_file(path, key_text, workers=None, chunk_size=CHUNK_SIZE):
+    """(checked, [(imei, reason), ...]) for an NDJSON export, verified on `workers` processes."""
+    checked, problems = 0, []
+    for n, found in iter_results(path, key_text, workers, chunk_size):
+        checked += n
+        problems.extend(found)
+    return checked, problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify exported Digital Passport certificates offline.")
+    parser.add_argument('export', help="NDJSON ledger export (optionally .gz).")
+    parser.add_argument('--public-key', required=True, help="Hub public key file (PEM or raw hex).")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    with open(args.public_key) as f:
+        key_text = f.read()
+    checked, problems = verify_file(args.export, key_text, args.workers, args.chunk_size)
+    for imei, reason in problems:
+        print(f"INVALID {imei}: {reason}")
+    print(f"{checked} certificate(s) checked, {checked - len(problems)} valid, {len(problems)} invalid.")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,250 @@
+# core_passport/coalescer.py
+#
+# Group commit for single-mint requests.
+#
+# With SQLite every write transaction takes the database-wide lock, so N
+# agents minting at once means N serialized commits (and N fsyncs), and the
+# slowest callers time out with "database is locked". Instead, the first
+# request to arrive becomes the leader: it waits a few milliseconds for
+# concurrent requests to join, then commits the whole group with one
+# ledger.append() and hands every follower its own outcome. There is no
+# background thread; whichever request thread leads does the work.
+#
+# Requests may carry an Idempotency-Key header. The outcome of a successful
+# mint is stored under the key in the same transaction, so an agent retrying
+# after a timeout gets the original 201 replayed instead of a 409.
+#
+# Helps threaded servers (runserver, gunicorn --threads). Under ASGI, sync
+# views share one thread, so a leader only ever commits its own request.
+
+import json
+import threading
+import time
+from datetime import timedelta
+from hashlib import sha256
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import ledger
+from .models import DigitalPassport, IdempotencyKey
+from .serializers import PassportMintSerializer
+
+CREATED, CONFLICT, FAILED = 'created', 'conflict', 'failed'
+REPLAY, KEY_REUSED = 'replay', 'key_reused'  # Idempotency-Key outcomes
+
+
+class _Slot:
+    __slots__ = ('item', 'outcome', 'done')
+
+    def __init__(self, item):
+        self.item = item
+        self.outcome = None
+        self.done = threading.Event()
+
+
+class Coalescer:
+    """Leader/follower batching of `commit(items) -> [outcome, ...]` calls.
+
+    `window` is how long a leader waits for followers (seconds); a group
+    reaching `max_batch` is flushed at once. Groups commit one at a time, so
+    requests arriving during a commit form the next group.
+    """
+
+    def __init__(self, commit, window=0.002, max_batch=200):
+        self.commit = commit
+        self.window = window
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._commit_lock = threading.Lock()
+        self._pending = []
+        self._gathering = False  # a leader is waiting for followers
+        self._full = threading.Event()
+
+    def submit(self, item):
+        """Queues `item`, waits for its group to commit and returns its own outcome."""
+        slot = _Slot(item)
+        with self._lock:
+            self._pending.append(slot)
+            leader = not self._gathering
+            if leader:
+                self._gathering = True
+            elif len(self._pending) >= self.max_batch:
+                self._full.set()
+
+        if not leader:
+            slot.done.wait()
+            return slot.outcome
+
+        self._full.wait(self.window)
+        with self._commit_lock:  # the previous group may still be committing; keep gathering meanwhile
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._gathering = False
+                self._full.clear()
+            self._run(batch)
+        return slot.outcome
+
+    def _run(self, batch):
+        try:
+            outcomes = self.commit([slot.item for slot in batch])
+            for slot, outcome in zip(batch, outcomes):
+                slot.outcome = outcome
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0].outcome = (FAILED, str(e))
+            else:
+                print(f"Coalesced mint of {len(batch)} failed ({e}); retrying one by one.")
+                for slot in batch:  # one bad item must not fail everyone else's mint
+                    self._run([slot])
+        finally:
+            for slot in batch:
+                slot.done.set()
+
+
+class MintRequest(NamedTuple):
+    data: dict  # PassportMintSerializer.validated_data
+    key: str = ''  # hash_key() of the Idempotency-Key header, if any
+    fingerprint: str = ''
+
+
+def hash_key(raw_key):
+    return sha256(raw_key.encode('utf-8')).hexdigest()
+
+
+def fingerprint(validated_data):
+    return sha256(json.dumps(validated_data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def created_body(passport):
+    return {
+        "message": "Digital Passport Minted Successfully.",
+        "imei": passport.imei_serial,
+        "passport_hash": passport.chain_hash,
+        "signature": passport.signature,
+        "signing_key_id": passport.signing_key_id,
+    }
+
+
+def commit_mints(requests):
+    """Mints a group of MintRequests in one transaction; returns one outcome per request.
+
+    Outcomes: (CREATED, passport), (CONFLICT, None), (REPLAY, IdempotencyKey)
+    or (KEY_REUSED, None). The first occurrence of a serial in the group
+    wins, like the batch endpoint. The lookups and the insert share one
+    (IMMEDIATE, on SQLite) transaction; elsewhere the unique constraint
+    turns a lost race into a 409, not an error.
+    """
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            outcomes = _commit(requests, now)
+    except IntegrityError:
+        if len(requests) == 1 and DigitalPassport.objects.filter(imei_serial=requests[0].data['imei_serial']).exists():
+            return [(CONFLICT, None)]
+        raise
+    _purge_expired_keys(now)
+    return outcomes
+
+
+def _commit(requests, now):
+    stored = {}
+    keys = {r.key for r in requests if r.key}
+    if keys:
+        expired = []
+        for row in IdempotencyKey.objects.filter(key__in=keys):
+            if row.expires_at > now:
+                stored[row.key] = row
+            else:
+                expired.append(row.key)
+        if expired:
+            IdempotencyKey.objects.filter(key__in=expired).delete()
+
+    existing = set(
+        DigitalPassport.objects.filter(imei_serial__in={r.data['imei_serial'] for r in requests})
+        .values_list('imei_serial', flat=True)
+    )
+    outcomes, passports, first_with_key, repeats = [], [], {}, []
+    for index, request in enumerate(requests):
+        row = stored.get(request.key)
+        if row is not None:
+            outcomes.append((REPLAY, row) if row.fingerprint == request.fingerprint else (KEY_REUSED, None))
+            continue
+        if request.key in first_with_key:
+            repeats.append(index)  # same key twice in one group: resolved once the first is minted
+            outcomes.append(None)
+            continue
+        if request.key:
+            first_with_key[request.key] = request
+        if request.data['imei_serial'] in existing:
+            outcomes.append((CONFLICT, None))
+            continue
+        existing.add(request.data['imei_serial'])
+        passport = PassportMintSerializer.build_passport(request.data)
+        passports.append(passport)
+        outcomes.append((CREATED, passport))
+
+    ledger.append(passports)
+
+    ttl = timedelta(seconds=getattr(settings, 'DDP_IDEMPOTENCY_TTL', 24 * 3600))
+    new_rows = {
+        request.key: IdempotencyKey(key=request.key, fingerprint=request.fingerprint, status_code=201,
+                                    response=created_body(outcome[1]), expires_at=now + ttl)
+        for request, outcome in zip(requests, outcomes)
+        if request.key and outcome and outcome[0] == CREATED
+    }
+    IdempotencyKey.objects.bulk_create(new_rows.values())
+
+    for index in repeats:
+        request = requests[index]
+        row = new_rows.get(request.key)
+        if row is None:
+            outcomes[index] = (CONFLICT, None)
+        else:
+            outcomes[index] = (REPLAY, row) if row.fingerprint == request.fingerprint else (KEY_REUSED, None)
+    return outcomes
+
+
+_last_purge = 0.0
+
+
+def _purge_expired_keys(now):
+    """Evicts expired idempotency keys, at most once per DDP_IDEMPOTENCY_PURGE_INTERVAL seconds."""
+    global _last_purge
+    if time.monotonic() - _last_purge < getattr(settings, 'DDP_IDEMPOTENCY_PURGE_INTERVAL', 300):
+        return
+    _last_purge = time.monotonic()
+    IdempotencyKey.objects.filter(expires_at__lte=now).delete()
+
+
+_mint_coalescer = None
+_mint_coalescer_lock = threading.Lock()
+
+
+def _get_mint_coalescer(window):
+    global _mint_coalescer
+    with _mint_coalescer_lock:
+        if _mint_coalescer is None:
+            _mint_coalescer = Coalescer(
+                commit_mints, window=window, max_batch=getattr(settings, 'DDP_MINT_COALESCE_MAX', 200),
+            )
+        return _mint_coalescer
+
+
+def mint(validated_data, idempotency_key=None):
+    """Mints one passport through the process-wide group commit; returns its outcome.
+
+    DDP_MINT_COALESCE_WINDOW = 0 commits every request on its own.
+    """
+    request = MintRequest(validated_data)
+    if idempotency_key:
+        request = MintRequest(validated_data, hash_key(idempotency_key), fingerprint(validated_data))
+    window = getattr(settings, 'DDP_MINT_COALESCE_WINDOW', 0.002)
+    if not window:
+        try:
+            return commit_mints([request])[0]
+        except Exception as e:
+            return (FAILED, str(e))
+    return _get_mint_coalescer(window).submit(request)
@@ -0,0 +1,126 @@
+# core_passport/export.py
+#
+# Streaming export of the whole ledger (passports + their events) for auditors.
+#
+# Passports are read with .iterator(chunk_size) and each chunk's events are
+# fetched with one prefetch query, so memory depends on the chunk size, not
+# on the ledger size. Output is produced as an iterator of byte strings that
+# both the HTTP endpoint (StreamingHttpResponse) and the export_ledger
+# management command consume; gzip is applied on the fly.
+
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, time
+
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import DigitalPassport, EventLog
+
+FORMATS = ('ndjson', 'csv')
+CHUNK_SIZE = 2000
+FLUSH_BYTES = 64 * 1024  # coalesce rows into ~64 KB writes
+
+PASSPORT_FIELDS = [
+    'id', 'imei_serial', 'mint_date', 'wipe_standard', 'is_certified',
+    'chain_hash', 'prev_hash', 'leaf_index', 'hash_version', 'signature', 'signing_key_id',
+    'verification_coverage', 'verification_mismatches', 'verification_digest',
+]
+
+
+def parse_since(value):
+    """Accepts an ISO datetime or a plain date (midnight, current timezone)."""
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"'{value}' is not an ISO date or datetime.")
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def iter_passports(since_id=None, since=None, chunk_size=CHUNK_SIZE):
+    """Passports in id order with their events prefetched one chunk at a time."""
+    queryset = DigitalPassport.objects.order_by('id').prefetch_related(
+        Prefetch('events', queryset=EventLog.objects.order_by('timestamp', 'id'))
+    )
+    if since_id is not None:
+        queryset = queryset.filter(id__gt=since_id)
+    if since is not None:
+        queryset = queryset.filter(mint_date__gte=since)
+    return queryset.iterator(chunk_size=chunk_size)
+
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def passport_record(passport):
+    record = {field: _value(getattr(passport, field)) for field in PASSPORT_FIELDS}
+    record['events'] = [
+        {
+            'id': event.id,
+            'event_type': event.event_type,
+            'event_data': event.event_data,
+            'timestamp': event.timestamp.isoformat(),
+        }
+        for event in passport.events.all()
+    ]
+    return record
+
+
+def ndjson_lines(passports):
+    for passport in passports:
+        yield json.dumps(passport_record(passport), sort_keys=True) + "\n"
+
+
+def csv_lines(passports):
+    """One row per passport; the event history is a JSON array in the `events` column."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(PASSPORT_FIELDS + ['events'])
+    for passport in passports:
+        record = passport_record(passport)
+        writer.writerow([record[field] for field in PASSPORT_FIELDS] + [json.dumps(record['events'], sort_keys=True)])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _batched(lines):
+    pending, size = [], 0
+    for line in lines:
+        pending.append(line)
+        size += len(line)
+        if size >= FLUSH_BYTES:
+            yield "".join(pending).encode('utf-8')
+            pending, size = [], 0
+    if pending:
+        yield "".join(pending).encode('utf-8')
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(fmt='ndjson', since_id=None, since=None, gzip=False, chunk_size=CHUNK_SIZE):
+    """Iterator of bytes for the whole (or incremental) ledger export."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'; use one of {', '.join(FORMATS)}.")
+    passports = iter_passports(since_id=since_id, since=since, chunk_size=chunk_size)
+    lines = ndjson_lines(passports) if fmt == 'ndjson' else csv_lines(passports)
+    chunks = _batched(lines)
+    return _gzipped(chunks) if gzip else chunks
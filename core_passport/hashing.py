@@ -0,0 +1,46 @@
+# core_passport/hashing.py
+#
+# The chain-hash payload, kept free of Django imports so ledger audits can
+# recompute hashes in worker processes from plain tuples.
+#
+# Version 1 (legacy) hashed timezone.now() at save time without storing it,
+# so those hashes cannot be recomputed. Version 2 hashes only stored fields.
+
+import json
+from datetime import timezone
+from hashlib import sha256
+
+HASH_VERSION = 2
+
+
+def canonical_payload(imei_serial, mint_date, is_certified, wipe_standard, prev_hash,
+                      verification_coverage=None, verification_mismatches=None, verification_digest=''):
+    """The exact (version 2) payload behind a passport's chain_hash."""
+    return {
+        'v': HASH_VERSION,
+        'imei': imei_serial,
+        'date': mint_date.astimezone(timezone.utc).isoformat(),
+        'certified': is_certified,
+        'standard': wipe_standard,
+        'prev': prev_hash,
+        'verification': {
+            'coverage': verification_coverage,
+            'mismatches': verification_mismatches,
+            'digest': verification_digest,
+        },
+    }
+
+
+def chain_hash(payload):
+    json_string = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+    return sha256(json_string.encode('utf-8')).hexdigest()
+
+
+def signed_message(chain_hash_hex):
+    """Bytes the hub's Ed25519 key signs for a passport (domain-separated chain_hash)."""
+    return b"ddp-passport:" + bytes.fromhex(chain_hash_hex)
+
+
+def key_id(raw_public_key):
+    """Short fingerprint of a raw 32-byte Ed25519 public key, stored next to each signature."""
+    return sha256(raw_public_key).hexdigest()[:16]
@@ -0,0 +1,216 @@
+# core_passport/jobs.py
+#
+# Wipe-and-mint runs as a background job on a bounded, process-local worker
+# pool so a multi-hour wipe never holds a request thread. Job state and
+# progress live on the WipeJob row, which the status endpoint reads. Wipes
+# checkpoint into DDP_WIPE_JOURNAL_DIR, so jobs cut off by a hub crash are
+# re-run by `manage.py resume_wipe_jobs` from where they stopped.
+
+import os
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from ddp_wipe.engine import DEFAULT_BLOCK_SIZE, WipeEngine, WipeError
+from ddp_wipe.journal import DEFAULT_CHECKPOINT_BYTES, DEFAULT_CHECKPOINT_SECONDS
+from ddp_wipe.verify import Verifier
+
+from . import metrics
+from .models import WipeJob
+from .progress import broker
+from .serializers import PassportMintSerializer
+
+_executor = None
+_executor_lock = threading.Lock()
+_submit_lock = threading.Lock()  # the busy-target check and the insert happen together
+
+
+class JobQueueFull(Exception):
+    """Raised when DDP_WIPE_MAX_ACTIVE_JOBS jobs are already queued or running."""
+
+
+class TargetBusy(Exception):
+    """Raised when a queued or running job already wipes the same directory."""
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'DDP_WIPE_WORKERS', 2),
+                thread_name_prefix='ddp-wipe',
+            )
+        return _executor
+
+
+def submit(device_id, target_drive, algorithm, user_dir):
+    """Creates a queued WipeJob and hands it to the worker pool. Returns the job."""
+    max_active = getattr(settings, 'DDP_WIPE_MAX_ACTIVE_JOBS', 8)
+    target = os.path.realpath(user_dir)
+    with _submit_lock:
+        active_jobs = list(WipeJob.objects.filter(state__in=WipeJob.ACTIVE_STATES).only('pk', 'user_dir'))
+        if len(active_jobs) >= max_active:
+            raise JobQueueFull(f"{max_active} wipe jobs are already queued or running.")
+        # Two wipes of one directory would share its fill file and checkpoint journal
+        for active in active_jobs:
+            if os.path.realpath(active.user_dir) == target:
+                raise TargetBusy(f"Wipe job {active.pk} is already wiping {target}.")
+        job = WipeJob.objects.create(
+            device_id=device_id,
+            target_drive=target_drive,
+            algorithm=algorithm,
+            user_dir=user_dir,
+        )
+    if getattr(settings, 'DDP_WIPE_JOBS_EAGER', False):
+        run_job(job.pk)  # Tests / debugging: run inline in the request thread
+        job.refresh_from_db()
+    else:
+        _get_executor().submit(_run_in_worker, job.pk)
+    return job
+
+
+def _run_in_worker(job_id):
+    close_old_connections()
+    try:
+        run_job(job_id)
+    finally:
+        connection.close()  # worker threads own their connection; don't leak it
+
+
+def interrupted_jobs():
+    """Jobs left queued or running by a hub process that stopped without finishing them."""
+    return WipeJob.objects.filter(state__in=WipeJob.ACTIVE_STATES).order_by('created_at')
+
+
+def job_snapshot(job):
+    """JSON-ready state of a job, shared by the polling and streaming endpoints."""
+    passport = job.passport
+    return {
+        "job_id": str(job.id),
+        "state": job.state,
+        "algorithm": job.algorithm,
+        "target_drive": job.target_drive,
+        "progress": {
+            "percent": round(job.percent, 2),
+            "bytes_done": job.bytes_done,
+            "bytes_total": job.bytes_total,
+            "throughput": job.throughput,
+            "pass_index": job.pass_index,
+            "pass_count": job.pass_count,
+            "pass_label": job.pass_label,
+            "eta_seconds": job.eta_seconds,
+        },
+        "imei": passport.imei_serial if passport else None,
+        "passport_hash": passport.chain_hash if passport else None,
+        "wipe_log": job.wipe_log,
+        "error": job.error,
+    }
+
+
+def _update(job, **fields):
+    """Writes `fields` to the job row and publishes the new snapshot to stream watchers."""
+    fields['updated_at'] = timezone.now()  # QuerySet.update() skips auto_now
+    for name, value in fields.items():
+        setattr(job, name, value)
+    WipeJob.objects.filter(pk=job.pk).update(**fields)
+    broker.publish(job.pk, job_snapshot(job))
+
+
+def _make_verifier():
+    """Read-back verifier configured by DDP_VERIFY_MODE ('sample', 'full' or 'off')."""
+    mode = getattr(settings, 'DDP_VERIFY_MODE', 'sample')
+    if mode == 'off':
+        return None
+    if mode == 'full':
+        return Verifier()
+    return Verifier(
+        confidence=getattr(settings, 'DDP_VERIFY_CONFIDENCE', 0.999),
+        defect_rate=getattr(settings, 'DDP_VERIFY_DEFECT_RATE', 0.0001),
+    )
+
+
+def run_job(job_id):
+    """Wipes, then mints the passport only if the wipe succeeded.
+
+    Whatever goes wrong, the job ends FAILED rather than staying RUNNING.
+    """
+    job = WipeJob.objects.get(pk=job_id)
+    try:
+        _wipe_and_mint(job)
+    except Exception as e:
+        print(f"Wipe job {job_id} crashed: {e!r}")
+        traceback.print_exc()
+        _update(job, state=WipeJob.FAILED, error=f"Wipe job crashed: {e!r}")
+
+
+def _wipe_and_mint(job):
+    from .views import WIPE_ALGORITHMS  # Local import: views.py imports this module
+
+    job_id = job.pk
+    _update(job, state=WipeJob.RUNNING)
+    algorithm = WIPE_ALGORITHMS.get(job.algorithm, WIPE_ALGORITHMS['NIST'])
+
+    def report(progress):
+        _update(
+            job,
+            pass_index=progress.pass_index,
+            pass_count=progress.pass_count,
+            pass_label=progress.pass_label,
+            bytes_done=progress.bytes_done,
+            bytes_total=progress.bytes_total,
+            throughput=progress.throughput,
+        )
+
+    # --- 1. WIPE ---
+    try:
+        engine = WipeEngine(
+            block_size=getattr(settings, 'DDP_WIPE_BLOCK_SIZE', DEFAULT_BLOCK_SIZE),
+            direct=getattr(settings, 'DDP_WIPE_DIRECT_IO', False),
+            progress=report,
+            progress_interval=getattr(settings, 'DDP_WIPE_PROGRESS_INTERVAL', 1.0),
+            queue_depth=getattr(settings, 'DDP_WIPE_QUEUE_DEPTH', 1),
+            journal_dir=getattr(settings, 'DDP_WIPE_JOURNAL_DIR', None),
+            checkpoint_bytes=getattr(settings, 'DDP_WIPE_CHECKPOINT_BYTES', DEFAULT_CHECKPOINT_BYTES),
+            checkpoint_seconds=getattr(settings, 'DDP_WIPE_CHECKPOINT_SECONDS', DEFAULT_CHECKPOINT_SECONDS),
+        )
+        with metrics.timed('wipe_free_space'):
+            result = engine.wipe_free_space(job.user_dir, job.algorithm,
+                                            limit=getattr(settings, 'DDP_WIPE_FREE_SPACE_LIMIT', None),
+                                            verifier=_make_verifier(),
+                                            deallocate=getattr(settings, 'DDP_WIPE_DEALLOCATE', False))
+        wipe_log = f"Secure wipe executed using {algorithm['name']} on {job.target_drive}. {result.summary()}"
+    except (WipeError, OSError) as e:
+        print(f"Wipe job {job_id} failed: {e}")
+        _update(job, state=WipeJob.FAILED, error=f"Secure Wipe Engine Failed: {e}")
+        return
+
+    # --- 2. MINT PASSPORT (only after a successful wipe) ---
+    payload = {
+        "imei_serial": f"{job.device_id}-{job.target_drive.replace('/', '')}",
+        "wipe_status": "SUCCESS",
+        "wipe_standard": algorithm['name'],
+        "verification_log": wipe_log,
+    }
+    if result.verification is not None:
+        payload.update({
+            "verification_coverage": result.verification.coverage,
+            "verification_mismatches": result.verification.mismatched_blocks,
+            "verification_digest": result.verification.digest,
+        })
+    serializer = PassportMintSerializer(data=payload)
+    if not serializer.is_valid():
+        _update(job, state=WipeJob.FAILED, wipe_log=wipe_log, error=str(serializer.errors))
+        return
+    try:
+        passport = serializer.create(validated_data=serializer.validated_data)
+    except Exception as e:
+        print(f"Wipe job {job_id} could not mint: {e}")
+        _update(job, state=WipeJob.FAILED, wipe_log=wipe_log, error=f"Failed to mint passport: {e}")
+        return
+
+    _update(job, state=WipeJob.SUCCEEDED, wipe_log=wipe_log, passport=passport)
@@ -0,0 +1,265 @@
+# core_passport/ledger.py
+#
+# Append-only hash chain + Merkle tree over every minted passport.
+#
+# Each passport commits to the previous head through `prev_hash`, and its
+# `chain_hash` is a leaf of an RFC 6962 (Certificate Transparency) style
+# Merkle tree. Every complete, aligned subtree is stored as a `MerkleNode`
+# row, so an append only touches the O(log n) nodes it completes and a proof
+# only reads the O(log n) nodes it needs.
+
+from hashlib import sha256
+
+from django.db import transaction
+from django.db.models import Q
+
+from . import metrics, signing
+from .search import fold_serials, index_serials
+from .models import DigitalPassport, MerkleNode
+
+
+class LedgerError(Exception):
+    """Raised when a proof is requested for a tree size or leaf that does not exist."""
+
+
+# --- HASHING (RFC 6962 domain separation) ---
+
+def leaf_hash(chain_hash):
+    return sha256(b'\x00' + bytes.fromhex(chain_hash)).digest()
+
+
+def node_hash(left, right):
+    return sha256(b'\x01' + left + right).digest()
+
+
+def _split(n):
+    """Largest power of two strictly smaller than n (n > 1)."""
+    k = 1
+    while k << 1 < n:
+        k <<= 1
+    return k
+
+
+def _is_power_of_two(n):
+    return n > 0 and n & (n - 1) == 0
+
+
+# --- TREE HASHES FROM STORED NODES ---
+
+def _mth(start, end, lookup):
+    """Merkle Tree Hash of leaves [start, end).
+
+    Every range produced by the RFC 6962 split is either a stored perfect
+    subtree or is split again, so this resolves to O(log n) node lookups.
+    """
+    size = end - start
+    if _is_power_of_two(size):
+        level = size.bit_length() - 1
+        return lookup(level, start >> level)
+    k = _split(size)
+    return node_hash(_mth(start, start + k, lookup), _mth(start + k, end, lookup))
+
+
+def _path(m, start, end, lookup):
+    """Inclusion audit path for absolute leaf index m inside [start, end)."""
+    if end - start == 1:
+        return []
+    k = _split(end - start)
+    if m - start < k:
+        return _path(m, start, start + k, lookup) + [_mth(start + k, end, lookup)]
+    return _path(m, start + k, end, lookup) + [_mth(start, start + k, lookup)]
+
+
+def _subproof(m, start, end, complete, lookup):
+    """Consistency sub-proof for the first m leaves of [start, end)."""
+    n = end - start
+    if m == n:
+        return [] if complete else [_mth(start, end, lookup)]
+    k = _split(n)
+    if m <= k:
+        return _subproof(m, start, start + k, complete, lookup) + [_mth(start + k, end, lookup)]
+    return _subproof(m - k, start + k, end, False, lookup) + [_mth(start, start + k, lookup)]
+
+
+def _resolve(build):
+    """Runs `build(lookup)` twice: once to collect the node keys it needs, then
+    again against those nodes fetched in a single query."""
+    keys = set()
+
+    def collect(level, index):
+        keys.add((level, index))
+        return b''
+
+    build(collect)
+    if not keys:
+        return build(collect)
+
+    condition = Q()
+    for level, index in keys:
+        condition |= Q(level=level, index=index)
+    nodes = {
+        (level, index): bytes.fromhex(value)
+        for level, index, value in MerkleNode.objects.filter(condition).values_list('level', 'index', 'hash')
+    }
+    if len(nodes) != len(keys):
+        raise LedgerError("Merkle tree is missing nodes; the ledger needs to be rebuilt.")
+    return build(lambda level, index: nodes[(level, index)])
+
+
+# --- PUBLIC API ---
+
+def tree_size():
+    head = DigitalPassport.objects.filter(leaf_index__isnull=False).order_by('-leaf_index').values_list('leaf_index', flat=True).first()
+    return 0 if head is None else head + 1
+
+
+def _check_size(size, current=None):
+    current = tree_size() if current is None else current
+    if size < 1 or size > current:
+        raise LedgerError(f"Tree size must be between 1 and {current}.")
+
+
+def root_hash(size=None):
+    """Hex root of the tree made of the first `size` leaves (default: current tree)."""
+    size = tree_size() if size is None else size
+    if size == 0:
+        return sha256(b'').hexdigest()
+    _check_size(size)
+    return _resolve(lambda lookup: _mth(0, size, lookup)).hex()
+
+
+def inclusion_proof(leaf_index, size=None):
+    """Returns the audit path (list of hex hashes) proving leaf `leaf_index` is in tree `size`."""
+    size = tree_size() if size is None else size
+    _check_size(size)
+    if not 0 <= leaf_index < size:
+        raise LedgerError(f"Leaf {leaf_index} is not part of a tree of size {size}.")
+    return [h.hex() for h in _resolve(lambda lookup: _path(leaf_index, 0, size, lookup))]
+
+
+def consistency_proof(first, second):
+    """Returns the proof (list of hex hashes) that tree `first` is a prefix of tree `second`."""
+    current = tree_size()
+    _check_size(second, current)
+    if not 1 <= first <= second:
+        raise LedgerError(f"First tree size must be between 1 and {second}.")
+    if first == second:
+        return []
+    return [h.hex() for h in _resolve(lambda lookup: _subproof(first, 0, second, True, lookup))]
+
+
+def link(passports):
+    """Chains and signs unsaved passports onto the current head (leaf_index, prev_hash, chain_hash, signature).
+
+    Must run inside the same transaction as the insert; the unique leaf_index
+    makes a concurrent writer that read the same head fail instead of forking.
+    """
+    head = DigitalPassport.objects.filter(leaf_index__isnull=False).order_by('-leaf_index').values('leaf_index', 'chain_hash').first()
+    next_index = head['leaf_index'] + 1 if head else 0
+    prev_hash = head['chain_hash'] if head else ''
+    for passport in passports:
+        passport.leaf_index = next_index
+        passport.prev_hash = prev_hash
+        passport.chain_hash = ''
+        passport.assign_chain_hash()
+        passport.signature, passport.signing_key_id = signing.sign(passport.chain_hash)
+        prev_hash = passport.chain_hash
+        next_index += 1
+    return passports
+
+
+def extend_tree(size, frontier, new_leaf_hashes):
+    """Pure helper: nodes created by appending leaves to a tree of `size` leaves.
+
+    `frontier` maps (level, index) -> bytes for the roots of the complete
+    subtrees on the right edge of the current tree (one per set bit of size).
+    Returns a dict of every new (level, index) -> bytes node, leaves included.
+    """
+    known = dict(frontier)
+    created = {}
+    for offset, value in enumerate(new_leaf_hashes):
+        index, level = size + offset, 0
+        known[(0, index)] = created[(0, index)] = value
+        while index & 1:
+            value = node_hash(known[(level, index - 1)], value)
+            level, index = level + 1, index >> 1
+            known[(level, index)] = created[(level, index)] = value
+    return created
+
+
+def _frontier(size):
+    keys = [(level, (size >> level) - 1) for level in range(size.bit_length()) if size >> level & 1]
+    if not keys:
+        return {}
+    condition = Q()
+    for level, index in keys:
+        condition |= Q(level=level, index=index)
+    return {
+        (level, index): bytes.fromhex(value)
+        for level, index, value in MerkleNode.objects.filter(condition).values_list('level', 'index', 'hash')
+    }
+
+
+def append(passports):
+    """Links, inserts and adds passports to the Merkle tree in one transaction."""
+    with metrics.timed('ledger_append'), transaction.atomic():
+        link(passports)
+        fold_serials(passports)
+        DigitalPassport.objects.bulk_create(passports)
+        if passports:
+            size = passports[0].leaf_index
+            created = extend_tree(size, _frontier(size), [leaf_hash(p.chain_hash) for p in passports])
+            MerkleNode.objects.bulk_create(
+                MerkleNode(level=level, index=index, hash=value.hex()) for (level, index), value in created.items()
+            )
+            index_serials(passports)
+    return passports
+
+
+# --- VERIFICATION (what an auditor runs; needs nothing but hashlib) ---
+
+def verify_inclusion(chain_hash, leaf_index, size, path, root):
+    """RFC 9162 section 2.1.3.2 inclusion proof verification."""
+    if not 0 <= leaf_index < size:
+        return False
+    fn, sn = leaf_index, size - 1
+    r = leaf_hash(chain_hash)
+    for p in (bytes.fromhex(h) for h in path):
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            r = node_hash(p, r)
+            while not fn & 1 and fn != 0:
+                fn, sn = fn >> 1, sn >> 1
+        else:
+            r = node_hash(r, p)
+        fn, sn = fn >> 1, sn >> 1
+    return sn == 0 and r.hex() == root
+
+
+def verify_consistency(first, second, first_root, second_root, proof):
+    """RFC 9162 section 2.1.4.2 consistency proof verification."""
+    if not 1 <= first <= second:
+        return False
+    if first == second:
+        return not proof and first_root == second_root
+    path = [bytes.fromhex(h) for h in proof]
+    if _is_power_of_two(first):
+        path.insert(0, bytes.fromhex(first_root))
+    if not path:
+        return False
+    fn, sn = first - 1, second - 1
+    while fn & 1:
+        fn, sn = fn >> 1, sn >> 1
+    fr = sr = path[0]
+    for c in path[1:]:
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            fr, sr = node_hash(c, fr), node_hash(c, sr)
+            while not fn & 1 and fn != 0:
+                fn, sn = fn >> 1, sn >> 1
+        else:
+            sr = node_hash(sr, c)
+        fn, sn = fn >> 1, sn >> 1
+    return sn == 0 and fr.hex() == first_root and sr.hex() == second_root
@@ -0,0 +1,54 @@
+# core_passport/management/commands/audit_ledger.py
+
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core_passport.audit import CHUNK_SIZE, AuditState, run_audit
+
+
+class Command(BaseCommand):
+    help = "Recomputes every chain_hash and checks prev_hash links and Merkle leaves, in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Worker processes (default: CPU count; 1 audits inline).")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--checkpoint', help="File recording progress after every chunk.")
+        parser.add_argument('--resume', action='store_true', help="Continue from --checkpoint.")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON.")
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint']
+        if options['resume'] and not checkpoint:
+            raise CommandError("--resume needs --checkpoint.")
+
+        state = None
+        if options['resume'] and os.path.exists(checkpoint):
+            state = AuditState.load(checkpoint)
+            self.stderr.write(f"Resuming after leaf {state.last_leaf_index} ({state.checked} already audited).")
+
+        state = run_audit(
+            state=state,
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            on_chunk=(lambda s: s.save(checkpoint)) if checkpoint else None,
+        )
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'checked': state.checked,
+                'legacy': state.legacy,
+                'problem_count': state.problem_count,
+                'problems': state.problems,
+                'last_leaf_index': state.last_leaf_index,
+            }))
+        else:
+            self.stdout.write(f"Audited {state.checked} passport(s); {state.legacy} legacy (v1) hash(es) checked by link only.")
+            for leaf_index, imei, kind in state.problems:
+                self.stdout.write(f"  leaf {leaf_index} ({imei}): {kind}")
+
+        if not state.ok:
+            raise CommandError(f"Ledger audit found {state.problem_count} problem(s).")
+        self.stdout.write(self.style.SUCCESS("Ledger intact."))
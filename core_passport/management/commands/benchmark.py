@@ -0,0 +1,81 @@
+# core_passport/management/commands/benchmark.py
+
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from core_passport.benchmarks import SCENARIOS, detail_latency, mint_race, mint_throughput
+
+
+class Command(BaseCommand):
+    help = "Load-tests the hub API against a throwaway test database and prints the results as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenarios', nargs='*',
+                            help=f"Scenarios to run (default: all of {', '.join(SCENARIOS)}).")
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--conflict-rate', type=float, default=0.2)
+        parser.add_argument('--history', default='0,100,1000', help="Event history sizes for the detail scenario.")
+        parser.add_argument('--race-rounds', type=int, default=20)
+        parser.add_argument('--output', '-o', help="File to write the JSON report to (default: stdout).")
+
+    def handle(self, *args, **options):
+        try:
+            history = [int(n) for n in options['history'].split(',') if n]
+        except ValueError:
+            raise CommandError("--history must be a comma-separated list of integers.")
+        unknown = set(options['scenarios']) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenario(s): {', '.join(sorted(unknown))}.")
+        if not 0 <= options['conflict_rate'] < 1:
+            raise CommandError("--conflict-rate must be in [0, 1).")
+
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        tmp_dir = None
+        if connection.vendor == 'sqlite' and not connection.settings_dict['TEST'].get('NAME'):
+            # The default in-memory test DB uses shared-cache table locks, which no server
+            # sees; benchmark a file like the real deployment instead.
+            tmp_dir = tempfile.mkdtemp(prefix='ddp-bench-')
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tmp_dir, 'bench.sqlite3')
+        request_logger = logging.getLogger('django.request')
+        log_level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)  # 500s are counted in the report, not logged
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            report = {
+                "backend": connection.vendor,
+                "python": platform.python_version(),
+                "results": {},
+            }
+            for name in options['scenarios'] or list(SCENARIOS):
+                self.stderr.write(f"Running {name}...")
+                if name == 'mint':
+                    result = mint_throughput(options['requests'], options['workers'], options['conflict_rate'])
+                elif name == 'detail':
+                    result = detail_latency(history, max(1, options['requests'] // 5), options['workers'])
+                else:
+                    result = mint_race(options['race_rounds'], max(2, options['workers']))
+                report["results"][name] = result
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            request_logger.setLevel(log_level)
+            if tmp_dir:
+                connection.settings_dict['TEST']['NAME'] = None
+                os.rmdir(tmp_dir)
+
+        text = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(text + "\n")
+        else:
+            sys.stdout.write(text + "\n")
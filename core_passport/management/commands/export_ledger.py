@@ -0,0 +1,41 @@
+# core_passport/management/commands/export_ledger.py
+
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core_passport.export import CHUNK_SIZE, FORMATS, export_stream, parse_since
+
+
+class Command(BaseCommand):
+    help = "Streams every Digital Passport with its event history as NDJSON or CSV (optionally gzipped)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument('--since-id', type=int, help="Only passports with an id greater than this.")
+        parser.add_argument('--since', help="Only passports minted at/after this ISO date or datetime.")
+        parser.add_argument('--gzip', action='store_true', help="Compress the output on the fly.")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--output', '-o', help="File to write (default: stdout).")
+
+    def handle(self, *args, **options):
+        try:
+            chunks = export_stream(
+                fmt=options['format'],
+                since_id=options['since_id'],
+                since=parse_since(options['since']),
+                gzip=options['gzip'],
+                chunk_size=options['chunk_size'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        out = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+        finally:
+            if options['output']:
+                out.close()
+            else:
+                out.flush()
@@ -0,0 +1,26 @@
+# core_passport/management/commands/generate_signing_key.py
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core_passport import signing
+
+
+class Command(BaseCommand):
+    help = "Creates the hub's Ed25519 passport signing key at DDP_SIGNING_KEY_PATH (never overwrites)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help="Write the key here instead of DDP_SIGNING_KEY_PATH.")
+
+    def handle(self, *args, **options):
+        path = options['path'] or getattr(settings, 'DDP_SIGNING_KEY_PATH', None)
+        if not path:
+            raise CommandError("Set DDP_SIGNING_KEY_PATH or pass --path.")
+        try:
+            signing.generate_key(path)
+        except ImportError:
+            raise CommandError("The 'cryptography' package is required: pip install cryptography")
+        except FileExistsError:
+            raise CommandError(f"{path} already exists; refusing to replace the signing key.")
+        signing.reset()
+        self.stdout.write(self.style.SUCCESS(f"Signing key written to {path}. Keep it secret and backed up."))
@@ -0,0 +1,25 @@
+# core_passport/management/commands/resume_wipe_jobs.py
+
+from django.core.management.base import BaseCommand
+
+from core_passport.jobs import interrupted_jobs, run_job
+from core_passport.models import WipeJob
+
+
+class Command(BaseCommand):
+    help = ("Re-runs wipe jobs a stopped hub left queued or running. Wipes continue from their last "
+            "checkpoint in DDP_WIPE_JOURNAL_DIR. Run it while no hub process is serving jobs.")
+
+    def handle(self, *args, **options):
+        job_ids = list(interrupted_jobs().values_list('pk', flat=True))
+        if not job_ids:
+            self.stdout.write("No interrupted wipe jobs.")
+            return
+        for job_id in job_ids:
+            self.stdout.write(f"Resuming wipe job {job_id}...")
+            run_job(job_id)
+            job = WipeJob.objects.get(pk=job_id)
+            if job.state == WipeJob.SUCCEEDED:
+                self.stdout.write(self.style.SUCCESS(f"  {job.state}: passport {job.passport.imei_serial}"))
+            else:
+                self.stdout.write(self.style.ERROR(f"  {job.state}: {job.error}"))
@@ -0,0 +1,203 @@
+# core_passport/metrics.py
+#
+# Per-process request/query/operation metrics in Prometheus text format.
+#
+# Every thread records into its own shard (a pair of plain dicts), so the hot
+# path takes no lock: only the thread that owns a shard ever writes to it.
+# A scrape sums all shards; it reads them without locking, which at worst
+# misses an observation that is still being recorded. Histograms keep
+# per-bucket counts and are made cumulative only when rendered. When a thread
+# exits, its shard is folded into a retired aggregate, so thread-per-connection
+# servers don't leave one shard per connection behind.
+#
+# DB queries are counted by an execute wrapper installed on every connection
+# (signals.py). It charges the request that is current in its context, which
+# asgiref carries across sync_to_async, so it works under WSGI and ASGI.
+
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Seconds; the Prometheus client defaults plus a long tail for wipes.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 60.0, 300.0, 1800.0, 7200.0)
+
+METRICS = {
+    'ddp_http_request_duration_seconds': ('histogram', "Hub request latency by route."),
+    'ddp_http_requests_total': ('counter', "Hub requests by route, method and status."),
+    'ddp_db_queries_total': ('counter', "Database queries issued while serving each route."),
+    'ddp_db_query_seconds_total': ('counter', "Time spent in database queries for each route."),
+    'ddp_operation_duration_seconds': ('histogram', "Duration of wipes, subprocesses and ledger appends."),
+}
+
+_shards = []
+_shards_lock = threading.RLock()  # re-entrant: a shard may be retired by GC during collect()
+_local = threading.local()
+
+current_request = ContextVar('ddp_metrics_request', default=None)
+
+
+class _Shard:
+    __slots__ = ('histograms', 'counters')
+
+    def __init__(self):
+        self.histograms = {}  # (name, labels) -> [bucket counts..., +Inf count, sum, count]
+        self.counters = {}  # (name, labels) -> float
+
+
+_retired = _Shard()  # totals of the shards of threads that have exited
+
+
+class _Owner:
+    """Thread-local handle of a shard; freed with the thread's locals when the thread exits."""
+    __slots__ = ('shard', '__weakref__')
+
+    def __init__(self, shard):
+        self.shard = shard
+
+
+def _retire(shard):
+    with _shards_lock:
+        _merge(shard, _retired.histograms, _retired.counters)
+        _shards.remove(shard)
+
+
+def _shard():
+    owner = getattr(_local, 'owner', None)
+    if owner is None:
+        owner = _local.owner = _Owner(_Shard())
+        with _shards_lock:  # once per thread
+            _shards.append(owner.shard)
+        weakref.finalize(owner, _retire, owner.shard)
+    return owner.shard
+
+
+def observe(name, labels, seconds):
+    """Adds one observation to histogram `name`; `labels` is a tuple of (key, value) pairs."""
+    histograms = _shard().histograms
+    cell = histograms.get((name, labels))
+    if cell is None:
+        cell = histograms[(name, labels)] = [0] * (len(BUCKETS) + 3)
+    cell[bisect_left(BUCKETS, seconds)] += 1
+    cell[-2] += seconds
+    cell[-1] += 1
+
+
+def inc(name, labels, amount=1):
+    counters = _shard().counters
+    counters[(name, labels)] = counters.get((name, labels), 0) + amount
+
+
+@contextmanager
+def timed(operation):
+    """Records how long the block took as ddp_operation_duration_seconds{operation=...}."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe('ddp_operation_duration_seconds', (('operation', operation),), time.perf_counter() - started)
+
+
+class RequestStats:
+    __slots__ = ('queries', 'query_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+
+
+def query_wrapper(execute, sql, params, many, context):
+    """connection.execute_wrappers hook: charges the query to the current request, if any."""
+    stats = current_request.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.query_seconds += time.perf_counter() - started
+
+
+def instrument_connection(connection):
+    if query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_wrapper)
+
+
+def record_request(route, method, status_code, seconds, stats):
+    labels = (('route', route), ('method', method))
+    observe('ddp_http_request_duration_seconds', labels, seconds)
+    inc('ddp_http_requests_total', labels + (('status', str(status_code)),))
+    if stats.queries:
+        inc('ddp_db_queries_total', (('route', route),), stats.queries)
+        inc('ddp_db_query_seconds_total', (('route', route),), stats.query_seconds)
+
+
+# --- EXPOSITION ---
+
+def _merge(shard, histograms, counters):
+    for key, cell in list(shard.histograms.items()):
+        total = histograms.setdefault(key, [0] * (len(BUCKETS) + 3))
+        for i, value in enumerate(list(cell)):
+            total[i] += value
+    for key, value in list(shard.counters.items()):
+        counters[key] = counters.get(key, 0) + value
+
+
+def collect():
+    """Sums every shard: (histograms, counters) keyed by (name, labels)."""
+    histograms, counters = {}, {}
+    with _shards_lock:
+        shards = list(_shards)
+        _merge(_retired, histograms, counters)
+    for shard in shards:
+        _merge(shard, histograms, counters)
+    return histograms, counters
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """Prometheus text exposition format (version 0.0.4)."""
+    histograms, counters = collect()
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == 'histogram':
+            for (metric, labels), cell in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                running = 0
+                for bound, count in zip(BUCKETS + ('+Inf',), cell):
+                    running += count
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {running}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(cell[-2])}")
+                lines.append(f"{name}_count{_labels(labels)} {cell[-1]}")
+        else:
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    """Clears every shard (tests)."""
+    with _shards_lock:
+        for shard in _shards + [_retired]:
+            shard.histograms.clear()
+            shard.counters.clear()
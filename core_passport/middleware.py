@@ -0,0 +1,59 @@
+# core_passport/middleware.py
+
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import metrics
+
+
+class MetricsMiddleware:
+    """Records latency, status and DB query count/time per route (see metrics.py).
+
+    Runs natively in both sync and async mode so it never forces the async
+    SSE view onto a thread. Streaming responses are timed up to the moment
+    the response object is returned, not until the last byte is sent.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'DDP_METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = metrics.RequestStats()
+        token = metrics.current_request.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.current_request.reset(token)
+        self._record(request, response, time.perf_counter() - started, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = metrics.RequestStats()
+        token = metrics.current_request.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.current_request.reset(token)
+        self._record(request, response, time.perf_counter() - started, stats)
+        return response
+
+    @staticmethod
+    def _record(request, response, seconds, stats):
+        match = request.resolver_match
+        # URL names, not raw paths: one series per endpoint, not per IMEI
+        route = (match.url_name or match.route) if match else 'unmatched'
+        metrics.record_request(route, request.method, response.status_code, seconds, stats)
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:22
+
+from hashlib import sha256
+
+from django.db import migrations, models
+
+
+def backfill_ledger(apps, schema_editor):
+    """Places passports minted before the ledger existed onto it, in id order.
+
+    Their chain_hash values are kept as-is (certificates already handed out
+    must stay valid); only prev_hash, leaf_index and the Merkle nodes are added.
+    """
+    DigitalPassport = apps.get_model('core_passport', 'DigitalPassport')
+    MerkleNode = apps.get_model('core_passport', 'MerkleNode')
+
+    nodes, prev_hash = {}, ''
+    for leaf_index, passport in enumerate(DigitalPassport.objects.order_by('id').iterator()):
+        passport.leaf_index, passport.prev_hash = leaf_index, prev_hash
+        passport.save(update_fields=['leaf_index', 'prev_hash'])
+        prev_hash = passport.chain_hash
+
+        index, level = leaf_index, 0
+        value = sha256(b'\x00' + bytes.fromhex(passport.chain_hash)).digest()
+        nodes[(0, index)] = value
+        while index & 1:
+            value = sha256(b'\x01' + nodes[(level, index - 1)] + value).digest()
+            level, index = level + 1, index >> 1
+            nodes[(level, index)] = value
+
+    MerkleNode.objects.bulk_create(
+        MerkleNode(level=level, index=index, hash=value.hex()) for (level, index), value in nodes.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_passport', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='digitalpassport',
+            name='leaf_index',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='digitalpassport',
+            name='prev_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.CreateModel(
+            name='MerkleNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.PositiveSmallIntegerField()),
+                ('index', models.PositiveBigIntegerField()),
+                ('hash', models.CharField(max_length=64)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('level', 'index'), name='unique_merkle_node')],
+            },
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
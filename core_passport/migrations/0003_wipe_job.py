@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:24
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_passport', '0002_ledger_merkle_tree'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WipeJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('state', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='queued', max_length=16)),
+                ('device_id', models.CharField(max_length=50)),
+                ('target_drive', models.CharField(max_length=100)),
+                ('algorithm', models.CharField(max_length=16)),
+                ('user_dir', models.CharField(max_length=255)),
+                ('pass_index', models.PositiveSmallIntegerField(default=0)),
+                ('pass_count', models.PositiveSmallIntegerField(default=0)),
+                ('pass_label', models.CharField(blank=True, max_length=32)),
+                ('bytes_done', models.PositiveBigIntegerField(default=0)),
+                ('bytes_total', models.PositiveBigIntegerField(default=0)),
+                ('throughput', models.FloatField(default=0.0)),
+                ('wipe_log', models.TextField(blank=True)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('passport', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='wipe_jobs', to='core_passport.digitalpassport')),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_passport', '0003_wipe_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='digitalpassport',
+            name='verification_coverage',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='digitalpassport',
+            name='verification_digest',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='digitalpassport',
+            name='verification_mismatches',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_passport', '0004_passport_verification'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='eventlog',
+            index=models.Index(fields=['passport', 'timestamp', 'id'], name='eventlog_passport_ts_id'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_passport', '0005_eventlog_keyset_index'),
+    ]
+
+    operations = [
+        # Existing rows were hashed with an unstored timestamp: mark them as version 1.
+        migrations.AddField(
+            model_name='digitalpassport',
+            name='hash_version',
+            field=models.PositiveSmallIntegerField(default=1, editable=False),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='digitalpassport',
+            name='hash_version',
+            field=models.PositiveSmallIntegerField(default=2, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='digitalpassport',
+            name='mint_date',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
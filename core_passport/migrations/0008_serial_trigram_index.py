@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_trigrams(apps, schema_editor):
+    """Indexes the serials of passports minted before fuzzy search existed (same padding as search.trigrams)."""
+    DigitalPassport = apps.get_model('core_passport', 'DigitalPassport')
+    SerialTrigram = apps.get_model('core_passport', 'SerialTrigram')
+
+    batch = []
+    for passport_id, serial in DigitalPassport.objects.values_list('id', 'imei_serial').iterator():
+        padded = f"^{serial.strip().lower()}$"
+        batch.extend(
+            SerialTrigram(trigram=gram, passport_id=passport_id)
+            for gram in sorted({padded[i:i + 3] for i in range(len(padded) - 2)})
+        )
+        if len(batch) >= 5000:
+            SerialTrigram.objects.bulk_create(batch)
+            batch = []
+    SerialTrigram.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_passport', '0007_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SerialTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('passport', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='core_passport.digitalpassport')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['trigram', 'passport'], name='serialtrigram_trigram_pp')],
+            },
+        ),
+        migrations.RunPython(backfill_trigrams, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_passport', '0008_serial_trigram_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='digitalpassport',
+            name='signature',
+            field=models.CharField(blank=True, editable=False, max_length=128),
+        ),
+        migrations.AddField(
+            model_name='digitalpassport',
+            name='signing_key_id',
+            field=models.CharField(blank=True, editable=False, max_length=16),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_segments(apps, schema_editor):
+    """Folds and segments the serials of existing passports (same cuts as search.segments, SEGMENTS = 4)."""
+    DigitalPassport = apps.get_model('core_passport', 'DigitalPassport')
+    SerialSegment = apps.get_model('core_passport', 'SerialSegment')
+
+    batch = []
+    for passport_id, serial in DigitalPassport.objects.values_list('id', 'imei_serial').iterator():
+        folded = serial.strip().lower()
+        DigitalPassport.objects.filter(pk=passport_id).update(serial_folded=folded)
+        bounds = [len(folded) * i // 4 for i in range(5)]
+        batch.extend(
+            SerialSegment(length=len(folded), position=i, text=folded[bounds[i]:bounds[i + 1]], passport_id=passport_id)
+            for i in range(4)
+        )
+        if len(batch) >= 5000:
+            SerialSegment.objects.bulk_create(batch)
+            batch = []
+    SerialSegment.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_passport', '0009_passport_signature'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='digitalpassport',
+            name='serial_folded',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=50),
+        ),
+        migrations.CreateModel(
+            name='SerialSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('length', models.PositiveSmallIntegerField()),
+                ('position', models.PositiveSmallIntegerField()),
+                ('text', models.CharField(max_length=50)),
+                ('passport', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segments', to='core_passport.digitalpassport')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='serialsegment',
+            index=models.Index(fields=['length', 'position', 'text'], name='serialsegment_lookup'),
+        ),
+        migrations.RunPython(backfill_segments, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='SerialTrigram',
+        ),
+    ]
@@ -1,40 +1,83 @@
 # core_passport/models.py
 
 from django.db import models
-from hashlib import sha256
-import json 
+import uuid
 from django.utils import timezone 
 
+from .hashing import HASH_VERSION, canonical_payload, chain_hash
+
 class DigitalPassport(models.Model):
     # 1. PRIMARY KEY: The unique identifier for the device
     imei_serial = models.CharField(max_length=50, unique=True, verbose_name="IMEI / Serial Number")
     
     # 2. WIPE CERTIFICATION FIELDS (The Proof)
-    mint_date = models.DateTimeField(auto_now_add=True)
+    mint_date = models.DateTimeField(default=timezone.now, editable=False) # Set before hashing, and hashed as stored
     wipe_standard = models.CharField(max_length=100) # e.g., "Web-Triggered Free Space Wipe"
     is_certified = models.BooleanField(default=False) 
     
     # 3. DLT/IMMUTABILITY FIELD (The Novelty)
     chain_hash = models.CharField(max_length=64, blank=True)
+
+    # 3b. READ-BACK VERIFICATION (what the wipe verifier actually checked)
+    verification_coverage = models.FloatField(null=True, blank=True)  # fraction of the target read back
+    verification_mismatches = models.PositiveIntegerField(null=True, blank=True)  # None: pattern not reproducible
+    verification_digest = models.CharField(max_length=64, blank=True)
+
+    # 4. LEDGER POSITION (see ledger.py): link to the previous head + Merkle leaf number
+    prev_hash = models.CharField(max_length=64, blank=True)
+    leaf_index = models.PositiveBigIntegerField(null=True, blank=True, unique=True, editable=False)
     
-    # Method to generate the hash before saving (DLT Simulation)
-    def save(self, *args, **kwargs):
+    # 5. HASH FORMAT (1: legacy, not recomputable; 2: hashing.canonical_payload of stored fields)
+    hash_version = models.PositiveSmallIntegerField(default=HASH_VERSION, editable=False)
+
+    # 6. HUB SIGNATURE (Ed25519 over the chain_hash; empty when signing is not configured, see signing.py)
+    signature = models.CharField(max_length=128, blank=True, editable=False)
+    signing_key_id = models.CharField(max_length=16, blank=True, editable=False)
+
+    # 7. SEARCH KEY (case-folded serial for prefix search, see search.py; not hashed)
+    serial_folded = models.CharField(max_length=50, blank=True, editable=False, db_index=True)
+    
+    def hash_payload(self):
+        return canonical_payload(
+            self.imei_serial, self.mint_date, self.is_certified, self.wipe_standard, self.prev_hash,
+            self.verification_coverage, self.verification_mismatches, self.verification_digest,
+        )
+
+    # Generates the DLT hash. Kept separate from save() because bulk_create() skips save().
+    def assign_chain_hash(self):
         if not self.chain_hash:
-            data_to_hash = {
-                'imei': self.imei_serial,
-                'date': timezone.now().isoformat(),
-                'certified': self.is_certified,
-                'standard': self.wipe_standard
-            }
-            json_string = json.dumps(data_to_hash, sort_keys=True)
-            self.chain_hash = sha256(json_string.encode('utf-8')).hexdigest()
-        
+            self.hash_version = HASH_VERSION
+            self.chain_hash = chain_hash(self.hash_payload())
+        return self.chain_hash
+
+    # New passports are appended to the ledger (chain + Merkle tree); existing ones save normally.
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.leaf_index is None:
+            from .ledger import append  # Local import: ledger.py imports this module
+            append([self])
+            self._state.adding = False
+            return
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Passport for {self.imei_serial}"
 
 
+class MerkleNode(models.Model):
+    # Root of the complete subtree covering leaves [index * 2**level, (index + 1) * 2**level)
+    level = models.PositiveSmallIntegerField()
+    index = models.PositiveBigIntegerField()
+    hash = models.CharField(max_length=64)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['level', 'index'], name='unique_merkle_node'),
+        ]
+
+    def __str__(self):
+        return f"Merkle node L{self.level}#{self.index}"
+
+
 class EventLog(models.Model):
     # Link this event to a specific passport
     passport = models.ForeignKey(DigitalPassport, on_delete=models.CASCADE, related_name='events')
@@ -42,6 +85,90 @@ class EventLog(models.Model):
     event_type = models.CharField(max_length=50) 
     event_data = models.JSONField() 
     timestamp = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Serves keyset pagination of one passport's history (pagination.py)
+            models.Index(fields=['passport', 'timestamp', 'id'], name='eventlog_passport_ts_id'),
+        ]
     
     def __str__(self):
-        return f"{self.event_type} on {self.passport.imei_serial}"
\ No newline at end of file
+        return f"{self.event_type} on {self.passport.imei_serial}"
+
+
+class WipeJob(models.Model):
+    # A wipe-and-mint run executed by the hub's local worker pool (see jobs.py)
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATE_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (SUCCEEDED, 'Succeeded'), (FAILED, 'Failed')]
+    ACTIVE_STATES = (QUEUED, RUNNING)
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    state = models.CharField(max_length=16, choices=STATE_CHOICES, default=QUEUED)
+
+    # Request parameters
+    device_id = models.CharField(max_length=50)
+    target_drive = models.CharField(max_length=100)
+    algorithm = models.CharField(max_length=16)
+    user_dir = models.CharField(max_length=255)
+
+    # Progress (updated by the worker at most once per progress interval)
+    pass_index = models.PositiveSmallIntegerField(default=0)
+    pass_count = models.PositiveSmallIntegerField(default=0)
+    pass_label = models.CharField(max_length=32, blank=True)
+    bytes_done = models.PositiveBigIntegerField(default=0)
+    bytes_total = models.PositiveBigIntegerField(default=0)
+    throughput = models.FloatField(default=0.0)  # bytes/sec
+
+    # Outcome
+    wipe_log = models.TextField(blank=True)
+    error = models.TextField(blank=True)
+    passport = models.ForeignKey(DigitalPassport, null=True, blank=True, on_delete=models.SET_NULL, related_name='wipe_jobs')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def percent(self):
+        if self.state == self.SUCCEEDED:
+            return 100.0
+        return 100.0 * self.bytes_done / self.bytes_total if self.bytes_total else 0.0
+
+    @property
+    def eta_seconds(self):
+        if self.state != self.RUNNING or not self.throughput:
+            return None
+        return max(self.bytes_total - self.bytes_done, 0) / self.throughput
+
+    def __str__(self):
+        return f"Wipe job {self.id} ({self.state})"
+
+
+class IdempotencyKey(models.Model):
+    # Replayable outcome of a mint sent with an Idempotency-Key header (see coalescer.py)
+    key = models.CharField(max_length=64, primary_key=True)  # sha256 of the client's key: fixed size, any key length
+    fingerprint = models.CharField(max_length=64)  # sha256 of the validated payload; reuse with another payload is refused
+    status_code = models.PositiveSmallIntegerField()
+    response = models.JSONField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Idempotency key {self.key[:12]}… ({self.status_code})"
+
+
+class SerialSegment(models.Model):
+    # Pigeonhole index for fuzzy serial search: the case-folded serial cut into search.SEGMENTS pieces (search.py)
+    length = models.PositiveSmallIntegerField()  # of the whole folded serial: piece boundaries depend on it
+    position = models.PositiveSmallIntegerField()
+    text = models.CharField(max_length=50)
+    passport = models.ForeignKey(DigitalPassport, on_delete=models.CASCADE, related_name='segments')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['length', 'position', 'text'], name='serialsegment_lookup'),
+        ]
+
+    def __str__(self):
+        return f"Segment {self.position} '{self.text}' of passport {self.passport_id}"
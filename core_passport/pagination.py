@@ -0,0 +1,52 @@
+# core_passport/pagination.py
+#
+# Keyset (cursor) pagination of a passport's event history.
+#
+# Pages are ordered by (timestamp, id) and each page starts strictly after
+# the last row of the previous one, so the (passport, timestamp, id) index
+# answers every page with one range scan. Unlike OFFSET, the cost does not
+# grow with how deep into a long history the page is.
+
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+from .models import EventLog
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(event):
+    raw = f"{event.timestamp.isoformat()}|{event.id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        timestamp, event_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(event_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {e}") from e
+
+
+def events_page(passport_id, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Returns (events, next_cursor) for one page of a passport's history, oldest first."""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    queryset = EventLog.objects.filter(passport_id=passport_id)
+    if cursor:
+        timestamp, event_id = decode_cursor(cursor)
+        queryset = queryset.filter(Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=event_id))
+
+    # One extra row tells us whether there is a next page without a COUNT(*)
+    events = list(queryset.order_by('timestamp', 'id')[:limit + 1])
+    if len(events) > limit:
+        events = events[:limit]
+        return events, encode_cursor(events[-1])
+    return events, None
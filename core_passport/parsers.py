@@ -0,0 +1,37 @@
+# core_passport/parsers.py
+
+import json
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+def iter_ndjson(stream, encoding='utf-8'):
+    """Yields (line_number, object) pairs from a newline-delimited JSON stream.
+
+    Blank lines are skipped. A line that is not valid JSON yields a ValueError
+    instead of an object, so callers can reject that one line and keep going.
+    """
+    for line_number, raw_line in enumerate(stream, start=1):
+        line = raw_line.strip()
+        if not line:
+            continue
+        try:
+            yield line_number, json.loads(line.decode(encoding) if isinstance(line, bytes) else line)
+        except (ValueError, UnicodeDecodeError) as e:
+            yield line_number, ValueError(f"Line {line_number}: {e}")
+
+
+class NDJSONParser(BaseParser):
+    """Parses an `application/x-ndjson` body into a list of objects (one per line)."""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', 'utf-8')
+        items = []
+        for line_number, item in iter_ndjson(stream, encoding):
+            if isinstance(item, ValueError):
+                raise ParseError(f"NDJSON parse error - {item}")
+            items.append(item)
+        return items
@@ -0,0 +1,101 @@
+# core_passport/progress.py
+#
+# In-process fan-out of wipe job progress to watchers (SSE streams).
+#
+# Worker threads publish the latest snapshot per job; any number of watchers
+# on the ASGI event loop wait on an asyncio.Event, so watching costs no thread.
+# Under WSGI each stream holds its request thread and waits on a
+# threading.Event instead (wait_sync).
+# Watchers only ever see the newest snapshot: a slow browser tab skips
+# intermediate updates instead of queueing them.
+
+import asyncio
+import threading
+from collections import OrderedDict
+
+MAX_TRACKED_JOBS = 1000
+
+
+class ProgressBroker:
+    """Latest progress snapshot per job, with thread-safe publish and async wait."""
+
+    def __init__(self, max_jobs=MAX_TRACKED_JOBS):
+        self._lock = threading.Lock()
+        self._snapshots = OrderedDict()  # job_id -> (version, snapshot)
+        self._waiters = {}  # job_id -> set of (loop, asyncio.Event), or (None, threading.Event) for wait_sync
+        self._max_jobs = max_jobs
+
+    def publish(self, job_id, snapshot):
+        """Stores `snapshot` as the newest state of `job_id` and wakes its watchers (any thread)."""
+        job_id = str(job_id)
+        with self._lock:
+            version = self._snapshots.pop(job_id, (0, None))[0] + 1
+            self._snapshots[job_id] = (version, snapshot)
+            while len(self._snapshots) > self._max_jobs:
+                self._snapshots.popitem(last=False)
+            waiters = list(self._waiters.get(job_id, ()))
+        for loop, event in waiters:
+            if loop is None:
+                event.set()
+            else:
+                loop.call_soon_threadsafe(event.set)
+
+    def latest(self, job_id):
+        """Returns (version, snapshot) or None if this process has not seen the job."""
+        with self._lock:
+            return self._snapshots.get(str(job_id))
+
+    async def wait(self, job_id, after_version, timeout):
+        """Waits up to `timeout` seconds for a snapshot newer than `after_version`.
+
+        Returns (version, snapshot), or None on timeout.
+        """
+        job_id = str(job_id)
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        current = self._watch(job_id, after_version, waiter)
+        if current is not None:
+            return current
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._unwatch(job_id, waiter)
+        return self._newer(job_id, after_version)
+
+    def wait_sync(self, job_id, after_version, timeout):
+        """Blocking wait() for WSGI threads."""
+        job_id = str(job_id)
+        waiter = (None, threading.Event())
+        current = self._watch(job_id, after_version, waiter)
+        if current is not None:
+            return current
+        try:
+            waiter[1].wait(timeout)
+        finally:
+            self._unwatch(job_id, waiter)
+        return self._newer(job_id, after_version)
+
+    def _watch(self, job_id, after_version, waiter):
+        """Registers `waiter`, unless a newer snapshot is already there (then returns it)."""
+        with self._lock:
+            current = self._snapshots.get(job_id)
+            if current and current[0] > after_version:
+                return current
+            self._waiters.setdefault(job_id, set()).add(waiter)
+        return None
+
+    def _unwatch(self, job_id, waiter):
+        with self._lock:
+            watchers = self._waiters.get(job_id)
+            if watchers is not None:
+                watchers.discard(waiter)
+                if not watchers:
+                    del self._waiters[job_id]
+
+    def _newer(self, job_id, after_version):
+        current = self.latest(job_id)
+        return current if current and current[0] > after_version else None
+
+
+broker = ProgressBroker()
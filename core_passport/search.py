@@ -0,0 +1,166 @@
+# core_passport/search.py
+#
+# Prefix and approximate search over device serials.
+#
+# Both work on the case-folded serial (DigitalPassport.serial_folded), so
+# `sn-abc` finds `SN-ABC-1234` either way. Prefix matches are a range scan on
+# its index (folded >= prefix AND folded < prefix-with-last-char-bumped),
+# which, unlike LIKE on SQLite, can use the index.
+#
+# Approximate matches use a pigeonhole index (SerialSegment): every serial is
+# cut into SEGMENTS pieces, and k edits can break at most k of them, so a
+# serial within k edits of the query has one of any k + 1 pieces intact, at
+# most k characters away from where it sits in the serial. The query looks
+# up those exact (length, position, text) keys for the last k + 1 pieces
+# only: serial heads are manufacturer/model codes (an IMEI's TAC) shared by
+# huge numbers of devices, while the tails are nearly unique. Candidates are
+# then ranked by edit distance. Digit-only serials are no problem (unlike
+# trigrams, of which there are only 1000), and indexing costs SEGMENTS rows
+# per passport. One edit is always answered from tail pieces; from two edits
+# on, a query whose tail is broken twice is answered through a head piece,
+# and costs one banded edit-distance check per device sharing that head.
+
+from django.db.models import Q
+
+from .models import DigitalPassport, SerialSegment
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+DEFAULT_MAX_DISTANCE = 2
+SEGMENTS = 4
+MAX_DISTANCE = SEGMENTS - 1  # the pigeonhole bound: beyond it no piece is guaranteed intact
+MAX_CANDIDATES = 20000  # work cap per query; the response says when it cut the search short
+
+
+def normalize(serial):
+    return serial.strip().lower()
+
+
+def boundaries(length):
+    """Start offsets of the SEGMENTS pieces of a serial of `length`, plus its end."""
+    return [length * i // SEGMENTS for i in range(SEGMENTS + 1)]
+
+
+def segments(serial):
+    """[(position, text)] pieces of a folded serial."""
+    bounds = boundaries(len(serial))
+    return [(i, serial[bounds[i]:bounds[i + 1]]) for i in range(SEGMENTS)]
+
+
+def fold_serials(passports):
+    """Sets the search key of unsaved passports (called by ledger.append)."""
+    for passport in passports:
+        passport.serial_folded = normalize(passport.imei_serial)
+
+
+def index_serials(passports):
+    """Adds saved passports to the segment index (called by ledger.append)."""
+    SerialSegment.objects.bulk_create(
+        SerialSegment(length=len(passport.serial_folded), position=position, text=text, passport_id=passport.pk)
+        for passport in passports
+        for position, text in segments(passport.serial_folded)
+    )
+
+
+def levenshtein(a, b, limit=None):
+    """Edit distance between a and b; stops early and returns limit + 1 once it exceeds `limit`.
+
+    A shared prefix and suffix are stripped first (serials of one model share
+    long heads). With a limit only the diagonal band |i - j| <= limit is
+    computed, and a character-count lower bound rejects most non-matches
+    before any DP.
+    """
+    start, end = 0, 0
+    while start < min(len(a), len(b)) and a[start] == b[start]:
+        start += 1
+    while end < min(len(a), len(b)) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is None:
+        limit = len(a)
+    elif len(a) - len(b) > limit:
+        return limit + 1
+    elif sum(max(a.count(c) - b.count(c), 0) for c in set(a)) > limit:
+        return limit + 1  # every surplus character of the longer string costs an edit
+    over = limit + 1
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i, ca in enumerate(a, start=1):
+        current = [over] * (len(b) + 1)
+        if i <= limit:
+            current[0] = i
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != b[j - 1]), over)
+        if min(current) > limit:
+            return over
+        previous = current
+    return previous[-1]
+
+
+def _prefix_upper_bound(prefix):
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def prefix_matches(query, limit):
+    folded = normalize(query)
+    return list(
+        DigitalPassport.objects.filter(serial_folded__gte=folded, serial_folded__lt=_prefix_upper_bound(folded))
+        .order_by('serial_folded', 'imei_serial').values_list('imei_serial', flat=True)[:limit]
+    )
+
+
+def segment_lookup(query, max_distance):
+    """Q over SerialSegment matching every serial within `max_distance` edits of the folded `query`."""
+    n = len(query)
+    condition = Q()
+    for length in range(max(1, n - max_distance), n + max_distance + 1):
+        bounds = boundaries(length)
+        for position in range(SEGMENTS - max_distance - 1, SEGMENTS):
+            start, size = bounds[position], bounds[position + 1] - bounds[position]
+            texts = {query[s:s + size] for s in range(max(0, start - max_distance), min(n - size, start + max_distance) + 1)}
+            if texts:
+                condition |= Q(length=length, position=position, text__in=sorted(texts))
+    return condition
+
+
+def fuzzy_matches(query, limit, max_distance):
+    """([(serial, distance)] within `max_distance` edits (at most MAX_DISTANCE), best first, complete).
+
+    `complete` is False when more than MAX_CANDIDATES serials had to be
+    checked and only the first MAX_CANDIDATES were.
+    """
+    needle = normalize(query)
+    max_distance = min(max_distance, MAX_DISTANCE)
+    condition = segment_lookup(needle, max_distance)
+    if not condition:
+        return [], True
+    candidates = list(
+        SerialSegment.objects.filter(condition)
+        .values_list('passport__imei_serial', flat=True).distinct()[:MAX_CANDIDATES + 1]
+    )
+    complete = len(candidates) <= MAX_CANDIDATES
+    ranked = []
+    for serial in candidates[:MAX_CANDIDATES]:
+        distance = levenshtein(needle, normalize(serial), max_distance)
+        if distance <= max_distance:
+            ranked.append((serial, distance))
+    ranked.sort(key=lambda r: (r[1], r[0]))
+    return ranked[:limit], complete
+
+
+def search(query, limit=DEFAULT_LIMIT, max_distance=DEFAULT_MAX_DISTANCE):
+    """(ranked matches, complete) for a partial or mistyped serial: prefix hits first, then fuzzy ones."""
+    query = query.strip()
+    if not query:
+        return [], True
+    results, seen, complete = [], set(), True
+    for serial in prefix_matches(query, limit):
+        seen.add(serial)
+        results.append({"imei": serial, "match": "prefix", "distance": 0})
+    if len(results) < limit and max_distance > 0:
+        fuzzy, complete = fuzzy_matches(query, limit, max_distance)
+        for serial, distance in fuzzy:
+            if serial not in seen and len(results) < limit:
+                results.append({"imei": serial, "match": "fuzzy", "distance": distance})
+    return results, complete
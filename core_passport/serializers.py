@@ -1,13 +1,16 @@
 # core_passport/serializers.py
 
 from rest_framework import serializers
-from .models import DigitalPassport 
+from .models import DigitalPassport, EventLog 
 
 class PassportMintSerializer(serializers.Serializer):
     imei_serial = serializers.CharField(max_length=50)
     wipe_status = serializers.CharField(max_length=50) 
     wipe_standard = serializers.CharField(max_length=100)
     verification_log = serializers.CharField(required=False, allow_blank=True) 
+    verification_coverage = serializers.FloatField(required=False, allow_null=True, min_value=0.0, max_value=1.0)
+    verification_mismatches = serializers.IntegerField(required=False, allow_null=True, min_value=0)
+    verification_digest = serializers.RegexField(r'^[0-9a-f]{64}$', required=False, allow_blank=True)
 
     def validate_wipe_status(self, value):
         """Custom validation to ensure the wipe was successful."""
@@ -15,10 +18,49 @@ class PassportMintSerializer(serializers.Serializer):
             raise serializers.ValidationError("Wipe process reported failure.")
         return value
 
-    def create(self, validated_data):
-        passport = DigitalPassport.objects.create(
+    def validate_verification_mismatches(self, value):
+        """A wipe whose read-back found unwiped blocks cannot be certified."""
+        if value:
+            raise serializers.ValidationError(f"Verification found {value} mismatched block(s).")
+        return value
+
+    MINTED_FIELDS = ('wipe_standard', 'verification_coverage', 'verification_mismatches', 'verification_digest')
+
+    @classmethod
+    def minted_values(cls, validated_data):
+        """The values build_passport() stores, comparable with values_list(*MINTED_FIELDS)."""
+        defaults = {'verification_digest': ''}
+        return tuple(validated_data.get(name, defaults.get(name)) for name in cls.MINTED_FIELDS)
+
+    @staticmethod
+    def build_passport(validated_data):
+        """Returns an unsaved passport so batch minting can bulk_create() it."""
+        return DigitalPassport(
             imei_serial=validated_data['imei_serial'],
             is_certified=True,
-            wipe_standard=validated_data['wipe_standard']
+            wipe_standard=validated_data['wipe_standard'],
+            verification_coverage=validated_data.get('verification_coverage'),
+            verification_mismatches=validated_data.get('verification_mismatches'),
+            verification_digest=validated_data.get('verification_digest', ''),
+        )
+
+    def create(self, validated_data):
+        passport = self.build_passport(validated_data)
+        passport.save(force_insert=True)
+        return passport
+
+
+class EventIngestSerializer(serializers.Serializer):
+    """One line of an NDJSON event upload (diagnosis, transfer, grading, ...)."""
+    imei_serial = serializers.CharField(max_length=50)
+    event_type = serializers.CharField(max_length=50)
+    event_data = serializers.DictField(required=False, default=dict)
+
+    @staticmethod
+    def build_event(validated_data, passport_id):
+        """Returns an unsaved EventLog so ingestion can bulk_create() it."""
+        return EventLog(
+            passport_id=passport_id,
+            event_type=validated_data['event_type'],
+            event_data=validated_data['event_data'],
         )
-        return passport
\ No newline at end of file
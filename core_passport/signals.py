@@ -0,0 +1,22 @@
+# core_passport/signals.py
+
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_passport_detail
+from .metrics import instrument_connection
+from .models import EventLog
+
+
+@receiver(post_save, sender=EventLog)
+@receiver(post_delete, sender=EventLog)
+def event_log_changed(sender, instance, **kwargs):
+    """A new (or removed) event changes the passport's history, so its cached page is stale."""
+    invalidate_passport_detail([instance.passport.imei_serial])
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    """Counts this connection's queries towards the request being served (metrics.py)."""
+    instrument_connection(connection)
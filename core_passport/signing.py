@@ -0,0 +1,90 @@
+# core_passport/signing.py
+#
+# Ed25519 signatures over passport chain hashes, so a certificate can be
+# checked offline against the hub's public key (see certverify.py).
+#
+# Uses the optional `cryptography` package, imported lazily. Without it, or
+# without a key, passports are still minted, just unsigned (empty signature).
+
+import os
+import threading
+
+from django.conf import settings
+
+from .hashing import key_id, signed_message
+
+_key = None  # (private key, raw public key bytes, key id) once loaded; False when signing is unavailable
+_key_lock = threading.Lock()
+
+
+def _load():
+    try:
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+    except ImportError:
+        print("Passport signing disabled: the 'cryptography' package is not installed.")
+        return False
+
+    path = getattr(settings, 'DDP_SIGNING_KEY_PATH', None)
+    if not path or not os.path.exists(path):
+        print(f"Passport signing disabled: no key at {path} (run `manage.py generate_signing_key`).")
+        return False
+
+    with open(path, 'rb') as f:
+        private_key = serialization.load_pem_private_key(f.read(), password=None)
+    if not isinstance(private_key, Ed25519PrivateKey):
+        print(f"Passport signing disabled: {path} is not an Ed25519 key.")
+        return False
+    raw_public = private_key.public_key().public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+    return private_key, raw_public, key_id(raw_public)
+
+
+def generate_key(path):
+    """Writes a new Ed25519 private key (PKCS8 PEM, mode 0600); refuses to overwrite one."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+    pem = Ed25519PrivateKey.generate().private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption(),
+    )
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(pem)
+
+
+def _signing_key():
+    global _key
+    if _key is None:
+        with _key_lock:
+            if _key is None:
+                _key = _load()
+    return _key
+
+
+def reset():
+    """Forgets the loaded key (tests, key rotation)."""
+    global _key
+    with _key_lock:
+        _key = None
+
+
+def sign(chain_hash):
+    """(signature hex, key id) for a chain hash, or ('', '') when signing is unavailable."""
+    key = _signing_key()
+    if not key:
+        return '', ''
+    private_key, _, kid = key
+    return private_key.sign(signed_message(chain_hash)).hex(), kid
+
+
+def public_key():
+    """{'key_id', 'public_key_hex', 'public_key_pem'} or None when signing is unavailable."""
+    key = _signing_key()
+    if not key:
+        return None
+    from cryptography.hazmat.primitives import serialization
+    private_key, raw_public, kid = key
+    pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    return {"key_id": kid, "public_key_hex": raw_public.hex(), "public_key_pem": pem.decode('ascii')}
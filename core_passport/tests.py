@@ -1,3 +1,728 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import threading
+import tempfile
+import unittest
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .models import DigitalPassport, EventLog, WipeJob
+
+
+def mint_payload(imei, **overrides):
+    payload = {
+        "imei_serial": imei,
+        "wipe_status": "SUCCESS",
+        "wipe_standard": "NIST SP 800-88 Purge",
+        "verification_log": "test",
+    }
+    payload.update(overrides)
+    return payload
+
+
+class BatchMintTests(TestCase):
+    url = '/api/v1/mint/batch/'
+
+    def test_per_item_statuses(self):
+        DigitalPassport.objects.create(imei_serial="EXISTING", wipe_standard="x", is_certified=True)
+        items = [
+            mint_payload("NEW-1"),
+            mint_payload("EXISTING"),
+            mint_payload("NEW-1"),
+            mint_payload("BAD", wipe_status="FAILURE"),
+            mint_payload("NEW-2"),
+        ]
+        response = self.client.post(self.url, json.dumps(items), content_type='application/json')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([r['status'] for r in response.json()['results']], [201, 409, 409, 400, 201])
+        self.assertEqual(response.json()['minted'], 2)
+        hashes = DigitalPassport.objects.filter(imei_serial__in=["NEW-1", "NEW-2"]).values_list('chain_hash', flat=True)
+        self.assertTrue(all(len(h) == 64 for h in hashes))
+
+    def test_conflicts_tell_a_resend_from_a_different_certificate(self):
+        self.client.post(self.url, json.dumps([mint_payload("SENT")]), content_type='application/json')
+        items = [mint_payload("SENT"), mint_payload("SENT", wipe_standard="Other")]
+        response = self.client.post(self.url, json.dumps(items), content_type='application/json')
+        self.assertEqual([r['same_payload'] for r in response.json()['results']], [True, False])
+
+    def test_mismatched_verification_is_rejected(self):
+        items = [mint_payload("VERIFIED", verification_mismatches=0, verification_coverage=0.02),
+                 mint_payload("RESIDUE", verification_mismatches=3)]
+        response = self.client.post(self.url, json.dumps(items), content_type='application/json')
+        self.assertEqual([r['status'] for r in response.json()['results']], [201, 400])
+        self.assertEqual(DigitalPassport.objects.get(imei_serial="VERIFIED").verification_coverage, 0.02)
+
+    def test_ndjson_body(self):
+        body = "\n".join(json.dumps(mint_payload(f"ND-{i}")) for i in range(3)) + "\n"
+        response = self.client.post(self.url, body, content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(DigitalPassport.objects.filter(imei_serial__startswith="ND-").count(), 3)
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        def queries_for(prefix, size):
+            items = [mint_payload(f"{prefix}-{i}") for i in range(size)]
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.post(self.url, json.dumps(items), content_type='application/json')
+            return len(ctx.captured_queries)
+
+        queries_for("WARMUP", 1)  # the first append to an empty tree skips the frontier lookup
+        self.assertEqual(queries_for("SMALL", 5), queries_for("LARGE", 50))
+
+
+class LedgerTests(TestCase):
+
+    def setUp(self):
+        from . import ledger
+        self.ledger = ledger
+        for i in range(6):
+            DigitalPassport.objects.create(imei_serial=f"SINGLE-{i}", wipe_standard="x", is_certified=True)
+        self.client.post('/api/v1/mint/batch/', json.dumps([mint_payload(f"BATCH-{i}") for i in range(7)]),
+                         content_type='application/json')
+        self.passports = list(DigitalPassport.objects.order_by('leaf_index'))
+
+    def naive_root(self, size):
+        hashes = [self.ledger.leaf_hash(p.chain_hash) for p in self.passports[:size]]
+
+        def mth(items):
+            if len(items) == 1:
+                return items[0]
+            k = self.ledger._split(len(items))
+            return self.ledger.node_hash(mth(items[:k]), mth(items[k:]))
+        return mth(hashes).hex()
+
+    def test_chain_links_previous_head(self):
+        self.assertEqual([p.leaf_index for p in self.passports], list(range(13)))
+        self.assertEqual(self.passports[0].prev_hash, '')
+        for prev, passport in zip(self.passports, self.passports[1:]):
+            self.assertEqual(passport.prev_hash, prev.chain_hash)
+
+    def test_inclusion_proofs_verify_for_every_size(self):
+        for size in range(1, 14):
+            root = self.ledger.root_hash(size)
+            self.assertEqual(root, self.naive_root(size))
+            for passport in self.passports[:size]:
+                path = self.ledger.inclusion_proof(passport.leaf_index, size)
+                self.assertTrue(self.ledger.verify_inclusion(passport.chain_hash, passport.leaf_index, size, path, root))
+
+    def test_consistency_proofs_verify(self):
+        for second in range(1, 14):
+            for first in range(1, second + 1):
+                proof = self.ledger.consistency_proof(first, second)
+                self.assertTrue(self.ledger.verify_consistency(
+                    first, second, self.ledger.root_hash(first), self.ledger.root_hash(second), proof))
+
+    def test_proof_endpoint(self):
+        response = self.client.get('/api/v1/ledger/proof/BATCH-3/?tree_size=12')
+        data = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(self.ledger.verify_inclusion(
+            data['chain_hash'], data['leaf_index'], data['tree_size'], data['audit_path'], data['root_hash']))
+        self.assertEqual(self.client.get('/api/v1/ledger/consistency/?first=20').status_code, 400)
+
+
+@override_settings(DDP_WIPE_JOBS_EAGER=True, DDP_WIPE_BLOCK_SIZE=4096, DDP_WIPE_FREE_SPACE_LIMIT=3 * 4096)
+class WipeJobTests(TestCase):
+
+    def start(self, user_dir, algorithm='DOD'):
+        return self.client.post('/api/v1/mint/local-wipe-and-mint/', json.dumps({
+            "device_id": "JOB", "target_drive": "/dev/sdb", "algorithm": algorithm, "user_dir": user_dir,
+        }), content_type='application/json')
+
+    def test_job_mints_after_successful_wipe(self):
+        with tempfile.TemporaryDirectory() as user_dir:
+            response = self.start(user_dir + os.sep)
+        self.assertEqual(response.status_code, 202)
+
+        job = self.client.get(response.json()['status_url']).json()
+        self.assertEqual(job['state'], WipeJob.SUCCEEDED)
+        self.assertEqual(job['progress']['pass_count'], 3)
+        self.assertEqual(job['progress']['percent'], 100.0)
+        passport = DigitalPassport.objects.get(imei_serial="JOB-devsdb")
+        self.assertEqual(job['passport_hash'], passport.chain_hash)
+        self.assertEqual(passport.verification_coverage, 1.0)
+        self.assertEqual(len(passport.verification_digest), 64)
+
+    def test_resume_command_reruns_jobs_left_running(self):
+        from django.core.management import call_command
+        from io import StringIO
+        with tempfile.TemporaryDirectory() as user_dir:
+            job = WipeJob.objects.create(device_id="CRASHED", target_drive="/dev/sdc", algorithm="QUICK",
+                                         user_dir=user_dir + os.sep, state=WipeJob.RUNNING)
+            with override_settings(DDP_WIPE_JOURNAL_DIR=os.path.join(user_dir, "journals")):
+                call_command('resume_wipe_jobs', stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.state, WipeJob.SUCCEEDED)
+        self.assertEqual(job.passport.imei_serial, "CRASHED-devsdc")
+
+    def test_directory_already_being_wiped_is_refused(self):
+        with tempfile.TemporaryDirectory() as user_dir:
+            running = WipeJob.objects.create(device_id="BUSY", target_drive="/dev/sde", algorithm="QUICK",
+                                             user_dir=user_dir + os.sep, state=WipeJob.RUNNING)
+            response = self.start(os.path.join(user_dir, '.', ''))
+            self.assertEqual(response.status_code, 409)
+            self.assertIn(str(running.pk), response.json()['detail'])
+
+            running.state = WipeJob.SUCCEEDED
+            running.save()
+            self.assertEqual(self.start(user_dir).status_code, 202)
+
+    def test_failed_wipe_mints_nothing(self):
+        response = self.start('/nonexistent/ddp-test-dir/')
+        job = self.client.get(response.json()['status_url']).json()
+        self.assertEqual(job['state'], WipeJob.FAILED)
+        self.assertIsNone(job['passport_hash'])
+        self.assertFalse(DigitalPassport.objects.exists())
+
+    def test_unexpected_error_fails_the_job(self):
+        from io import StringIO
+        from unittest.mock import patch
+        with tempfile.TemporaryDirectory() as user_dir, \
+                patch('ddp_wipe.engine.WipeEngine.wipe_free_space', side_effect=RuntimeError("bad disk")), \
+                patch('sys.stdout', StringIO()), patch('sys.stderr', StringIO()):
+            response = self.start(user_dir)
+        job = self.client.get(response.json()['status_url']).json()
+        self.assertEqual(job['state'], WipeJob.FAILED)
+        self.assertIn("bad disk", job['error'])
+
+
+class ProgressStreamTests(TestCase):
+
+    def test_broker_wakes_async_watcher_from_another_thread(self):
+        from .progress import ProgressBroker
+        broker = ProgressBroker()
+
+        async def watch():
+            timer = threading.Timer(0.05, broker.publish, args=("job-1", {"state": "running"}))
+            timer.start()
+            return await broker.wait("job-1", 0, timeout=5)
+
+        self.assertEqual(asyncio.run(watch()), (1, {"state": "running"}))
+
+    def test_broker_wait_times_out_without_news(self):
+        from .progress import ProgressBroker
+        self.assertIsNone(asyncio.run(ProgressBroker().wait("job-2", 0, timeout=0.01)))
+
+    @override_settings(DDP_WIPE_JOBS_EAGER=True, DDP_WIPE_BLOCK_SIZE=4096, DDP_WIPE_FREE_SPACE_LIMIT=4096)
+    async def test_stream_ends_with_terminal_snapshot(self):
+        with tempfile.TemporaryDirectory() as user_dir:
+            response = await self.async_client.post('/api/v1/mint/local-wipe-and-mint/', json.dumps({
+                "device_id": "SSE", "algorithm": "QUICK", "user_dir": user_dir + os.sep,
+            }), content_type='application/json')
+        stream = await self.async_client.get(response.json()['stream_url'])
+        body = b"".join([chunk async for chunk in stream.streaming_content]).decode()
+
+        self.assertEqual(stream['Content-Type'], 'text/event-stream')
+        frames = [json.loads(line[len("data: "):]) for line in body.splitlines() if line.startswith("data: ")]
+        self.assertEqual(frames[-1]['state'], WipeJob.SUCCEEDED)
+        self.assertTrue(frames[-1]['passport_hash'])
+
+    def test_wsgi_stream_sends_frames_while_the_job_runs(self):
+        from .progress import broker
+        job = WipeJob.objects.create(device_id="SSE-WSGI", target_drive="/dev/sdd", algorithm="QUICK",
+                                     user_dir="/tmp/", state=WipeJob.RUNNING)
+        stream = self.client.get(f'/api/v1/jobs/{job.pk}/stream/')
+        frames = iter(stream.streaming_content)
+
+        first = json.loads(next(frames).decode().split("data: ", 1)[1])
+        self.assertEqual(first['state'], WipeJob.RUNNING)
+        threading.Timer(0.05, broker.publish, args=(job.pk, {"state": WipeJob.SUCCEEDED})).start()
+        last = json.loads(next(frames).decode().split("data: ", 1)[1])
+        self.assertEqual(last['state'], WipeJob.SUCCEEDED)
+        self.assertEqual(list(frames), [])
+        stream.close()
+
+
+class PassportDetailCacheTests(TestCase):
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.passport = DigitalPassport.objects.create(imei_serial="CACHED-1", wipe_standard="x", is_certified=True)
+        self.url = '/api/v1/view/CACHED-1/'
+
+    def test_repeat_and_conditional_views_cost_no_queries(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('ETag', first)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).content, first.content)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+
+    def test_new_event_invalidates_page(self):
+        first = self.client.get(self.url)
+        EventLog.objects.create(passport=self.passport, event_type="TRANSFER", event_data={"description": "Sold to buyer"})
+
+        second = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertContains(second, "Sold to buyer")
+
+    def test_unknown_passport_is_404(self):
+        self.assertEqual(self.client.get('/api/v1/view/NOPE/').status_code, 404)
+
+
+class EventHistoryPaginationTests(TestCase):
+
+    def setUp(self):
+        self.passport = DigitalPassport.objects.create(imei_serial="HISTORY-1", wipe_standard="x", is_certified=True)
+        EventLog.objects.bulk_create(
+            EventLog(passport=self.passport, event_type="DIAGNOSIS", event_data={"description": f"check {i}"})
+            for i in range(7)
+        )
+        # Identical timestamps must still page deterministically (tie-break on id)
+        EventLog.objects.filter(passport=self.passport).update(timestamp=self.passport.mint_date)
+        self.url = '/api/v1/passports/HISTORY-1/events/'
+
+    def test_cursor_walks_whole_history_once(self):
+        seen, cursor, pages = [], None, 0
+        while True:
+            params = {'limit': 3, **({'cursor': cursor} if cursor else {})}
+            with self.assertNumQueries(2):
+                page = self.client.get(self.url, params).json()
+            seen += [e['event_data']['description'] for e in page['events']]
+            pages += 1
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(pages, 3)
+        self.assertEqual(seen, [f"check {i}" for i in range(7)])
+
+    def test_bad_cursor_and_unknown_passport(self):
+        self.assertEqual(self.client.get(self.url, {'cursor': '!!!'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/passports/NOPE/events/').status_code, 404)
+
+    @override_settings(DDP_DETAIL_EVENTS_PAGE=5)
+    def test_detail_page_renders_first_page_only(self):
+        from django.core.cache import cache
+        cache.clear()
+        response = self.client.get('/api/v1/view/HISTORY-1/')
+        self.assertContains(response, "check 4")
+        self.assertNotContains(response, "check 5")
+        self.assertContains(response, 'id="load-more"')
+
+    @override_settings(DDP_DETAIL_EVENTS_PAGE=3)
+    def test_load_more_fetches_newer_events(self):
+        from datetime import timedelta
+        from django.core.cache import cache
+        cache.clear()
+        for i, event in enumerate(EventLog.objects.filter(passport=self.passport).order_by('id')):
+            EventLog.objects.filter(pk=event.pk).update(timestamp=self.passport.mint_date + timedelta(minutes=i))
+        detail = self.client.get('/api/v1/view/HISTORY-1/')
+        self.assertContains(detail, "Load newer history")
+
+        first = self.client.get(self.url, {'limit': 3}).json()
+        second = self.client.get(self.url, {'limit': 3, 'cursor': first['next_cursor']}).json()
+        self.assertLess(max(e['timestamp'] for e in first['events']), min(e['timestamp'] for e in second['events']))
+
+
+@override_settings(DDP_EVENT_INGEST_CHUNK=4)
+class EventIngestTests(TestCase):
+    url = '/api/v1/events/ingest/'
+
+    def setUp(self):
+        for imei in ("RIG-1", "RIG-2"):
+            DigitalPassport.objects.create(imei_serial=imei, wipe_standard="x", is_certified=True)
+
+    def test_streamed_ndjson_is_chunked_and_counted(self):
+        lines = [json.dumps({"imei_serial": f"RIG-{i % 2 + 1}", "event_type": "GRADING",
+                             "event_data": {"description": f"grade {i}"}}) for i in range(10)]
+        lines += [
+            json.dumps({"imei_serial": "UNKNOWN", "event_type": "GRADING"}),
+            json.dumps({"imei_serial": "RIG-1"}),
+            "{not json",
+            "",
+        ]
+        response = self.client.post(self.url, "\n".join(lines), content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['accepted'], response.json()['rejected']), (10, 3))
+        self.assertEqual(sorted(e['line'] for e in response.json()['errors']), [11, 12, 13])
+        self.assertEqual(EventLog.objects.filter(passport__imei_serial="RIG-1").count(), 5)
+
+    def test_body_without_content_length_is_read_or_refused(self):
+        from io import BytesIO
+        from django.test import RequestFactory
+        from .views import EventIngestAPIView
+        body = b"\n".join(json.dumps({"imei_serial": "RIG-1", "event_type": "TRANSFER"}).encode() for _ in range(5))
+
+        def post(**meta):
+            request = RequestFactory().post(self.url, body, content_type='application/x-ndjson', **meta)
+            del request.META['CONTENT_LENGTH']  # chunked transfer: no length up front
+            request.META['wsgi.input'] = BytesIO(body)
+            return EventIngestAPIView.as_view()(request)
+
+        self.assertEqual(post().status_code, 411)
+        self.assertFalse(EventLog.objects.exists())
+        response = post(**{'wsgi.input_terminated': True})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['accepted'], response.data['rejected']), (5, 0))
+
+    def test_queries_per_chunk_not_per_event(self):
+        body = "\n".join(json.dumps({"imei_serial": "RIG-1", "event_type": "TRANSFER"}) for _ in range(8))
+        # 2 chunks x (serial lookup + savepoint + insert + release)
+        with self.assertNumQueries(8):
+            self.client.post(self.url, body, content_type='application/x-ndjson')
+
+    def test_ingest_invalidates_cached_detail_page(self):
+        first = self.client.get('/api/v1/view/RIG-2/')
+        self.client.post(self.url, json.dumps({"imei_serial": "RIG-2", "event_type": "TRANSFER",
+                                               "event_data": {"description": "Shipped"}}),
+                         content_type='application/x-ndjson')
+        self.assertContains(self.client.get('/api/v1/view/RIG-2/', HTTP_IF_NONE_MATCH=first['ETag']), "Shipped")
+
+    def test_requires_ndjson(self):
+        self.assertEqual(self.client.post(self.url, "[]", content_type='application/json').status_code, 415)
+
+
+class LedgerExportTests(TestCase):
+
+    def setUp(self):
+        for i in range(5):
+            passport = DigitalPassport.objects.create(imei_serial=f"EXPORT-{i}", wipe_standard="x", is_certified=True)
+            for j in range(i):
+                EventLog.objects.create(passport=passport, event_type="REPAIR", event_data={"description": f"fix {j}"})
+
+    def read(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_ndjson_export_includes_events(self):
+        records = [json.loads(line) for line in self.read(self.client.get('/api/v1/ledger/export/')).splitlines()]
+        self.assertEqual([r['imei_serial'] for r in records], [f"EXPORT-{i}" for i in range(5)])
+        self.assertEqual([len(r['events']) for r in records], [0, 1, 2, 3, 4])
+
+    def test_incremental_gzip_csv(self):
+        import csv
+        import gzip
+        since_id = DigitalPassport.objects.get(imei_serial="EXPORT-2").id
+        response = self.client.get('/api/v1/ledger/export/', {'format': 'csv', 'gzip': '1', 'since_id': since_id})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        rows = list(csv.DictReader(gzip.decompress(self.read(response)).decode().splitlines()))
+        self.assertEqual([r['imei_serial'] for r in rows], ["EXPORT-3", "EXPORT-4"])
+        self.assertEqual(len(json.loads(rows[1]['events'])), 4)
+
+    def test_reads_in_chunks_with_batched_prefetch(self):
+        from .export import export_stream
+        with self.assertNumQueries(4):  # one chunked passport cursor + one events query per chunk of 2
+            b"".join(export_stream(chunk_size=2))
+
+    def test_management_command_writes_file(self):
+        from django.core.management import call_command
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "ledger.ndjson")
+            call_command('export_ledger', '--since', '2000-01-01', '--output', path)
+            with open(path) as f:
+                self.assertEqual(len(f.readlines()), 5)
+
+
+class LedgerAuditTests(TestCase):
+
+    def setUp(self):
+        for i in range(7):
+            DigitalPassport.objects.create(imei_serial=f"AUDIT-{i}", wipe_standard="x", is_certified=True)
+
+    def audit(self, *args):
+        from django.core.management import call_command
+        from io import StringIO
+        out = StringIO()
+        call_command('audit_ledger', '--json', '--chunk-size', '3', *args, stdout=out, stderr=StringIO())
+        return json.loads(out.getvalue().splitlines()[0])
+
+    def test_chain_hash_is_recomputable(self):
+        passport = DigitalPassport.objects.get(imei_serial="AUDIT-3")
+        passport.chain_hash, expected = '', passport.chain_hash
+        self.assertEqual(passport.assign_chain_hash(), expected)
+
+    def test_intact_ledger_passes_in_parallel(self):
+        report = self.audit('--workers', '2')
+        self.assertEqual((report['checked'], report['problem_count']), (7, 0))
+
+    def test_tampering_is_reported(self):
+        from django.core.management.base import CommandError
+        from .audit import run_audit
+        DigitalPassport.objects.filter(imei_serial="AUDIT-4").update(wipe_standard="forged")
+        with self.assertRaises(CommandError):
+            self.audit('--workers', '1')
+        state = run_audit(workers=1, chunk_size=3)
+        self.assertEqual(state.problems, [[4, "AUDIT-4", "hash_mismatch"]])
+
+    def test_legacy_leaf_after_v2_is_a_downgrade(self):
+        from .audit import run_audit
+        DigitalPassport.objects.filter(imei_serial="AUDIT-0").update(hash_version=1)  # genuine legacy prefix
+        DigitalPassport.objects.filter(imei_serial="AUDIT-5").update(wipe_standard="forged", hash_version=1)
+        for workers in (1, 2):
+            state = run_audit(workers=workers, chunk_size=3)
+            self.assertEqual((state.legacy, state.problems), (1, [[5, "AUDIT-5", "version_downgrade"]]))
+
+    def test_resume_from_checkpoint(self):
+        from .audit import AuditState, run_audit
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "audit.json")
+            partial = AuditState()
+            run_audit(partial, workers=1, chunk_size=3, on_chunk=lambda s: s.save(path) if s.checked <= 6 else None)
+            self.assertEqual(AuditState.load(path).last_leaf_index, 5)  # "interrupted" after two chunks
+            report = self.audit('--workers', '1', '--checkpoint', path, '--resume')
+            self.assertEqual((report['checked'], report['problem_count']), (7, 0))
+
+
+class BenchmarkTests(TestCase):
+
+    def test_percentiles_and_summary(self):
+        from .benchmarks import percentile, summarize
+        self.assertEqual(percentile(list(range(1, 101)), 95), 95)
+        report = summarize([(0.002, 3, 201), (0.001, 2, 409)], elapsed=0.5)
+        self.assertEqual(report['rps'], 4.0)
+        self.assertEqual(report['latency_ms']['p50'], 1.0)
+        self.assertEqual(report['statuses'], {"201": 1, "409": 1})
+
+    def test_mint_scenario_reports_conflicts(self):
+        from .benchmarks import mint_throughput
+        report = mint_throughput(requests=10, workers=1, conflict_rate=0.3)
+        self.assertEqual(report['statuses'], {"201": 7, "409": 3})
+        self.assertGreater(report['queries']['mean'], 0)
+
+
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        from . import metrics
+        self.metrics = metrics
+        metrics.reset()
+
+    def test_request_latency_and_queries_are_exported(self):
+        self.client.post('/api/v1/mint/', mint_payload("METRICS-1"), content_type='application/json')
+        response = self.client.get('/metrics')
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('ddp_http_request_duration_seconds_count{route="mint-passport",method="POST"} 1', body)
+        self.assertIn('ddp_http_requests_total{route="mint-passport",method="POST",status="201"} 1', body)
+        self.assertIn('ddp_db_queries_total{route="mint-passport"}', body)
+        self.assertIn('ddp_operation_duration_seconds_count{operation="ledger_append"} 1', body)
+
+    def test_thread_shards_are_summed(self):
+        labels = (('operation', 'test'),)
+
+        def work():
+            for _ in range(100):
+                self.metrics.observe('ddp_operation_duration_seconds', labels, 0.02)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        histograms, _ = self.metrics.collect()
+        cell = histograms[('ddp_operation_duration_seconds', labels)]
+        self.assertEqual(cell[-1], 400)
+        self.assertIn('ddp_operation_duration_seconds_bucket{operation="test",le="0.025"} 400', self.metrics.render())
+        self.assertIn('ddp_operation_duration_seconds_bucket{operation="test",le="0.01"} 0', self.metrics.render())
+
+    def test_exited_threads_do_not_leave_shards_behind(self):
+        labels = (('operation', 'short-lived'),)
+        before = len(self.metrics._shards)
+
+        for _ in range(500):  # one thread per connection, as under runserver
+            t = threading.Thread(target=self.metrics.inc, args=('ddp_http_requests_total', labels))
+            t.start()
+            t.join()
+
+        self.assertLessEqual(len(self.metrics._shards), before + 1)
+        _, counters = self.metrics.collect()
+        self.assertEqual(counters[('ddp_http_requests_total', labels)], 500)
+
+
+class MintCoalescerTests(TestCase):
+
+    def test_concurrent_submissions_share_commits(self):
+        from .coalescer import Coalescer
+        batches = []
+        group = Coalescer(lambda items: batches.append(list(items)) or [item * 10 for item in items], window=0.05)
+        results = {}
+        start = threading.Barrier(8)
+
+        def worker(n):
+            start.wait()
+            results[n] = group.submit(n)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, {n: n * 10 for n in range(8)})
+        self.assertLess(len(batches), 8)
+        self.assertEqual(sorted(n for batch in batches for n in batch), list(range(8)))
+
+    def test_failing_group_is_retried_item_by_item(self):
+        from .coalescer import FAILED, Coalescer, _Slot
+
+        def commit(items):
+            if 'bad' in items:
+                raise ValueError("bad item")
+            return ['ok'] * len(items)
+
+        slots = [_Slot('a'), _Slot('bad')]
+        Coalescer(commit)._run(slots)
+        self.assertEqual([s.outcome for s in slots], ['ok', (FAILED, "bad item")])
+
+    def test_mint_endpoint_goes_through_the_coalescer(self):
+        first = self.client.post('/api/v1/mint/', mint_payload("COALESCE-1"), content_type='application/json')
+        again = self.client.post('/api/v1/mint/', mint_payload("COALESCE-1"), content_type='application/json')
+        self.assertEqual((first.status_code, again.status_code), (201, 409))
+        self.assertEqual(first.json()['passport_hash'], DigitalPassport.objects.get(imei_serial="COALESCE-1").chain_hash)
+
+
+class IdempotentMintTests(TestCase):
+
+    def post(self, payload, key):
+        return self.client.post('/api/v1/mint/', payload, content_type='application/json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_original_201(self):
+        first = self.post(mint_payload("IDEM-1"), "retry-me")
+        retry = self.post(mint_payload("IDEM-1"), "retry-me")
+        self.assertEqual((first.status_code, retry.status_code), (201, 201))
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(DigitalPassport.objects.filter(imei_serial="IDEM-1").count(), 1)
+        # Without the key the duplicate is still a conflict
+        self.assertEqual(self.client.post('/api/v1/mint/', mint_payload("IDEM-1"), content_type='application/json').status_code, 409)
+
+    def test_key_reused_with_another_payload_is_refused(self):
+        self.post(mint_payload("IDEM-2"), "shared")
+        self.assertEqual(self.post(mint_payload("IDEM-3"), "shared").status_code, 422)
+
+    def test_expired_keys_are_evicted(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from . import coalescer
+        from .models import IdempotencyKey
+        self.post(mint_payload("IDEM-4"), "old")
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.post(mint_payload("IDEM-4"), "old").status_code, 409)  # no replay after the TTL
+        coalescer._last_purge = 0.0
+        coalescer._purge_expired_keys(timezone.now())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class SerialSearchTests(TestCase):
+
+    def setUp(self):
+        serials = ["356938035643809", "356938035643817", "356938099999999", "490154203237518", "SN-ABC-1234"]
+        self.client.post('/api/v1/mint/batch/', [mint_payload(s) for s in serials], content_type='application/json')
+
+    def search(self, **params):
+        response = self.client.get('/api/v1/passports/search/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['complete'])
+        return [(r['imei'], r['match'], r['distance']) for r in response.json()['results']]
+
+    def test_prefix_matches_come_first_in_order(self):
+        self.assertEqual(self.search(q="35693803564", max_distance=0), [
+            ("356938035643809", "prefix", 0), ("356938035643817", "prefix", 0),
+        ])
+
+    def test_typo_is_found_by_edit_distance(self):
+        results = self.search(q="490154203287518")  # one digit misread from a damaged label
+        self.assertEqual(results[0], ("490154203237518", "fuzzy", 1))
+        self.assertEqual(self.search(q="sn-abc-1243")[0], ("SN-ABC-1234", "fuzzy", 2))
+
+    def test_search_uses_the_index_not_a_scan(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.search(q="490154203287518")
+        self.assertEqual(len(queries), 2)  # prefix range, segment candidates (joined to their serials)
+        self.assertTrue(all('LIKE' not in q['sql'] for q in queries.captured_queries))
+
+    def test_prefix_search_ignores_case(self):
+        self.assertEqual(self.search(q="sn-abc", max_distance=0), [("SN-ABC-1234", "prefix", 0)])
+
+    def test_edits_anywhere_in_the_serial_are_found(self):
+        serial = "356938035643809"
+        typos = [serial[:i] + "7" + serial[i + 1:] for i in range(len(serial)) if serial[i] != "7"]
+        typos += [serial[:i] + serial[i + 1:] for i in range(len(serial))]  # dropped digit
+        typos += ["9" + serial[:7] + "0" + serial[8:] + "1"]  # insertion, substitution and insertion
+        for typo in typos:
+            found = [r[0] for r in self.search(q=typo, max_distance=3)]
+            self.assertIn(serial, found, typo)
+
+    def test_short_queries_are_rejected(self):
+        self.assertEqual(self.client.get('/api/v1/passports/search/', {'q': '35'}).status_code, 400)
+
+
+try:
+    import cryptography  # noqa: F401
+    HAS_CRYPTOGRAPHY = True
+except ImportError:
+    HAS_CRYPTOGRAPHY = False
+
+
+class SignedCertificateTests(TestCase):
+
+    def setUp(self):
+        from . import signing
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.key_path = os.path.join(self.tmp.name, "hub.pem")
+        override = override_settings(DDP_SIGNING_KEY_PATH=self.key_path)
+        override.enable()
+        self.addCleanup(override.disable)
+        signing.reset()
+        self.addCleanup(signing.reset)
+
+    def export_records(self):
+        from .export import export_stream
+        return [json.loads(line) for line in b"".join(export_stream()).splitlines()]
+
+    def test_exported_hash_is_checked_offline(self):
+        from .certverify import check_record
+        DigitalPassport.objects.create(imei_serial="CERT-1", wipe_standard="x", is_certified=True)
+        record = self.export_records()[0]
+        if not HAS_CRYPTOGRAPHY:
+            self.assertEqual(record['signature'], '')
+            self.assertEqual(check_record(record, None, ''), 'unsigned')
+        record['wipe_standard'] = "forged"
+        self.assertEqual(check_record(record, None, ''), 'hash_mismatch')
+
+    def test_relabelled_version_is_not_treated_as_legacy(self):
+        from .certverify import check_record
+        DigitalPassport.objects.create(imei_serial="CERT-4", wipe_standard="x", is_certified=True)
+        record = dict(self.export_records()[0], imei_serial="FORGED", signature="ab" * 64)
+        self.assertEqual(check_record(dict(record, hash_version=1), None, ''), 'version_downgrade')
+        del record['hash_version']
+        self.assertTrue(check_record(record, None, '').startswith('malformed'))
+
+    @unittest.skipUnless(HAS_CRYPTOGRAPHY, "needs the cryptography package")
+    def test_signed_mint_verifies_with_the_cli(self):
+        from django.core.management import call_command
+        from .certverify import main
+        call_command('generate_signing_key', stdout=open(os.devnull, 'w'))
+        response = self.client.post('/api/v1/mint/', mint_payload("CERT-2"), content_type='application/json')
+        self.assertEqual(len(response.json()['signature']), 128)
+
+        key = self.client.get('/api/v1/ledger/signing-key/').json()
+        key_file = os.path.join(self.tmp.name, "hub.pub")
+        with open(key_file, 'w') as f:
+            f.write(key['public_key_pem'])
+        export = os.path.join(self.tmp.name, "ledger.ndjson")
+        records = self.export_records()
+        with open(export, 'w') as f:
+            f.writelines(json.dumps(r) + "\n" for r in records)
+        self.assertEqual(main([export, '--public-key', key_file, '--workers', '2']), 0)
+
+        records[0]['signature'] = records[0]['signature'][::-1]
+        with open(export, 'w') as f:
+            f.writelines(json.dumps(r) + "\n" for r in records)
+        self.assertEqual(main([export, '--public-key', key_file, '--workers', '2']), 1)
+
+    @unittest.skipIf(HAS_CRYPTOGRAPHY, "signing is available")
+    def test_hub_without_signing_still_mints(self):
+        response = self.client.post('/api/v1/mint/', mint_payload("CERT-3"), content_type='application/json')
+        self.assertEqual((response.status_code, response.json()['signature']), (201, ''))
+        self.assertEqual(self.client.get('/api/v1/ledger/signing-key/').status_code, 404)
@@ -3,18 +3,43 @@
 from django.urls import path
 from .views import (
     MintPassportAPIView, 
+    BatchMintAPIView,
     PassportDetailView, 
+    passport_events,
+    passport_search,
+    EventIngestAPIView,
     UniversalWipeInterfaceView, 
     local_wipe_and_mint,
-    remote_file_delete # <-- NEW
+    wipe_job_status,
+    wipe_job_stream,
+    remote_file_delete, # <-- NEW
+    ledger_head,
+    ledger_signing_key,
+    ledger_export,
+    ledger_inclusion_proof,
+    ledger_consistency_proof,
 )
 
 urlpatterns = [
     # API Endpoints
     path('mint/', MintPassportAPIView.as_view(), name='mint-passport'),
+    path('mint/batch/', BatchMintAPIView.as_view(), name='mint-batch'),
     path('mint/local-wipe-and-mint/', local_wipe_and_mint, name='local-wipe-and-mint'),
+    path('jobs/<uuid:job_id>/', wipe_job_status, name='wipe-job-status'),
+    path('jobs/<uuid:job_id>/stream/', wipe_job_stream, name='wipe-job-stream'),
     path('delete-files/', remote_file_delete, name='remote-file-delete'), # <-- NEW
     
+    path('passports/search/', passport_search, name='passport-search'),
+    path('passports/<str:imei_serial>/events/', passport_events, name='passport-events'),
+    path('events/ingest/', EventIngestAPIView.as_view(), name='event-ingest'),
+
+    # Ledger Proof Endpoints (Auditors)
+    path('ledger/head/', ledger_head, name='ledger-head'),
+    path('ledger/export/', ledger_export, name='ledger-export'),
+    path('ledger/signing-key/', ledger_signing_key, name='ledger-signing-key'),
+    path('ledger/proof/<str:imei_serial>/', ledger_inclusion_proof, name='ledger-inclusion-proof'),
+    path('ledger/consistency/', ledger_consistency_proof, name='ledger-consistency-proof'),
+
     # UI/Viewer Endpoints
     path('interface/', UniversalWipeInterfaceView, name='wipe-interface'),
     path('view/<str:imei_serial>/', PassportDetailView.as_view(), name='passport-detail'),
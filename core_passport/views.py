@@ -4,14 +4,31 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import api_view
+from rest_framework.parsers import JSONParser
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
 from django.utils.decorators import method_decorator
-import subprocess # Required for running the shell commands (rm -rf, dd)
+import subprocess # Required for running the shell commands (rm -rf)
 import json 
 
-from .serializers import PassportMintSerializer
-from .models import DigitalPassport, EventLog
+from .serializers import EventIngestSerializer, PassportMintSerializer
+from .models import DigitalPassport, EventLog, WipeJob
+from .parsers import NDJSONParser, iter_ndjson
+from . import coalescer, jobs, ledger, metrics, signing
+from .cache import get_detail_page, invalidate_passport_detail, make_etag, set_detail_page
+from .export import export_stream, parse_since
+from .pagination import DEFAULT_PAGE_SIZE, InvalidCursor, events_page
+from .progress import broker as progress_broker
+from . import search as serial_search
 
 
 # --- WIPE ALGORITHMS DEFINITION ---
@@ -58,36 +75,132 @@ def UniversalWipeInterfaceView(request):
 
 @method_decorator(csrf_exempt, name='dispatch') 
 class MintPassportAPIView(APIView):
-    """API endpoint to receive validated wipe data and save the record."""
+    """API endpoint to receive validated wipe data and save the record.
+
+    Concurrent requests are group-committed (coalescer.py): one transaction
+    per few-millisecond window instead of one per request. With an
+    Idempotency-Key header, a retry of a successful mint replays its 201.
+    """
     def post(self, request):
         from .serializers import PassportMintSerializer # Local import to avoid circular dependency
         
         serializer = PassportMintSerializer(data=request.data)
         
         if serializer.is_valid():
-            if DigitalPassport.objects.filter(imei_serial=serializer.validated_data['imei_serial']).exists():
+            outcome, value = coalescer.mint(serializer.validated_data, request.headers.get('Idempotency-Key'))
+
+            if outcome == coalescer.REPLAY:
+                return Response(value.response, status=value.status_code, headers={'Idempotent-Replayed': 'true'})
+
+            if outcome == coalescer.KEY_REUSED:
+                return Response({
+                    "error": "Idempotency key reused.",
+                    "detail": "This Idempotency-Key was already used with a different payload."
+                }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+            if outcome == coalescer.CONFLICT:
                 return Response({
                     "error": "Passport already exists.",
                     "detail": "A Digital Passport for this device has already been minted."
                 }, status=status.HTTP_409_CONFLICT)
             
-            try:
-                passport = serializer.create(validated_data=serializer.validated_data)
-                return Response({
-                    "message": "Digital Passport Minted Successfully.",
-                    "imei": passport.imei_serial,
-                    "passport_hash": passport.chain_hash 
-                }, status=status.HTTP_201_CREATED)
+            if outcome == coalescer.CREATED:
+                return Response(coalescer.created_body(value), status=status.HTTP_201_CREATED)
             
-            except Exception as e:
-                return Response({
-                    "error": "Failed to mint passport.",
-                    "detail": str(e)
-                }, status=status.HTTP_400_BAD_REQUEST)
+            return Response({
+                "error": "Failed to mint passport.",
+                "detail": value
+            }, status=status.HTTP_400_BAD_REQUEST)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+# ------------------------------------------------------------------
+# 2b. BATCH MINT API (Pallet-Sized Certification in One Transaction)
+# ------------------------------------------------------------------
+
+@method_decorator(csrf_exempt, name='dispatch')
+class BatchMintAPIView(APIView):
+    """API endpoint to mint many passports at once (JSON array or NDJSON body).
+
+    Duplicates are found with a single `imei_serial__in` query and all new
+    passports are written with one bulk_create() inside one transaction.
+    Every item gets its own status: 201 (minted), 409 (duplicate) or 400 (invalid).
+    A 409 carries `same_payload`, telling a client that re-sends after a lost
+    response apart from a different certificate reusing the serial.
+    """
+    parser_classes = [JSONParser, NDJSONParser]
+
+    def post(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            return Response({
+                "error": "Invalid batch.",
+                "detail": "Expected a JSON array or an NDJSON body of mint payloads."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        max_items = getattr(settings, 'DDP_MINT_BATCH_MAX', 1000)
+        if len(items) > max_items:
+            return Response({
+                "error": "Batch too large.",
+                "detail": f"A batch may contain at most {max_items} items."
+            }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        results = [None] * len(items)
+        pending = {}  # imei_serial -> (index, validated_data)
+
+        # 1. Validate every item; the first occurrence of a serial wins inside the batch.
+        for index, item in enumerate(items):
+            serializer = PassportMintSerializer(data=item if isinstance(item, dict) else {})
+            if not serializer.is_valid():
+                results[index] = {"index": index, "status": 400, "detail": serializer.errors}
+                continue
+            imei = serializer.validated_data['imei_serial']
+            if imei in pending:
+                same = (PassportMintSerializer.minted_values(pending[imei][1])
+                        == PassportMintSerializer.minted_values(serializer.validated_data))
+                results[index] = {"index": index, "imei": imei, "status": 409, "same_payload": same,
+                                  "detail": "Duplicate serial within this batch."}
+                continue
+            pending[imei] = (index, serializer.validated_data)
+
+        try:
+            with transaction.atomic():  # the lookup and the insert see the same ledger
+                # 2. One query for every serial that is already on the ledger.
+                existing = DigitalPassport.objects.filter(imei_serial__in=list(pending)).values_list(
+                    'imei_serial', *PassportMintSerializer.MINTED_FIELDS)
+                for imei, *stored in existing:
+                    index, validated_data = pending.pop(imei)
+                    same = tuple(stored) == PassportMintSerializer.minted_values(validated_data)
+                    results[index] = {"index": index, "imei": imei, "status": 409, "same_payload": same,
+                                      "detail": "A Digital Passport for this device has already been minted."}
+
+                # 3. One bulk insert (ledger.append chains + extends the Merkle tree).
+                passports = [
+                    (index, PassportMintSerializer.build_passport(validated_data))
+                    for index, validated_data in pending.values()
+                ]
+                ledger.append([passport for _, passport in passports])
+        except Exception as e:
+            print(f"Batch mint failed: {e}")
+            return Response({
+                "error": "Failed to mint batch.",
+                "detail": str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        for index, passport in passports:
+            results[index] = {"index": index, "imei": passport.imei_serial, "status": 201,
+                              "passport_hash": passport.chain_hash, "signature": passport.signature}
+
+        summary = {code: sum(1 for r in results if r['status'] == code) for code in (201, 409, 400)}
+        return Response({
+            "minted": summary[201],
+            "conflicts": summary[409],
+            "invalid": summary[400],
+            "results": results,
+        }, status=status.HTTP_207_MULTI_STATUS)
+
+
 # ------------------------------------------------------------------
 # 3. REMOTE FILE DELETION API (Handles Shell Command for Button 1)
 # ------------------------------------------------------------------
@@ -111,7 +224,8 @@ def remote_file_delete(request):
     
     try:
         # NOTE: This command assumes the user running Django has NOPASSWD configured for sudo in Kali.
-        subprocess.run(delete_command, shell=True, check=True, capture_output=True)
+        with metrics.timed('remote_file_delete'):
+            subprocess.run(delete_command, shell=True, check=True, capture_output=True)
         return Response({'message': f'Files in {", ".join(target_folders)} Deleted Successfully.', 'status': 200}, status=status.HTTP_200_OK)
     except Exception as e:
         # Log the failure, especially if sudo failed.
@@ -120,64 +234,109 @@ def remote_file_delete(request):
 
 
 # ------------------------------------------------------------------
-# 4. LOCAL WIPE EXECUTION & MINTING (The Shell Command Trigger for Button 2)
+# 4. LOCAL WIPE EXECUTION & MINTING (Background Job for Button 2)
 # ------------------------------------------------------------------
 
 @api_view(['POST'])
 @csrf_exempt
 def local_wipe_and_mint(request):
-    """API endpoint triggered by the web browser that runs the DD command and mints the passport (Button 2)."""
+    """API endpoint triggered by the web browser that queues a wipe-and-mint job (Button 2).
+
+    Returns 202 with a job id straight away; the wipe runs on the hub's worker
+    pool and the passport is minted only if it succeeds (see jobs.py).
+    """
     data = request.data
     device_id = data.get('device_id', 'WEB-UNKNOWN')
     target_drive = data.get('target_drive', '/dev/sda')
     algorithm_key = data.get('algorithm', 'NIST')
     user_dir = data.get('user_dir', '/home/prachi/') 
 
-    algorithm = WIPE_ALGORITHMS.get(algorithm_key, WIPE_ALGORITHMS['NIST'])
-    
-    # --- 1. RUN FREE SPACE WIPE COMMANDS ---
+    if algorithm_key not in WIPE_ALGORITHMS:
+        algorithm_key = 'NIST'
+
     try:
-        # Step 2: WIPE FREE SPACE command execution
-        # Runs dd to overwrite free blocks in the user's home directory partition
-        # 💥 FIX: Added 'sudo' for dd and rm to ensure privilege for disk access/file removal
-        wipe_command = (
-            f"sudo dd if=/dev/zero of={user_dir}temp_wipe.dat bs=1M status=none || true; "
-            f"sudo rm -f {user_dir}temp_wipe.dat && echo 'Wipe verified.'"
-        )
-        
-        subprocess.run(wipe_command, shell=True, check=True, capture_output=True, text=True)
-        
-        wipe_status = "SUCCESS"
-        wipe_log = f"Secure wipe executed using {algorithm['name']} on {target_drive}. Verification passed."
-        
-    except Exception as e:
-        wipe_status = "FAILURE"
-        wipe_log = f"Secure Wipe Shell Command Failed: {str(e)}"
-    
-    # --- 2. MINT PASSPORT ---
-    if wipe_status == "SUCCESS":
-        from .serializers import PassportMintSerializer
-        
-        payload = {
-            "imei_serial": f"{device_id}-{target_drive.replace('/', '')}",
-            "wipe_status": "SUCCESS",
-            "wipe_standard": algorithm['name'],
-            "verification_log": wipe_log
-        }
-        
-        serializer = PassportMintSerializer(data=payload)
-        if serializer.is_valid():
-            passport = serializer.create(validated_data=serializer.validated_data)
-            return Response({
-                "message": "Passport Minted Successfully.",
-                "status": 201,
-                "imei": passport.imei_serial,
-                "passport_hash": passport.chain_hash,
-            }, status=status.HTTP_201_CREATED)
+        job = jobs.submit(device_id, target_drive, algorithm_key, user_dir)
+    except jobs.JobQueueFull as e:
+        return Response({'detail': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    except jobs.TargetBusy as e:
+        return Response({'detail': str(e)}, status=status.HTTP_409_CONFLICT)
+
+    return Response({
+        "message": "Wipe job accepted.",
+        "status": 202,
+        "job_id": str(job.id),
+        "status_url": reverse('wipe-job-status', args=[job.id]),
+        "stream_url": reverse('wipe-job-stream', args=[job.id]),
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+def wipe_job_status(request, job_id):
+    """Polling endpoint: state, progress and (once succeeded) the minted passport hash."""
+    job = get_object_or_404(WipeJob.objects.select_related('passport'), pk=job_id)
+    return Response(jobs.job_snapshot(job))
+
+
+def _progress_frame(snapshot):
+    return f"event: progress\ndata: {json.dumps(snapshot)}\n\n"
+
+
+async def _job_event_stream(job_id, keepalive):
+    """Yields SSE frames for one job until it reaches a terminal state.
+
+    Progress comes from the in-process broker when this process runs the job;
+    otherwise (another worker process) the job row is re-read every `keepalive`.
+    """
+    job = await WipeJob.objects.select_related('passport').aget(pk=job_id)
+    snapshot = jobs.job_snapshot(job)
+    version = 0
+    while True:
+        yield _progress_frame(snapshot)
+        if snapshot['state'] not in WipeJob.ACTIVE_STATES:
+            return
+        update = await progress_broker.wait(job_id, version, keepalive)
+        if update is not None:
+            version, snapshot = update
         else:
-             return Response({'detail': serializer.errors}, status=400)
-    
-    return Response({'detail': f"Secure wipe failed: {wipe_log}"}, status=status.HTTP_400_BAD_REQUEST)
+            job = await WipeJob.objects.select_related('passport').aget(pk=job_id)
+            snapshot = jobs.job_snapshot(job)
+
+
+def _job_event_stream_sync(job_id, keepalive):
+    """_job_event_stream for WSGI, which would buffer an async iterator until it ends."""
+    job = WipeJob.objects.select_related('passport').get(pk=job_id)
+    snapshot = jobs.job_snapshot(job)
+    version = 0
+    while True:
+        yield _progress_frame(snapshot)
+        if snapshot['state'] not in WipeJob.ACTIVE_STATES:
+            return
+        update = progress_broker.wait_sync(job_id, version, keepalive)
+        if update is not None:
+            version, snapshot = update
+        else:
+            job = WipeJob.objects.select_related('passport').get(pk=job_id)
+            snapshot = jobs.job_snapshot(job)
+
+
+async def wipe_job_stream(request, job_id):
+    """Server-Sent Events stream of a job's throughput, percent, pass and ETA.
+
+    Under ASGI it runs on the event loop, so any number of tabs/agents can
+    watch without holding a worker thread each. Under WSGI the stream is a
+    plain generator on the request thread, so frames still go out live.
+    """
+    if not await WipeJob.objects.filter(pk=job_id).aexists():
+        raise Http404("No such wipe job.")
+    keepalive = getattr(settings, 'DDP_SSE_KEEPALIVE', 15.0)
+    if isinstance(request, ASGIRequest):
+        events = _job_event_stream(job_id, keepalive)
+    else:
+        events = _job_event_stream_sync(job_id, keepalive)
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Stop reverse proxies from buffering the stream
+    return response
 
 
 # ------------------------------------------------------------------
@@ -185,13 +344,325 @@ def local_wipe_and_mint(request):
 # ------------------------------------------------------------------
 
 class PassportDetailView(APIView):
-    """View to display the full, immutable history of a Digital Passport using an HTML template."""
+    """View to display the full, immutable history of a Digital Passport using an HTML template.
+
+    The rendered page is cached server-side with its ETag/Last-Modified (see
+    cache.py), so repeat views and conditional GETs (304) cost no queries.
+    """
+    # Public certificate page: skip session/user lookups so cached hits stay query-free
+    authentication_classes = []
+    permission_classes = []
+
     def get(self, request, imei_serial):
-        passport = get_object_or_404(DigitalPassport, imei_serial=imei_serial)
-        events = EventLog.objects.filter(passport=passport).order_by('timestamp')
-        
-        context = {
-            'passport': passport,
-            'events': events,
-        }
-        return render(request, 'core_passport/detail.html', context)
\ No newline at end of file
+        entry = get_detail_page(imei_serial)
+        if entry is None:
+            passport = get_object_or_404(DigitalPassport, imei_serial=imei_serial)
+            # Only the first page is rendered; the page fetches the rest from the events API
+            events, next_cursor = events_page(passport.pk, limit=getattr(settings, 'DDP_DETAIL_EVENTS_PAGE', 20))
+            last_event = EventLog.objects.filter(passport=passport).order_by('-timestamp', '-id').values_list('timestamp', flat=True).first()
+
+            context = {
+                'passport': passport,
+                'events': events,
+                'next_cursor': next_cursor,
+                'events_url': reverse('passport-events', args=[passport.imei_serial]),
+            }
+            entry = {
+                'html': render_to_string('core_passport/detail.html', context, request=request),
+                'etag': make_etag(passport.chain_hash, last_event),
+                'last_modified': (last_event or passport.mint_date).timestamp(),
+            }
+            set_detail_page(imei_serial, entry)
+
+        response = HttpResponse(entry['html'])
+        response['ETag'] = entry['etag']
+        response['Last-Modified'] = http_date(entry['last_modified'])
+        response['Cache-Control'] = 'public, max-age=0, must-revalidate'
+        return get_conditional_response(
+            request, etag=entry['etag'], last_modified=int(entry['last_modified']), response=response,
+        )
+
+
+# ------------------------------------------------------------------
+# 5b. EVENT HISTORY API (Keyset-Paginated JSON)
+# ------------------------------------------------------------------
+
+@api_view(['GET'])
+def passport_events(request, imei_serial):
+    """One page of a passport's event history, oldest first.
+
+    Pass the returned `next_cursor` back as `?cursor=` for the following page;
+    it is null on the last page. `limit` is capped at 200.
+    """
+    passport_id = DigitalPassport.objects.filter(imei_serial=imei_serial).values_list('id', flat=True).first()
+    if passport_id is None:
+        raise Http404("Passport not found for this device ID.")
+
+    try:
+        limit = int(request.query_params.get('limit', DEFAULT_PAGE_SIZE))
+        events, next_cursor = events_page(passport_id, request.query_params.get('cursor'), limit)
+    except (ValueError, InvalidCursor) as e:
+        return Response({"error": "Invalid page request.", "detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        "imei": imei_serial,
+        "events": [
+            {
+                "id": event.id,
+                "event_type": event.event_type,
+                "event_data": event.event_data,
+                "timestamp": event.timestamp.isoformat(),
+            }
+            for event in events
+        ],
+        "next_cursor": next_cursor,
+    })
+
+
+# ------------------------------------------------------------------
+# 5b-2. SERIAL SEARCH (Prefix + Typo-Tolerant Lookup for Technicians)
+# ------------------------------------------------------------------
+
+@api_view(['GET'])
+def passport_search(request):
+    """Ranked passports for a partial or mistyped serial: `?q=3569&limit=20&max_distance=2`.
+
+    Prefix matches come first (distance 0), then serials within
+    `max_distance` edits (at most 3), closest first. `complete` is False when
+    the fuzzy search hit its work cap.
+    """
+    query = request.query_params.get('q', '').strip()
+    if len(query) < 3:
+        return Response({"error": "Invalid search.", "detail": "Enter at least 3 characters."},
+                        status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = min(max(int(request.query_params.get('limit', serial_search.DEFAULT_LIMIT)), 1), serial_search.MAX_LIMIT)
+        max_distance = min(max(int(request.query_params.get('max_distance', serial_search.DEFAULT_MAX_DISTANCE)), 0),
+                           serial_search.MAX_DISTANCE)
+    except ValueError:
+        return Response({"error": "Invalid search.", "detail": "limit and max_distance must be integers."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    results, complete = serial_search.search(query, limit=limit, max_distance=max_distance)
+    for result in results:
+        result["url"] = reverse('passport-detail', args=[result["imei"]])
+    # complete is False when too many serials were close enough to check them all
+    return Response({"query": query, "results": results, "complete": complete})
+
+
+# ------------------------------------------------------------------
+# 5c. BULK EVENT INGESTION (Streaming NDJSON from Diagnostic Rigs)
+# ------------------------------------------------------------------
+
+def _ingest_chunk(chunk, errors, max_errors):
+    """Resolves one chunk of validated events to passports and bulk-inserts it. Returns accepted count."""
+    serials = {validated_data['imei_serial'] for _, validated_data in chunk}
+    passport_ids = dict(
+        DigitalPassport.objects.filter(imei_serial__in=serials).values_list('imei_serial', 'id')
+    )
+
+    events = []
+    for line_number, validated_data in chunk:
+        passport_id = passport_ids.get(validated_data['imei_serial'])
+        if passport_id is None:
+            if len(errors) < max_errors:
+                errors.append({"line": line_number, "detail": "No passport for this imei_serial."})
+            continue
+        events.append(EventIngestSerializer.build_event(validated_data, passport_id))
+
+    with transaction.atomic():
+        EventLog.objects.bulk_create(events)
+    # bulk_create() sends no post_save signal, so drop the cached pages here
+    invalidate_passport_detail(serials & passport_ids.keys())
+    return len(events)
+
+
+def _request_body(request):
+    """Readable body of a DRF request, or None when it can't be read safely.
+
+    DRF has no stream without a Content-Length, which is exactly the case of
+    a chunked upload. ASGI servers hand Django the whole de-chunked body;
+    WSGI servers that de-chunk (gunicorn, mod_wsgi) say so with
+    wsgi.input_terminated. Anywhere else the body can't be read.
+    """
+    if request.stream is not None:
+        return request.stream
+    meta = request.META
+    if meta.get('CONTENT_LENGTH') not in (None, ''):
+        return ()  # an explicitly empty body
+    if isinstance(request._request, ASGIRequest):
+        return request._request
+    if meta.get('wsgi.input_terminated') and 'wsgi.input' in meta:
+        return meta['wsgi.input']
+    return None
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class EventIngestAPIView(APIView):
+    """Streams an `application/x-ndjson` body of events keyed by imei_serial into EventLog.
+
+    The body is read line by line and processed in chunks of
+    DDP_EVENT_INGEST_CHUNK: one serial lookup and one bulk insert per chunk,
+    so memory stays bounded whatever the upload size.
+    """
+    parser_classes = [NDJSONParser]
+
+    def post(self, request):
+        if request.content_type.split(';')[0].strip() != NDJSONParser.media_type:
+            return Response({
+                "error": "Unsupported media type.",
+                "detail": f"Send events as {NDJSONParser.media_type}, one JSON object per line."
+            }, status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+        body = _request_body(request)
+        if body is None:
+            return Response({
+                "error": "Length required.",
+                "detail": "This server can't read a chunked body; send a Content-Length."
+            }, status=status.HTTP_411_LENGTH_REQUIRED)
+
+        chunk_size = getattr(settings, 'DDP_EVENT_INGEST_CHUNK', 1000)
+        max_errors = getattr(settings, 'DDP_EVENT_INGEST_MAX_ERRORS', 100)
+        accepted = rejected = 0
+        errors = []
+        chunk = []
+
+        # The body is read lazily; request.data is never touched so it is never buffered whole
+        for line_number, item in iter_ndjson(body):
+            serializer = EventIngestSerializer(data=item if isinstance(item, dict) else {})
+            if isinstance(item, ValueError) or not serializer.is_valid():
+                rejected += 1
+                if len(errors) < max_errors:
+                    errors.append({"line": line_number, "detail": str(item) if isinstance(item, ValueError) else serializer.errors})
+                continue
+            chunk.append((line_number, serializer.validated_data))
+            if len(chunk) >= chunk_size:
+                inserted = _ingest_chunk(chunk, errors, max_errors)
+                accepted += inserted
+                rejected += len(chunk) - inserted
+                chunk = []
+
+        if chunk:
+            inserted = _ingest_chunk(chunk, errors, max_errors)
+            accepted += inserted
+            rejected += len(chunk) - inserted
+
+        return Response({
+            "accepted": accepted,
+            "rejected": rejected,
+            "errors": errors,
+        }, status=status.HTTP_200_OK)
+
+
+# ------------------------------------------------------------------
+# 5d. FULL-LEDGER EXPORT (Streaming CSV / NDJSON for Auditors)
+# ------------------------------------------------------------------
+
+@require_GET
+def ledger_export(request):
+    """Streams every passport with its events. Query: format=ndjson|csv, since_id, since, gzip=1.
+
+    For incremental exports pass the largest `id` already received as `since_id`.
+    A plain Django view: DRF would treat `?format=` as a renderer override.
+    """
+    fmt = request.GET.get('format', 'ndjson')
+    gzip = request.GET.get('gzip') in ('1', 'true', 'yes')
+    try:
+        since_id = request.GET.get('since_id')
+        chunks = export_stream(
+            fmt=fmt,
+            since_id=int(since_id) if since_id else None,
+            since=parse_since(request.GET.get('since')),
+            gzip=gzip,
+        )
+    except ValueError as e:
+        return JsonResponse({"error": "Invalid export request.", "detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    content_type = 'application/x-ndjson' if fmt == 'ndjson' else 'text/csv'
+    filename = f"ddp-ledger.{fmt}"
+    if gzip:
+        content_type, filename = 'application/gzip', filename + '.gz'
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+# ------------------------------------------------------------------
+# 6. LEDGER PROOF API (Merkle Inclusion / Consistency for Auditors)
+# ------------------------------------------------------------------
+
+def _int_param(request, name, default=None):
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    return int(value)
+
+
+@api_view(['GET'])
+def ledger_head(request):
+    """Current tree size and root hash (what an auditor pins and later checks consistency against)."""
+    size = ledger.tree_size()
+    return Response({"tree_size": size, "root_hash": ledger.root_hash(size)})
+
+
+@api_view(['GET'])
+def ledger_inclusion_proof(request, imei_serial):
+    """Audit path proving one passport is included in the tree of the requested size."""
+    passport = get_object_or_404(DigitalPassport, imei_serial=imei_serial)
+    try:
+        size = _int_param(request, 'tree_size', ledger.tree_size())
+        proof = ledger.inclusion_proof(passport.leaf_index, size)
+    except (ValueError, TypeError, ledger.LedgerError) as e:
+        return Response({"error": "Invalid proof request.", "detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        "imei": passport.imei_serial,
+        "chain_hash": passport.chain_hash,
+        "prev_hash": passport.prev_hash,
+        "leaf_index": passport.leaf_index,
+        "leaf_hash": ledger.leaf_hash(passport.chain_hash).hex(),
+        "tree_size": size,
+        "root_hash": ledger.root_hash(size),
+        "audit_path": proof,
+    })
+
+
+@api_view(['GET'])
+def ledger_consistency_proof(request):
+    """Proof that the tree of size `first` is a prefix of the tree of size `second`."""
+    try:
+        second = _int_param(request, 'second', ledger.tree_size())
+        first = _int_param(request, 'first')
+        if first is None:
+            raise ValueError("The 'first' tree size is required.")
+        proof = ledger.consistency_proof(first, second)
+    except (ValueError, ledger.LedgerError) as e:
+        return Response({"error": "Invalid proof request.", "detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        "first": first,
+        "second": second,
+        "first_root": ledger.root_hash(first),
+        "second_root": ledger.root_hash(second),
+        "proof": proof,
+    })
+
+
+@api_view(['GET'])
+def ledger_signing_key(request):
+    """The hub's Ed25519 public key, for checking passport signatures offline (certverify.py)."""
+    key = signing.public_key()
+    if key is None:
+        return Response({"error": "Signing disabled.", "detail": "This hub does not sign passports."},
+                        status=status.HTTP_404_NOT_FOUND)
+    return Response(dict(key, algorithm="Ed25519"))
+
+
+# ------------------------------------------------------------------
+# 7. METRICS (Prometheus Scrape Endpoint)
+# ------------------------------------------------------------------
+
+@require_GET
+def metrics_view(request):
+    """Per-route latency, query and operation metrics of this process, in Prometheus text format."""
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,3 @@
+# ddp_wipe/__init__.py
+# Wipe engine shared by the hub (core_passport) and the standalone agent (DDP_Agent_GUI.py).
+# Keep this package free of Django imports so the agent can use it from a live USB.
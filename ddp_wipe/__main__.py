@@ -0,0 +1,8 @@
+# ddp_wipe/__main__.py
+# `python -m ddp_wipe ...`: the headless agent (cli.py).
+
+import sys
+
+from .cli import main
+
+sys.exit(main())
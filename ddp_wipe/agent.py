@@ -0,0 +1,237 @@
+# ddp_wipe/agent.py
+#
+# Wipe-and-certify core of the field agent, shared by the Tk window
+# (DDP_Agent_GUI.py) and the headless CLI (python -m ddp_wipe).
+#
+# A WipeAgent wipes a set of drives concurrently (scheduler.py), tuning,
+# journaling and verifying each one, then turns every outcome into a
+# certificate stored in the durable outbox for minting. It reports through
+# `log` (human text) and the `on_progress` / `on_finished` callbacks, and
+# knows nothing about how they are displayed. Modules that are slow to load
+# (the engine and its cipher, the outbox's HTTP client) are imported when a
+# wipe actually starts, so front ends start instantly.
+
+import json
+import os
+import threading
+from datetime import datetime
+from hashlib import sha256
+
+WIPE_ALGORITHMS = {
+    'NIST': {'name': 'NIST SP 800-88 Purge', 'passes': '1 Pass (Random)', 'description': 'Industry standard for modern drives (SSDs/HDDs).'},
+    'DOD': {'name': 'DoD 5220.22-M', 'passes': '3 Passes (Pattern)', 'description': 'Legacy military standard for maximum assurance on older HDDs.'},
+    'CE': {'name': 'Cryptographic Erase (CE)', 'passes': 'Key Destroy', 'description': 'Fastest, most secure wipe for encrypted storage (Android/SSDs).'},
+}
+
+# Agent state lives on the USB stick the agent boots from; the home directory is the fallback
+OUTBOX_PATH = "/mnt/usb_drive/ddp_outbox.sqlite3"  # every certificate, kept until synced (append-only)
+OUTBOX_FALLBACK_PATH = os.path.expanduser("~/ddp_outbox.sqlite3")
+AUTOTUNE_CACHE_PATH = "/mnt/usb_drive/ddp_autotune.json"  # best block size / queue depth per drive model
+AUTOTUNE_FALLBACK_PATH = os.path.expanduser("~/ddp_autotune.json")
+JOURNAL_DIR = "/mnt/usb_drive/ddp_journals"  # wipe checkpoints: re-run the same drives after a crash to resume
+JOURNAL_FALLBACK_DIR = os.path.expanduser("~/ddp_journals")
+LOG_PATH = "/mnt/usb_drive/ddp_agent.log"  # full console log of the Tk agent (rotated)
+LOG_FALLBACK_PATH = os.path.expanduser("~/ddp_agent.log")
+
+VERIFY_CONFIDENCE = 0.999  # sampled read-back: catch 0.01% unwiped blocks with 99.9% confidence
+VERIFY_DEFECT_RATE = 0.0001
+CHECKPOINT_BYTES = 1024 * 1024 * 1024  # each checkpoint costs two fsyncs; take one per GiB or 30 s
+CHECKPOINT_SECONDS = 30.0
+
+
+def usable_path(path, fallback):
+    """`path` when its directory exists (e.g. the USB stick is mounted), else `fallback`."""
+    return path if os.path.isdir(os.path.dirname(os.path.normpath(path))) else fallback
+
+
+def build_certificate(device_id, target, status, log_data, algorithm_name, verification=None, resumed=None):
+    """Certificate for one drive, sealed with its local dlt_hash."""
+    cert = {
+        "imei_serial": f"{device_id}-{target.split()[0].replace('/', '')}",
+        "wipe_status": status,
+        "wipe_standard": algorithm_name,
+        "verification_log": log_data,
+        "timestamp": datetime.now().isoformat(),
+    }
+    if verification is not None:
+        cert.update({
+            "verification_coverage": verification.coverage,
+            "verification_mismatches": verification.mismatched_blocks,
+            "verification_digest": verification.digest,
+        })
+    if resumed:
+        cert["resumed_segments"] = resumed  # [[pass, bytes already wiped before the interruption], ...]
+    cert['dlt_hash'] = sha256(json.dumps(cert, sort_keys=True).encode('utf-8')).hexdigest()
+    return cert
+
+
+class WipeAgent:
+    """Wipes drives concurrently and stores one certificate per drive in the outbox.
+
+    `drives` passed to run() are (display name, device path) pairs. The
+    callbacks run on scheduler threads: `on_progress(job)` on every progress
+    report, `on_finished(job, cert, queued)` once a drive is certified, with
+    `queued` True when the certificate will be minted (`cert` is None when
+    it could not be stored).
+    """
+
+    def __init__(self, device_id, outbox_path, hub_batch_url=None, tune_cache_path=None, journal_dir=None,
+                 verify=True, sparse=False, deallocate=False, wipes_per_controller=2, progress_interval=5.0,
+                 log=print):
+        self.device_id = device_id
+        self.outbox_path = outbox_path
+        self.hub_batch_url = hub_batch_url
+        self.tune_cache_path = tune_cache_path
+        self.journal_dir = journal_dir
+        self.verify = verify
+        self.sparse = sparse  # overwrite only the extents holding data (sparse images, thin volumes)
+        self.deallocate = deallocate  # punch/discard the wiped blocks afterwards
+        self.wipes_per_controller = wipes_per_controller
+        self.progress_interval = progress_interval
+        self.log = log
+        self.scheduler = None
+        self._outbox = None
+        self._flusher = None
+        self._tune_cache = None
+        self._tune_cache_lock = threading.Lock()  # one shared cache, so one calibration per model
+
+    # --- OUTBOX / HUB SYNC ---
+
+    @property
+    def outbox(self):
+        if self._outbox is None:
+            from .outbox import Outbox
+            self._outbox = Outbox(self.outbox_path)
+        return self._outbox
+
+    @property
+    def flusher(self):
+        if self._flusher is None:
+            from .outbox import OutboxFlusher
+            self._flusher = OutboxFlusher(self.outbox, self.hub_batch_url, log=self.log)
+        return self._flusher
+
+    def open_outbox(self, fallback_path=None):
+        """Opens the outbox, falling back to `fallback_path` when the primary can't be opened."""
+        try:
+            outbox = self.outbox
+        except Exception as e:
+            if fallback_path is None:
+                raise
+            self.log(f"⚠️ Outbox {self.outbox_path} unavailable ({e}). Using {fallback_path} instead.")
+            self.outbox_path = fallback_path
+            outbox = self.outbox
+        pending = outbox.counts()['pending']
+        if pending:
+            self.log(f"📦 {pending} certificate(s) from earlier sessions waiting to sync.")
+        return outbox
+
+    def sync(self):
+        """Sends every pending certificate now. Returns how many the hub settled; raises while it's unreachable."""
+        settled = 0
+        while True:
+            batch = self.flusher.flush_once()
+            if not batch:
+                return settled
+            settled += batch
+
+    # --- WIPING ---
+
+    def run(self, drives, algorithm, on_progress=None, on_finished=None):
+        """Wipes and certifies every drive; returns the scheduler.StationResult."""
+        from .scheduler import DriveJob, WipeScheduler
+
+        names = dict((path, name) for name, path in drives)
+        jobs = [DriveJob(target=path, algorithm=algorithm) for _, path in drives]
+
+        def finished(job):
+            try:
+                cert, queued = self.certify(job, names[job.target])
+            except Exception as e:
+                self.log(f"❌ ERROR: Could not store the certificate for {job.target} locally! {e}")
+                cert, queued = None, False
+            if on_finished is not None:
+                on_finished(job, cert, queued)
+
+        self.scheduler = WipeScheduler(per_controller=self.wipes_per_controller, wipe=self.wipe_drive,
+                                       on_progress=on_progress, on_finished=finished)
+        return self.scheduler.run(jobs)
+
+    def wipe_drive(self, job, report):
+        """Runs on a scheduler thread: tunes the I/O geometry for this drive, then wipes and verifies it."""
+        from .engine import WipeEngine
+        from .verify import Verifier
+
+        geometry = self.resume_geometry(job.target)
+        if geometry is None:
+            geometry = self.tune_geometry(job.target)
+        verifier = Verifier(confidence=VERIFY_CONFIDENCE, defect_rate=VERIFY_DEFECT_RATE) if self.verify else None
+        engine = WipeEngine(progress=report, progress_interval=self.progress_interval, journal_dir=self.journal_dir,
+                            checkpoint_bytes=CHECKPOINT_BYTES, checkpoint_seconds=CHECKPOINT_SECONDS, **geometry)
+        return engine.wipe(job.target, job.algorithm, verifier=verifier, sparse=self.sparse, deallocate=self.deallocate)
+
+    def resume_geometry(self, target):
+        """Geometry recorded by an interrupted wipe of `target`, or None when there is nothing to resume.
+
+        Calibration overwrites the start of the target, which would clobber
+        passes the journal says are complete, so a resume never calibrates.
+        """
+        if self.journal_dir is None:
+            return None
+        from .journal import journal_path, saved_geometry
+
+        geometry = saved_geometry(journal_path(self.journal_dir, 'device', target))
+        if geometry is not None:
+            self.log(f"↩️ {target}: checkpoint journal found; resuming without calibration.")
+        return geometry
+
+    def tune_geometry(self, target):
+        """Block size / queue depth for this drive: cached per model, else a short calibration."""
+        if self.tune_cache_path is None:
+            return {}
+        from .autotune import TuneCache, tune
+        from .engine import WipeError
+
+        with self._tune_cache_lock:
+            if self._tune_cache is None:
+                self._tune_cache = TuneCache(self.tune_cache_path)
+        try:
+            geometry = tune(target, cache=self._tune_cache)
+        except (WipeError, OSError) as e:
+            self.log(f"⚠️ Calibration skipped on {target} ({e}); using default I/O settings.")
+            return {}
+        self.log(f"⚙️ {target}: {geometry.summary()}")
+        return {'block_size': geometry.block_size, 'queue_depth': geometry.queue_depth}
+
+    # --- CERTIFICATION ---
+
+    def certify(self, job, drive_name):
+        """Turns a finished DriveJob into a stored certificate. Returns (cert, queued for minting)."""
+        from .scheduler import SUCCEEDED
+
+        algorithm_name = WIPE_ALGORITHMS.get(job.algorithm, {}).get('name', job.algorithm)
+        verification, resumed = None, []
+        if job.state == SUCCEEDED:
+            result = job.result
+            verification, resumed = result.verification, result.resumed
+            status = "SUCCESS"
+            log_data = f"Full wipe executed using {algorithm_name} on {drive_name}. {result.summary()}"
+            self.log(f"✅ WIPE COMPLETE ({job.target}): {result.bytes_written} bytes written at {result.throughput / 1e6:.1f} MB/s.")
+            if resumed:
+                self.log(f"↩️ {job.target} resumed from its checkpoint journal: {resumed} ([pass, bytes already wiped]).")
+            if verification is not None and verification.mismatched_blocks:
+                status = "FAILURE"
+                self.log(f"❌ VERIFICATION FAILED ({job.target}): {verification.summary()}")
+            elif verification is not None:
+                self.log(f"✅ VERIFICATION ({job.target}): {verification.summary()}")
+        else:
+            status = "FAILURE"
+            log_data = f"Secure Wipe Engine Failed: {job.error}"
+            self.log(f"❌ FAILURE ({job.target}): Wipe failed. {log_data}")
+
+        cert = build_certificate(self.device_id, job.target, status, log_data, algorithm_name, verification, resumed)
+        self.log(f"[CERT] Local Hash Generated: {cert['dlt_hash'][:16]}...")
+        # Durably appended to the outbox (failed wipes too, as local records that are never sent)
+        self.outbox.enqueue(cert, sync=(status == "SUCCESS"))
+        self.log(f"💾 Certificate stored in outbox: {self.outbox.path}")
+        return cert, status == "SUCCESS"
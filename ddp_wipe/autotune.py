@@ -0,0 +1,166 @@
+# ddp_wipe/autotune.py
+#
+# Short calibration that picks the wipe I/O geometry (block size x writes in
+# flight) for the media being wiped.
+#
+# eMMC, SATA SSDs, NVMe and spinning disks peak at very different settings,
+# so before a wipe every candidate pair is timed writing the first
+# `sample_bytes` of the target (a region the wipe overwrites right after),
+# and the fastest wins. Results are cached per device model, so later wipes
+# of the same kind of drive skip the calibration.
+
+import json
+import os
+import stat
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+
+from .engine import ALIGNMENT, WipeEngine, WipeError
+
+BLOCK_SIZES = (256 * 1024, 1024 * 1024, 4 * 1024 * 1024, 16 * 1024 * 1024)
+QUEUE_DEPTHS = (1, 2, 4, 8)
+DEFAULT_SAMPLE_BYTES = 64 * 1024 * 1024
+
+
+@dataclass
+class Geometry:
+    model: str
+    block_size: int
+    queue_depth: int
+    throughput: float  # bytes/sec of the winning trial
+    trials: list = field(default_factory=list)  # [[block_size, queue_depth, throughput], ...]
+    tuned_at: float = 0.0
+    cached: bool = False
+
+    def summary(self):
+        source = "cached" if self.cached else f"calibrated over {len(self.trials)} trial(s)"
+        return (f"I/O geometry for {self.model}: {self.block_size // 1024} KiB blocks, "
+                f"{self.queue_depth} write(s) in flight, {self.throughput / 1e6:.1f} MB/s ({source}).")
+
+
+def _read_sys(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return ''
+
+
+def disk_sys_dir(target):
+    """Resolved sysfs directory of the whole disk behind block device `target` (a partition's parent)."""
+    name = os.path.basename(os.path.realpath(target))
+    sys_dir = os.path.realpath(f"/sys/class/block/{name}")
+    if os.path.exists(os.path.join(sys_dir, 'partition')):
+        sys_dir = os.path.dirname(sys_dir)
+    return sys_dir
+
+
+def device_model(target):
+    """Cache key for the media behind `target`.
+
+    Block devices use the model string from sysfs (the parent disk's, for a
+    partition); files use the device number of the filesystem holding them.
+    """
+    st = os.stat(target)
+    if not stat.S_ISBLK(st.st_mode):
+        return f"file:{os.major(st.st_dev)}:{os.minor(st.st_dev)}"
+    sys_dir = disk_sys_dir(target)
+    # SCSI/SATA/NVMe expose device/model; eMMC and SD cards expose device/name
+    model = _read_sys(os.path.join(sys_dir, 'device', 'model')) or _read_sys(os.path.join(sys_dir, 'device', 'name'))
+    vendor = _read_sys(os.path.join(sys_dir, 'device', 'vendor'))
+    return " ".join(p for p in (vendor, model) if p) or f"block:{os.path.basename(sys_dir)}"
+
+
+class TuneCache:
+    """JSON file of the best geometry per device model; one instance can be shared by concurrent wipes."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._model_locks = {}
+        try:
+            with open(path) as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def model_lock(self, model):
+        """Lock held while `model` is calibrated, so drives of one model calibrate once between them."""
+        with self._lock:
+            return self._model_locks.setdefault(model, threading.Lock())
+
+    def get(self, model):
+        entry = self._entries.get(model)
+        return Geometry(**dict(entry, cached=True)) if entry else None
+
+    def put(self, geometry):
+        entry = asdict(geometry)
+        entry.pop('cached')
+        with self._lock:
+            self._entries[geometry.model] = entry
+            tmp = f"{self.path}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump(self._entries, f, indent=2, sort_keys=True)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            # Durable before the wipe starts: a crash must not lose the entry while the journal survives
+            dir_fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+
+def calibrate(target, block_sizes=BLOCK_SIZES, queue_depths=QUEUE_DEPTHS,
+              sample_bytes=DEFAULT_SAMPLE_BYTES, direct=False, model=None):
+    """Times every (block size, queue depth) pair on the start of `target`; returns the fastest.
+
+    Destructive: overwrites the first `sample_bytes` of the target with zeros.
+    """
+    fd = os.open(target, os.O_RDONLY)
+    try:
+        size = os.lseek(fd, 0, os.SEEK_END)
+    finally:
+        os.close(fd)
+    sample = min(sample_bytes, size) // ALIGNMENT * ALIGNMENT
+    if not sample:
+        raise WipeError(f"{target} is too small to calibrate.")
+
+    trials = []
+    for block_size in block_sizes:
+        if block_size > sample and trials:
+            continue  # a block bigger than the sample measures nothing new
+        for queue_depth in queue_depths:
+            engine = WipeEngine(block_size=block_size, direct=direct, queue_depth=queue_depth)
+            result = engine.wipe(target, 'QUICK', length=sample)
+            trials.append([block_size, queue_depth, result.throughput])
+
+    # Ties keep the earlier (smaller, cheaper) geometry
+    best = max(trials, key=lambda t: t[2])
+    return Geometry(
+        model=model or device_model(target),
+        block_size=best[0],
+        queue_depth=best[1],
+        throughput=best[2],
+        trials=trials,
+        tuned_at=time.time(),
+    )
+
+
+def tune(target, cache=None, model=None, **calibrate_options):
+    """Cached geometry for `target`'s device model, calibrating (and caching) on a miss."""
+    model = model or device_model(target)
+    if cache is None:
+        return calibrate(target, model=model, **calibrate_options)
+    cached = cache.get(model)
+    if cached is not None:
+        return cached
+    with cache.model_lock(model):
+        cached = cache.get(model)  # another drive of this model may have calibrated while we waited
+        if cached is not None:
+            return cached
+        geometry = calibrate(target, model=model, **calibrate_options)
+        cache.put(geometry)
+    return geometry
@@ -0,0 +1,147 @@
+# ddp_wipe/cli.py
+#
+# Headless agent for scripted fleet runs (SSH sessions, PXE-booted images
+# without a display):
+#
+#   python -m ddp_wipe /dev/sdb /dev/sdc --algorithm DOD --hub http://hub:8080/api/v1/mint/batch/ --yes
+#
+# Every drive is wiped, verified and certified exactly like in the Tk agent
+# (agent.py). stdout carries one JSON object per line (start, progress,
+# drive, station, sync events) for the orchestrator to parse; human-readable
+# log lines go to stderr. Only argparse and the stdlib basics load before
+# the arguments are parsed, so launching one process per drive stays cheap.
+# Exit status: 0 when every drive was certified, 1 otherwise, 2 on bad usage.
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+ALGORITHMS = ('NIST', 'DOD', 'CE')  # agent.WIPE_ALGORITHMS, without importing it for --help
+
+
+def default_device_id():
+    """Unique per run: certificate serials are `<device id>-<drive>`, and the hub mints a serial once."""
+    host = os.uname().nodename.split('.')[0][:16] if hasattr(os, 'uname') else 'HOST'
+    return f"FLEET-AGENT-{host}-{os.urandom(4).hex()}"
+
+
+class EventWriter:
+    """Thread-safe JSON-lines writer: scheduler threads report concurrently."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def __call__(self, event, **fields):
+        line = json.dumps(dict(event=event, time=round(time.time(), 3), **fields), sort_keys=True)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m ddp_wipe",
+        description="Wipe, verify and certify drives without a GUI; progress is printed as JSON lines.",
+    )
+    parser.add_argument('targets', nargs='+', help="Devices (or image files) to wipe, all at once.")
+    parser.add_argument('--algorithm', choices=ALGORITHMS, default='NIST')
+    parser.add_argument('--hub', metavar='URL', help="Hub batch mint URL (…/api/v1/mint/batch/). "
+                                                     "Without it certificates stay in the outbox.")
+    parser.add_argument('--device-id', default=default_device_id(),
+                        help="Prefix of the certificate serials (default: FLEET-AGENT-<host>-<random>, new every run).")
+    parser.add_argument('--outbox', help="Certificate outbox (default: on the USB stick, else ~/ddp_outbox.sqlite3).")
+    parser.add_argument('--journal-dir', help="Checkpoint journals for resuming (default: on the USB stick, else ~/ddp_journals).")
+    parser.add_argument('--tune-cache', help="Per-model I/O geometry cache (default: on the USB stick, else ~/ddp_autotune.json).")
+    parser.add_argument('--no-tune', action='store_true', help="Skip the I/O calibration and use the default geometry.")
+    parser.add_argument('--no-verify', action='store_true', help="Skip the read-back verification.")
+    parser.add_argument('--sparse', action='store_true',
+                        help="Overwrite only the extents holding data (sparse images, thin volumes); holes are skipped.")
+    parser.add_argument('--deallocate', action='store_true',
+                        help="Punch out (files) or discard (block devices) the wiped blocks afterwards.")
+    parser.add_argument('--per-controller', type=int, default=2, help="Concurrent wipes per controller (default 2).")
+    parser.add_argument('--progress-interval', type=float, default=1.0, help="Seconds between progress events per drive.")
+    parser.add_argument('--yes', action='store_true', help="Confirm that ALL DATA on the targets will be destroyed.")
+    return parser
+
+
+def main(argv=None, stdout=None, stderr=None):
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.yes:
+        parser.error("refusing to wipe without --yes (this destroys all data on the targets)")
+    if args.per_controller < 1:
+        parser.error("--per-controller must be at least 1")
+
+    from . import agent  # Lazy: keeps --help and argument errors instant
+
+    emit = EventWriter(stdout)
+
+    def log(message):
+        stderr.write(message + "\n")
+        stderr.flush()
+
+    wipe_agent = agent.WipeAgent(
+        device_id=args.device_id,
+        outbox_path=args.outbox or agent.usable_path(agent.OUTBOX_PATH, agent.OUTBOX_FALLBACK_PATH),
+        hub_batch_url=args.hub,
+        tune_cache_path=None if args.no_tune else (
+            args.tune_cache or agent.usable_path(agent.AUTOTUNE_CACHE_PATH, agent.AUTOTUNE_FALLBACK_PATH)),
+        journal_dir=args.journal_dir or agent.usable_path(agent.JOURNAL_DIR, agent.JOURNAL_FALLBACK_DIR),
+        verify=not args.no_verify,
+        sparse=args.sparse,
+        deallocate=args.deallocate,
+        wipes_per_controller=args.per_controller,
+        progress_interval=args.progress_interval,
+        log=log,
+    )
+    try:
+        wipe_agent.open_outbox()
+    except Exception as e:
+        emit('error', message=f"Cannot open the certificate outbox: {e}")
+        return 1
+
+    def on_progress(job):
+        p = job.progress
+        if p is None:
+            emit('drive_started', target=job.target, controller=job.controller)
+            return
+        emit('progress', target=job.target, pass_index=p.pass_index, pass_count=p.pass_count, pass_label=p.pass_label,
+             bytes_done=p.bytes_done, bytes_total=p.bytes_total, percent=round(p.percent, 2),
+             throughput=round(p.throughput), eta_seconds=p.eta_seconds and round(p.eta_seconds, 1))
+
+    failed = []
+
+    def on_finished(job, cert, queued):
+        if not queued:
+            failed.append(job.target)
+        result = job.result
+        emit('drive', target=job.target, state=job.state, error=job.error or None,
+             certified=queued, stored=cert is not None,
+             imei_serial=cert and cert['imei_serial'], dlt_hash=cert and cert['dlt_hash'],
+             bytes_written=result and result.bytes_written, seconds=result and round(result.seconds, 3),
+             resumed=result.resumed if result else [],
+             verification=result and result.verification and result.verification.summary())
+
+    drives = [(target, target) for target in args.targets]
+    emit('start', targets=args.targets, algorithm=args.algorithm, device_id=args.device_id)
+    try:
+        station = wipe_agent.run(drives, args.algorithm, on_progress=on_progress, on_finished=on_finished)
+    except ValueError as e:
+        emit('error', message=str(e))
+        return 1
+    emit('station', drives=len(station.jobs), failed=len(failed), bytes_written=station.bytes_written,
+         seconds=round(station.seconds, 3), throughput=round(station.throughput))
+
+    if args.hub:
+        try:
+            emit('sync', settled=wipe_agent.sync(), pending=wipe_agent.outbox.counts()['pending'])
+        except Exception as e:  # hub unreachable: the certificates wait in the outbox for the next run
+            emit('sync', settled=0, pending=wipe_agent.outbox.counts()['pending'], error=str(e))
+    wipe_agent.outbox.close()
+    return 1 if failed else 0
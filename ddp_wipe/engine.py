@@ -0,0 +1,514 @@
+# ddp_wipe/engine.py
+#
+# In-process streaming overwrite engine (replaces the `dd if=/dev/zero` shell-out).
+#
+# Page-aligned buffers are allocated once per wipe (mmap) and reused for
+# every block of every pass; constant passes fill them once, random passes
+# refill them in place. With queue_depth > 1 each in-flight write owns one
+# buffer. Random passes use a seeded keystream (patterns.KeystreamPattern)
+# whose seed is kept in the result, so the verifier can regenerate them.
+# With a `journal_dir`, progress is checkpointed (journal.py) and a wipe
+# interrupted by a crash or power loss resumes from its last checkpoint.
+# Targets can be block devices, partitions, loop devices or plain
+# files, so the engine can be exercised in tests without touching a disk.
+
+import errno
+import mmap
+import os
+import stat
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from . import sparse as sparse_io
+from .journal import DEFAULT_CHECKPOINT_BYTES, DEFAULT_CHECKPOINT_SECONDS, WipeJournal, journal_path
+from .patterns import ConstantPattern, KeystreamPattern
+
+ALIGNMENT = 4096
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024
+FREE_SPACE_FILENAME = "temp_wipe.dat"
+
+# Pass schedule per algorithm key: (label, byte value or None for random)
+WIPE_SCHEDULES = {
+    'NIST': (('random', None),),
+    'DOD': (('zeros', 0x00), ('ones', 0xFF), ('random', None)),
+    'QUICK': (('zeros', 0x00),),
+    # Cryptographic erase needs the drive's own key-destroy command; on a raw
+    # target the closest thing the engine can do is a single random overwrite.
+    'CE': (('random', None),),
+}
+
+
+class WipeError(Exception):
+    """Raised when a target cannot be opened, sized or fully overwritten."""
+
+
+def make_pattern(value, seed=None, generator=None):
+    """Pattern source for a schedule entry; random entries get a fresh seed unless one is given."""
+    return KeystreamPattern(seed, generator) if value is None else ConstantPattern(value)
+
+
+@dataclass
+class WipeProgress:
+    pass_index: int  # 1-based
+    pass_count: int
+    pass_label: str
+    bytes_done: int  # across all passes
+    bytes_total: int  # across all passes
+    throughput: float  # bytes/sec since the wipe started
+    elapsed: float
+
+    @property
+    def percent(self):
+        return 100.0 * self.bytes_done / self.bytes_total if self.bytes_total else 100.0
+
+    @property
+    def eta_seconds(self):
+        if not self.throughput:
+            return None
+        return (self.bytes_total - self.bytes_done) / self.throughput
+
+
+@dataclass
+class PassResult:
+    label: str
+    bytes_written: int
+    seconds: float
+    seed: str = ''  # hex keystream seed of a random pass: regenerates its bytes
+    generator: str = ''
+
+    @property
+    def throughput(self):
+        return self.bytes_written / self.seconds if self.seconds else 0.0
+
+
+@dataclass
+class WipeResult:
+    target: str
+    algorithm: str
+    size: int
+    block_size: int
+    direct: bool
+    queue_depth: int = 1
+    passes: list = field(default_factory=list)
+    verification: object = None  # verify.VerificationResult when a verifier was given
+    sparse: bool = False
+    skipped_bytes: int = 0  # unmapped (hole) bytes left alone by a sparse wipe
+    deallocated_bytes: int = 0  # bytes punched/discarded (or trimmed, see `trimmed`) after the wipe
+    trimmed: bool = False  # free-space wipe followed by FITRIM; unrelated to `sparse`
+    resumed: list = field(default_factory=list)  # [[pass number, bytes of it already wiped by an earlier run], ...]
+    checkpoints: int = 0
+
+    @property
+    def bytes_written(self):
+        return sum(p.bytes_written for p in self.passes)
+
+    @property
+    def seconds(self):
+        return sum(p.seconds for p in self.passes)
+
+    @property
+    def throughput(self):
+        return self.bytes_written / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        passes = ", ".join(f"{p.label} {p.throughput / 1e6:.1f} MB/s" for p in self.passes)
+        text = (f"{len(self.passes)} pass(es) over {self.size} bytes of {self.target} "
+                f"[{passes}]; {self.bytes_written} bytes written at {self.throughput / 1e6:.1f} MB/s.")
+        for number, p in enumerate(self.passes, start=1):
+            if p.seed:
+                text += f" Pass {number} keystream: {p.generator} seed {p.seed}."
+        if self.sparse:
+            overwritten = self.passes[0].bytes_written if self.passes else 0
+            text += (f" Sparse: {overwritten} mapped bytes overwritten per pass, "
+                     f"{self.skipped_bytes} unmapped bytes skipped.")
+        if self.trimmed:
+            text += (f" Free space trimmed (FITRIM): {self.deallocated_bytes} bytes discarded." if self.deallocated_bytes
+                     else " Free space not trimmed: FITRIM unsupported or not permitted.")
+        elif self.deallocated_bytes:
+            text += f" {self.deallocated_bytes} wiped bytes deallocated (punched/discarded)."
+        if self.resumed:
+            segments = ", ".join(f"pass {number} after {offset} bytes" for number, offset in self.resumed)
+            text += f" Resumed from checkpoint after an interruption: {segments}."
+        if self.verification is not None:
+            text += " " + self.verification.summary()
+        return text
+
+
+def skip_extents(extents, skip):
+    """`extents` without their first `skip` bytes (the part of a pass already on the media)."""
+    remaining = []
+    for start, length in extents:
+        if skip >= length:
+            skip -= length
+            continue
+        remaining.append((start + skip, length - skip))
+        skip = 0
+    return remaining
+
+
+def target_size(fd):
+    """Size in bytes of an open file, partition or block device."""
+    st = os.fstat(fd)
+    if stat.S_ISREG(st.st_mode):
+        return st.st_size
+    return os.lseek(fd, 0, os.SEEK_END)
+
+
+class WipeEngine:
+    """Streams each pass of a wipe schedule over a target with reused aligned buffers.
+
+    `queue_depth` is the number of writes kept in flight (one buffer each);
+    1 writes synchronously from a single buffer. `progress` is called with a
+    WipeProgress at most every `progress_interval` seconds (and once at the
+    end of every pass). `journal_dir` enables resumable wipes, checkpointing
+    every `checkpoint_bytes` or `checkpoint_seconds`, whichever comes first.
+    """
+
+    def __init__(self, block_size=DEFAULT_BLOCK_SIZE, direct=False, progress=None, progress_interval=0.5, queue_depth=1,
+                 journal_dir=None, checkpoint_bytes=DEFAULT_CHECKPOINT_BYTES, checkpoint_seconds=DEFAULT_CHECKPOINT_SECONDS):
+        if block_size <= 0 or block_size % ALIGNMENT:
+            raise ValueError(f"block_size must be a positive multiple of {ALIGNMENT}")
+        if queue_depth < 1:
+            raise ValueError("queue_depth must be at least 1")
+        self.block_size = block_size
+        self.queue_depth = queue_depth
+        self.direct = direct
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self.journal_dir = journal_dir
+        self.checkpoint_bytes = checkpoint_bytes
+        self.checkpoint_seconds = checkpoint_seconds
+
+    # --- OPENING ---
+
+    def _open(self, path, flags):
+        """Opens with O_DIRECT when requested and supported; returns (fd, direct_used)."""
+        direct_flag = getattr(os, 'O_DIRECT', 0)
+        if self.direct and direct_flag:
+            try:
+                return os.open(path, flags | direct_flag), True
+            except OSError as e:
+                if e.errno != errno.EINVAL:  # EINVAL: filesystem (e.g. tmpfs) has no O_DIRECT
+                    raise
+        return os.open(path, flags), False
+
+    # --- PUBLIC API ---
+
+    def wipe(self, target, algorithm='NIST', length=None, verifier=None, sparse=False, deallocate=False):
+        """Overwrites `target` (device or file) in place with every pass of `algorithm`.
+
+        With a `verifier` (verify.Verifier), the target is read back against
+        the final pass's pattern and the outcome stored on `result.verification`.
+        `sparse` overwrites only the extents that hold data (SEEK_DATA/SEEK_HOLE)
+        and leaves holes alone; `deallocate` then punches/discards the wiped
+        extents (after verification) so thin storage gets the space back.
+        """
+        schedule = self._schedule(algorithm)
+        try:
+            fd, direct = self._open(target, (os.O_RDWR if sparse else os.O_WRONLY) | getattr(os, 'O_BINARY', 0))
+        except OSError as e:
+            raise WipeError(f"Cannot open {target} for writing: {e}") from e
+
+        journal = None
+        try:
+            size = target_size(fd) if length is None else length
+            result = WipeResult(target, algorithm, size, self.block_size, direct, self.queue_depth, sparse=sparse)
+            journal, resume = self._open_journal('device', target, {'algorithm': algorithm, 'size': size, 'sparse': sparse}, size)
+            extents = None
+            if sparse:
+                extents = sparse_io.data_extents(fd, size)
+                result.skipped_bytes = size - sparse_io.extent_bytes(extents)
+            self._run(fd, target, size, schedule, result, extend=False, extents=extents, journal=journal, resume=resume)
+            if verifier is not None:
+                result.verification = verifier.verify(target, self._final_pattern(schedule, result),
+                                                      length=result.size, extents=extents)
+            if deallocate:
+                result.deallocated_bytes = sparse_io.deallocate(fd, extents if extents is not None else [(0, size)])
+            if journal is not None:
+                journal.discard()
+        finally:
+            if journal is not None:
+                journal.close()  # kept on failure: the next run resumes from it
+            os.close(fd)
+        return result
+
+    def wipe_free_space(self, directory, algorithm='NIST', limit=None, verifier=None, deallocate=False):
+        """Fills the free space of `directory`'s filesystem with every pass, then removes the fill file.
+
+        The first pass grows the fill file until the disk is full (or `limit`
+        bytes); later passes overwrite the same extent in place. `deallocate`
+        trims the freed space afterwards (FITRIM), so thin-provisioned or
+        TRIM-capable storage doesn't stay fully allocated by the wipe.
+        """
+        schedule = self._schedule(algorithm)
+        path = os.path.join(directory, FREE_SPACE_FILENAME)
+        if limit is None:
+            try:
+                vfs = os.statvfs(directory)
+            except OSError as e:
+                raise WipeError(f"Cannot create {path}: {e}") from e
+            limit = vfs.f_bavail * vfs.f_frsize
+        # A fill file left by a crashed run still covers the free space wiped so far: keep it to resume
+        journal, resume = self._open_journal('free_space', path, {'algorithm': algorithm}, limit,
+                                             usable=lambda: os.path.exists(path))
+        if resume is not None:
+            limit = resume.size  # the fill file now occupies part of what statvfs reported originally
+        try:
+            flags = os.O_WRONLY | os.O_CREAT | (0 if resume else os.O_TRUNC) | getattr(os, 'O_BINARY', 0)
+            fd, direct = self._open(path, flags)
+        except OSError as e:
+            if journal is not None:
+                journal.discard()
+            raise WipeError(f"Cannot create {path}: {e}") from e
+
+        try:
+            result = WipeResult(path, algorithm, limit, self.block_size, direct, self.queue_depth)
+            self._run(fd, path, limit, schedule, result, extend=True, journal=journal, resume=resume)
+            if verifier is not None:  # read back before the fill file is removed
+                result.verification = verifier.verify(path, self._final_pattern(schedule, result), length=result.size)
+        finally:
+            os.close(fd)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            if journal is not None:
+                # Only a crash (no cleanup at all) leaves the fill file, and so the journal, behind to resume from
+                journal.discard()
+        if deallocate:
+            result.trimmed = True
+            result.deallocated_bytes = sparse_io.fstrim(directory)
+        return result
+
+    # --- INTERNALS ---
+
+    def _schedule(self, algorithm):
+        try:
+            return WIPE_SCHEDULES[algorithm]
+        except KeyError:
+            raise WipeError(f"Unknown wipe algorithm '{algorithm}'.") from None
+
+    def _open_journal(self, kind, target, identity, size, usable=None):
+        """(journal, resume point) for `target`; both None without a journal_dir."""
+        if self.journal_dir is None:
+            return None, None
+        os.makedirs(self.journal_dir, exist_ok=True)
+        journal = WipeJournal(journal_path(self.journal_dir, kind, target),
+                              every_bytes=self.checkpoint_bytes, every_seconds=self.checkpoint_seconds)
+        identity = dict(identity, kind=kind, target=os.path.realpath(target))
+        geometry = {'block_size': self.block_size, 'queue_depth': self.queue_depth}
+        resume = journal.open(identity, size, geometry)
+        if resume is not None and usable is not None and not usable():
+            journal.discard()
+            resume = journal.open(identity, size, geometry)
+        return journal, resume
+
+    def _final_pattern(self, schedule, result):
+        """The last pass's pattern again (same seed), for read-back verification."""
+        last = result.passes[-1]
+        return make_pattern(schedule[-1][1], last.seed or None, last.generator or None)
+
+    def _run(self, fd, path, size, schedule, result, extend, extents=None, journal=None, resume=None):
+        extents = [(0, size)] if extents is None else extents
+        pass_total = sparse_io.extent_bytes(extents)
+        # Anonymous mmaps: page-aligned, as O_DIRECT needs. One per in-flight write.
+        buffers = [mmap.mmap(-1, self.block_size) for _ in range(self.queue_depth)]
+        views = [memoryview(b) for b in buffers]
+        pool = None
+        if self.queue_depth > 1:
+            from concurrent.futures import ThreadPoolExecutor  # Lazy: pulls in logging; serial wipes never need it
+            pool = ThreadPoolExecutor(self.queue_depth, thread_name_prefix='ddp-pwrite')
+        started = time.perf_counter()
+        state = {'last_report': 0.0, 'done_before': 0, 'grand_total': pass_total * len(schedule)}
+
+        try:
+            for pass_number, (label, value) in enumerate(schedule, start=1):
+                prior = resume.passes.get(pass_number) if resume is not None else None
+                if prior is not None and prior.complete:
+                    # Finished before the interruption: nothing to rewrite
+                    if prior.size is not None:
+                        result.size = prior.size
+                        extents = [(0, prior.size)]
+                        state['grand_total'] = prior.size * len(schedule)
+                    result.passes.append(PassResult(label, prior.done, prior.seconds, prior.seed, prior.generator))
+                    state['done_before'] += prior.done
+                    continue
+                skip = prior.done if prior is not None else 0  # durable at the last checkpoint
+                seconds_before = prior.seconds if prior is not None else 0.0
+
+                def tick(offset, force=False):
+                    now = time.perf_counter()
+                    if journal is not None and not force:  # the end of a pass is recorded by end_pass()
+                        journal.advance(pass_number, skip + offset, fd, seconds_before + now - pass_started)
+                    if self.progress and (force or now - state['last_report'] >= self.progress_interval):
+                        state['last_report'] = now
+                        self._report(pass_number, len(schedule), label, state['done_before'] + skip + offset,
+                                     state['grand_total'], now - started)
+
+                if prior is not None:
+                    pattern = make_pattern(value, prior.seed or None, prior.generator or None)  # same bytes as before
+                else:
+                    pattern = make_pattern(value)
+                if journal is not None:
+                    journal.begin_pass(pass_number, getattr(pattern, 'seed_hex', ''), getattr(pattern, 'generator', ''), skip)
+                if skip:
+                    result.resumed.append([pass_number, skip])
+                if pattern.constant:
+                    for view in views:
+                        pattern.fill(view)
+                pass_started = time.perf_counter()
+                pass_extents = skip_extents(extents, skip)
+                allow_full = extend and pass_number == 1  # free-space wipe: a full disk ends the first pass
+                try:
+                    if pool is None:
+                        done, disk_full = self._pass_serial(fd, path, pass_extents, pattern, views[0], result, allow_full, tick)
+                    else:
+                        done, disk_full = self._pass_queued(fd, path, pass_extents, pattern, views, pool, result, allow_full, tick)
+                    os.fsync(fd)
+                finally:
+                    pattern.close()
+
+                done += skip
+                seconds = seconds_before + time.perf_counter() - pass_started
+                if disk_full:
+                    # The wiped extent ends where the disk filled up (free-space wipes have one extent from 0)
+                    result.size = done
+                    extents = [(0, done)]
+                    state['grand_total'] = done * len(schedule)
+                if journal is not None:
+                    journal.end_pass(pass_number, done, seconds, done if disk_full else None)
+                result.passes.append(PassResult(label, done, seconds,
+                                                getattr(pattern, 'seed_hex', ''), getattr(pattern, 'generator', '')))
+                tick(done - skip, force=True)
+                state['done_before'] += done
+        finally:
+            if journal is not None:
+                result.checkpoints = journal.checkpoints
+            if pool is not None:
+                pool.shutdown(wait=True)
+            for view in views:
+                view.release()
+            for buffer in buffers:
+                buffer.close()
+
+    def _blocks(self, extents):
+        """(offset, length) of every block of a pass, extent by extent."""
+        for start, length in extents:
+            for offset in range(start, start + length, self.block_size):
+                yield offset, min(self.block_size, start + length - offset)
+
+    def _pass_serial(self, fd, path, extents, pattern, view, result, allow_full, tick):
+        """One pass, one write at a time. Returns (bytes written, disk_full)."""
+        done = 0
+        chunk = None
+        try:
+            for offset, n in self._blocks(extents):
+                chunk = view if n == self.block_size else view[:n]
+                if not pattern.constant:
+                    pattern.fill(chunk, offset)
+                written = 0
+                while written < n:
+                    try:
+                        written += self._write(fd, path, chunk[written:] if written else chunk, offset + written, result)
+                    except OSError as e:
+                        if allow_full and e.errno == errno.ENOSPC:
+                            return done + written, True
+                        raise WipeError(f"Write failed on {path} at offset {offset + written}: {e}") from e
+                done += n
+                tick(done)
+        finally:
+            chunk = None  # drop the last slice so the mmap has no exported views left
+        return done, False
+
+    def _pass_queued(self, fd, path, extents, pattern, views, pool, result, allow_full, tick):
+        """One pass with up to `queue_depth` pwrite()s in flight, each from its own buffer.
+
+        pwrite releases the GIL, so the device sees several outstanding writes,
+        which is what SSDs and eMMC need to reach full speed. Completions are
+        taken in submission order, so the pass is contiguous up to `done`.
+        """
+        in_flight = deque()  # (offset, length, view index, future)
+        free = list(range(len(views)))
+        done = 0
+        disk_full = False
+        chunk = None
+
+        def complete_oldest():
+            nonlocal done, disk_full
+            block_offset, n, index, future = in_flight.popleft()
+            free.append(index)
+            try:
+                written = future.result()
+            except OSError as e:
+                if allow_full and e.errno == errno.ENOSPC:
+                    disk_full = True
+                    return
+                raise WipeError(f"Write failed on {path} at offset {block_offset}: {e}") from e
+            if disk_full:
+                return  # past the end of the wiped extent: ignore
+            done += written
+            if written < n:
+                disk_full = allow_full
+                if not allow_full:
+                    raise WipeError(f"Short write on {path} at offset {block_offset}.")
+            tick(done)
+
+        try:
+            blocks = self._blocks(extents)
+            pending_block = next(blocks, None)
+            while pending_block is not None and not disk_full:
+                if not free:
+                    complete_oldest()
+                    continue
+                offset, n = pending_block
+                index = free.pop()
+                chunk = views[index] if n == self.block_size else views[index][:n]
+                if not pattern.constant:
+                    pattern.fill(chunk, offset)
+                in_flight.append((offset, n, index, pool.submit(self._write_all, fd, path, chunk, offset, result)))
+                pending_block = next(blocks, None)
+            while in_flight:
+                complete_oldest()
+        finally:
+            chunk = None
+            for _, _, _, future in in_flight:  # an error is propagating: let the writes settle first
+                future.cancel() or future.exception()
+        return done, disk_full
+
+    def _write_all(self, fd, path, chunk, offset, result):
+        """Worker-side write of a whole block; returns bytes written (short only at ENOSPC)."""
+        done = 0
+        try:
+            while done < len(chunk):
+                done += self._write(fd, path, chunk[done:], offset + done, result)
+        except OSError as e:
+            if e.errno != errno.ENOSPC or not done:
+                raise
+        return done
+
+    def _write(self, fd, path, chunk, offset, result):
+        if result.direct and len(chunk) % ALIGNMENT:
+            # O_DIRECT cannot write an unaligned tail; finish it through the page cache
+            tail_fd = os.open(path, os.O_WRONLY)
+            try:
+                written = os.pwrite(tail_fd, chunk, offset)
+                os.fsync(tail_fd)
+                return written
+            finally:
+                os.close(tail_fd)
+        written = os.pwrite(fd, chunk, offset)
+        if written == 0:
+            raise OSError(errno.ENOSPC, "No space left on device")
+        return written
+
+    def _report(self, pass_number, pass_count, label, done, total, elapsed):
+        self.progress(WipeProgress(
+            pass_index=pass_number,
+            pass_count=pass_count,
+            pass_label=label,
+            bytes_done=done,
+            bytes_total=total,
+            throughput=done / elapsed if elapsed else 0.0,
+            elapsed=elapsed,
+        ))
@@ -0,0 +1,155 @@
+# ddp_wipe/journal.py
+#
+# On-disk checkpoint journal that lets a wipe resume after a crash or power
+# loss instead of starting again from block 0.
+#
+# The journal is a small append-only JSON-lines file per target: a header
+# identifying the wipe (and the block size / queue depth it runs with, so a
+# resume needs no new calibration), then one record per pass start (with the keystream
+# seed, so a resumed random pass writes the same bytes), per checkpoint
+# (bytes of the pass known to be on the media) and per finished pass.
+# Checkpoints are batched: one is written only every `every_bytes` bytes or
+# `every_seconds` seconds, and costs an fsync of the target (so the bytes it
+# claims are durable) plus an fsync of the journal. A torn last line from a
+# power cut is ignored on replay.
+
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+
+JOURNAL_VERSION = 1
+DEFAULT_CHECKPOINT_BYTES = 1024 * 1024 * 1024
+DEFAULT_CHECKPOINT_SECONDS = 30.0
+
+
+def journal_path(directory, kind, target):
+    """Journal file for one target in `directory` (stable across restarts)."""
+    key = hashlib.sha256(f"{kind}:{os.path.realpath(target)}".encode('utf-8')).hexdigest()[:16]
+    return os.path.join(directory, f"wipe-{key}.journal")
+
+
+@dataclass
+class PassState:
+    seed: str = ''
+    generator: str = ''
+    done: int = 0  # bytes of the pass durable on the media
+    complete: bool = False
+    seconds: float = 0.0  # time spent writing `done`, over all runs
+    size: int = None  # wiped size once a free-space first pass hit disk-full
+
+
+@dataclass
+class ResumePoint:
+    size: int
+    passes: dict = field(default_factory=dict)  # pass number -> PassState
+    runs: int = 1  # earlier runs of this wipe that left checkpoints
+
+
+def saved_geometry(path):
+    """{'block_size', 'queue_depth'} recorded by an unfinished wipe's journal at `path`.
+
+    None when there is no journal; {} for a journal that recorded none.
+    """
+    try:
+        with open(path) as f:
+            header = json.loads(f.readline())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        return {}
+    return header.get('geometry') or {} if isinstance(header, dict) else {}
+
+
+class WipeJournal:
+    """Checkpoint journal of one wipe. `open()` returns where to resume (or None for a fresh wipe)."""
+
+    def __init__(self, path, every_bytes=DEFAULT_CHECKPOINT_BYTES, every_seconds=DEFAULT_CHECKPOINT_SECONDS):
+        self.path = path
+        self.every_bytes = every_bytes
+        self.every_seconds = every_seconds
+        self.checkpoints = 0
+        self._file = None
+        self._last_done = 0
+        self._last_time = 0.0
+
+    def open(self, identity, size, geometry=None):
+        """Replays a journal written for the same `identity` (dict), or starts a new one."""
+        resume = self._replay(identity)
+        if resume is None:
+            self._file = open(self.path, 'w')
+            self._append({'v': JOURNAL_VERSION, 'identity': identity, 'size': size, 'geometry': geometry})
+        else:
+            self._file = open(self.path, 'a')
+            self._append({'resumed': resume.runs})
+        self._last_time = time.monotonic()
+        return resume
+
+    def begin_pass(self, number, seed='', generator='', done=0):
+        """Durable before the pass writes anything, so a resumed random pass reuses its seed."""
+        self._last_done, self._last_time = done, time.monotonic()
+        self._append({'pass': number, 'seed': seed, 'generator': generator, 'done': done})
+
+    def advance(self, number, done, fd, seconds):
+        """Records `done` bytes of pass `number` when a checkpoint is due; `fd` is the target."""
+        if (done - self._last_done < self.every_bytes
+                and time.monotonic() - self._last_time < self.every_seconds):
+            return
+        os.fsync(fd)  # the checkpoint may only claim bytes that are on the media
+        self._append({'pass': number, 'done': done, 'seconds': seconds})
+        self._last_done, self._last_time = done, time.monotonic()
+        self.checkpoints += 1
+
+    def end_pass(self, number, done, seconds, size=None):
+        """Marks a pass finished; the caller has already fsynced the target."""
+        self._append({'pass': number, 'done': done, 'complete': True, 'seconds': seconds, 'size': size})
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def discard(self):
+        """Wipe finished (or can't be resumed): the journal is no longer needed."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _append(self, record):
+        self._file.write(json.dumps(record, sort_keys=True) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _replay(self, identity):
+        try:
+            with open(self.path) as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return None
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break  # torn write at the power cut: everything before it is intact
+        if not records or records[0].get('v') != JOURNAL_VERSION or records[0].get('identity') != identity:
+            return None
+
+        resume = ResumePoint(size=records[0]['size'])
+        for record in records[1:]:
+            if 'resumed' in record:
+                resume.runs = record['resumed'] + 1
+                continue
+            state = resume.passes.setdefault(record['pass'], PassState())
+            if 'seed' in record:
+                state.seed, state.generator = record['seed'], record['generator']
+            if 'done' in record:
+                state.done = record['done']
+            if 'seconds' in record:
+                state.seconds = record['seconds']
+            if record.get('complete'):
+                state.complete, state.size = True, record['size']
+        return resume if resume.passes else None
@@ -0,0 +1,185 @@
+# ddp_wipe/outbox.py
+#
+# Durable, append-only certificate outbox for the agent (lives on the USB stick).
+#
+# Every certificate is written to a local SQLite file before the hub is
+# contacted, so nothing is lost while a field agent works offline. A
+# background flusher ships pending certificates to the hub's batch mint
+# endpoint over one pooled HTTP session, backing off while the hub is
+# unreachable; one request per `batch_size` certificates on reconnect.
+
+import json
+import random
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS certificates (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    imei_serial TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    sync INTEGER NOT NULL,          -- 0: local record only (failed wipes)
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    hub_status INTEGER,             -- per-item status returned by the hub (201, 409, 400)
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS certificates_pending ON certificates (sync, sent_at, id);
+"""
+
+
+class Outbox:
+    """Append-only SQLite store of certificates; rows are marked sent, never deleted."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA synchronous=FULL")  # a certificate must survive a power cut
+        self._db.executescript(SCHEMA)
+
+    def enqueue(self, cert, sync=True):
+        """Durably stores one certificate; returns its outbox id."""
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO certificates (imei_serial, payload, created_at, sync) VALUES (?, ?, ?, ?)",
+                (cert['imei_serial'], json.dumps(cert, sort_keys=True), time.time(), int(sync)),
+            )
+            return cursor.lastrowid
+
+    def pending(self, limit):
+        """Oldest unsent certificates: [(id, cert), ...]."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, payload FROM certificates WHERE sync = 1 AND sent_at IS NULL ORDER BY id LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [(row_id, json.loads(payload)) for row_id, payload in rows]
+
+    def mark_sent(self, statuses, errors=None):
+        """Records the hub's verdict for each id ({id: http_status}); those rows leave the queue.
+
+        `errors` ({id: text}) keeps why the hub did not take a certificate.
+        """
+        now = time.time()
+        errors = errors or {}
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "UPDATE certificates SET sent_at = ?, hub_status = ?, last_error = ?, attempts = attempts + 1 "
+                "WHERE id = ?",
+                [(now, code, errors.get(row_id), row_id) for row_id, code in statuses.items()],
+            )
+            self._db.execute("COMMIT")
+
+    def mark_failed(self, ids, error):
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "UPDATE certificates SET attempts = attempts + 1, last_error = ? WHERE id = ?",
+                [(error, row_id) for row_id in ids],
+            )
+            self._db.execute("COMMIT")
+
+    def counts(self):
+        with self._lock:
+            pending, sent = self._db.execute(
+                "SELECT COALESCE(SUM(sent_at IS NULL AND sync = 1), 0), COALESCE(SUM(sent_at IS NOT NULL), 0) FROM certificates"
+            ).fetchone()
+        return {"pending": pending, "sent": sent}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class OutboxFlusher(threading.Thread):
+    """Background thread that drains the outbox into the hub's /mint/batch/ endpoint.
+
+    Network failures back off exponentially (with jitter) up to `max_delay`;
+    `kick()` wakes the thread early, e.g. right after a new certificate.
+    """
+
+    def __init__(self, outbox, batch_url, batch_size=200, base_delay=2.0, max_delay=300.0,
+                 idle_interval=30.0, timeout=20, log=print, session=None):
+        super().__init__(name='ddp-outbox-flusher', daemon=True)
+        self.outbox = outbox
+        self.batch_url = batch_url
+        self.batch_size = batch_size
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.idle_interval = idle_interval
+        self.timeout = timeout
+        self.log = log
+        self._session = session
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self.failures = 0
+
+    @property
+    def session(self):
+        if self._session is None:
+            import requests  # Lazy: only needed once there is something to send
+            self._session = requests.Session()
+        return self._session
+
+    def kick(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+
+    def flush_once(self):
+        """Sends one batch. Returns the number of certificates the hub settled; raises on network errors."""
+        batch = self.outbox.pending(self.batch_size)
+        if not batch:
+            return 0
+        ids = [row_id for row_id, _ in batch]
+        try:
+            response = self.session.post(self.batch_url, json=[cert for _, cert in batch], timeout=self.timeout)
+        except Exception as e:
+            self.outbox.mark_failed(ids, str(e))
+            raise
+
+        if response.status_code != 207:
+            self.outbox.mark_failed(ids, f"HTTP {response.status_code}")
+            raise ConnectionError(f"Hub answered {response.status_code} to a batch mint.")
+
+        # 201 minted; 409 with same_payload: an earlier attempt got through; 409 for a
+        # different certificate under the same serial, or 400: permanently rejected
+        results = response.json()['results']
+        errors = {}
+        for r in results:
+            serial = batch[r['index']][1]['imei_serial']
+            if r['status'] == 400:
+                errors[ids[r['index']]] = f"rejected: {r.get('detail')}"
+                self.log(f"⚠️ Hub rejected certificate {serial}: {r.get('detail')}")
+            elif r['status'] == 409 and not r.get('same_payload'):
+                errors[ids[r['index']]] = "conflict: the hub holds a different passport for this serial"
+                self.log(f"⚠️ NOT CERTIFIED: the hub already holds a different passport for {serial}.")
+        self.outbox.mark_sent({ids[r['index']]: r['status'] for r in results}, errors)
+        return len(results)
+
+    def run(self):
+        while not self._stopping.is_set():
+            try:
+                settled = self.flush_once()
+            except Exception as e:
+                self.failures += 1
+                delay = min(self.max_delay, self.base_delay * 2 ** (self.failures - 1))
+                delay *= random.uniform(0.5, 1.0)
+                self.log(f"❌ CLOUD OFFLINE: {self.outbox.counts()['pending']} certificate(s) queued. Retrying in {delay:.0f}s. ({e})")
+            else:
+                if settled:
+                    if self.failures:
+                        self.log("✅ Hub reachable again; resyncing queued certificates.")
+                    self.failures = 0
+                    self.log(f"✅ CERTIFIED: {settled} certificate(s) synced to the hub.")
+                    continue  # more may be waiting: send the next batch right away
+                self.failures = 0
+                delay = self.idle_interval
+            self._wake.wait(delay)
+            self._wake.clear()
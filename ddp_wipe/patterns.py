@@ -0,0 +1,128 @@
+# ddp_wipe/patterns.py
+#
+# Pattern sources fill a reusable write buffer for one wipe pass.
+# `fill(buffer, offset)` writes into the caller's buffer and never allocates a block-sized one.
+# Reproducible sources can regenerate the bytes of any offset, so the
+# verifier compares read-back data with them instead of stored reference data.
+
+import hashlib
+import os
+
+
+class ConstantPattern:
+    """Every byte has the same value (0x00 zero pass, 0xFF ones pass, ...)."""
+    constant = True
+    reproducible = True
+
+    def __init__(self, value):
+        self.value = value
+        self.label = f"0x{value:02X}"
+
+    def fill(self, buffer, offset=0):
+        # Doubling copy: log2(n) memmoves instead of a per-byte loop or a temporary buffer
+        view = memoryview(buffer)
+        if not len(view):
+            return
+        view[0] = self.value
+        filled = 1
+        while filled < len(view):
+            chunk = min(filled, len(view) - filled)
+            view[filled:filled + chunk] = view[:chunk]
+            filled += chunk
+
+    def close(self):
+        pass
+
+
+GENERATORS = ('chacha20', 'shake128')
+CHACHA_BLOCK = 64
+CHACHA_STRIPE = 1 << 37  # bytes per nonce: keeps the 32-bit block counter (256 GiB) from wrapping
+SHAKE_TILE = 64 * 1024  # SHAKE output is generated per tile of the target
+
+
+def _chacha20():
+    """(Cipher, algorithms) from `cryptography`, or None. Imported on first use: it is slow to load."""
+    try:
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms
+    except ImportError:  # optional: the SHAKE-128 generator needs only the stdlib
+        return None
+    return Cipher, algorithms
+
+
+def default_generator():
+    return 'chacha20' if _chacha20() is not None else 'shake128'
+
+
+class KeystreamPattern:
+    """Pseudorandom bytes derived from a recorded 256-bit seed and the byte offset.
+
+    'chacha20' (needs `cryptography`) is the ChaCha20 keystream keyed by the
+    seed, with the stripe number as nonce and the block counter placed at the
+    offset, so any range is produced directly at several GB/s. 'shake128'
+    (stdlib fallback, much slower) hashes seed + tile number. Either way the
+    bytes at an offset depend only on (generator, seed, offset): the pass can
+    be regenerated for verification from the seed kept in the wipe result.
+    """
+    constant = False
+    reproducible = True
+    label = "random"
+
+    def __init__(self, seed=None, generator=None):
+        self.generator = generator or default_generator()
+        if self.generator not in GENERATORS:
+            raise ValueError(f"Unknown keystream generator '{self.generator}'.")
+        self._cipher = _chacha20() if self.generator == 'chacha20' else None
+        if self.generator == 'chacha20' and self._cipher is None:
+            raise RuntimeError("The chacha20 keystream needs the 'cryptography' package.")
+        if seed is None:
+            seed = os.urandom(32)
+        self.seed = bytes.fromhex(seed) if isinstance(seed, str) else bytes(seed)
+        if len(self.seed) != 32:
+            raise ValueError("Keystream seeds are 32 bytes.")
+        self._zeros = b''
+
+    @property
+    def seed_hex(self):
+        return self.seed.hex()
+
+    def fill(self, buffer, offset=0):
+        view = memoryview(buffer)
+        if self.generator == 'shake128':
+            self._fill_shake(view, offset)
+            return
+        if len(self._zeros) < len(view):
+            self._zeros = bytes(len(view))  # keystream = ChaCha20(zeros); grown once, then reused
+        pos = 0
+        while pos < len(view):
+            at = offset + pos
+            head = at % CHACHA_BLOCK
+            if head:  # unaligned start: take the tail of the block containing it
+                n = min(CHACHA_BLOCK - head, len(view) - pos)
+                block = bytearray(CHACHA_BLOCK)
+                self._chacha(at - head, memoryview(block))
+                view[pos:pos + n] = block[head:head + n]
+            else:
+                n = min(len(view) - pos, CHACHA_STRIPE - at % CHACHA_STRIPE)
+                self._chacha(at, view[pos:pos + n])
+            pos += n
+
+    def _chacha(self, offset, out):
+        """Keystream for [offset, offset + len(out)) of one stripe; `offset` is block-aligned."""
+        counter = (offset % CHACHA_STRIPE) // CHACHA_BLOCK
+        nonce = counter.to_bytes(4, 'little') + (offset // CHACHA_STRIPE).to_bytes(12, 'little')
+        Cipher, algorithms = self._cipher
+        encryptor = Cipher(algorithms.ChaCha20(self.seed, nonce), mode=None).encryptor()
+        encryptor.update_into(memoryview(self._zeros)[:len(out)], out)
+
+    def _fill_shake(self, view, offset):
+        pos = 0
+        while pos < len(view):
+            at = offset + pos
+            tile, skip = divmod(at, SHAKE_TILE)
+            n = min(SHAKE_TILE - skip, len(view) - pos)
+            data = hashlib.shake_128(self.seed + tile.to_bytes(8, 'little')).digest(skip + n)
+            view[pos:pos + n] = data[skip:]
+            pos += n
+
+    def close(self):
+        self._zeros = b''
@@ -0,0 +1,194 @@
+# ddp_wipe/scheduler.py
+#
+# Concurrent wipes of several drives for multi-bay bench stations.
+#
+# Drives behind the same host controller (SATA/SAS HBA, NVMe function, USB
+# host) share its bandwidth, so starting all of them at once only makes each
+# one slower. The scheduler groups targets by controller and runs at most
+# `per_controller` wipes per group at a time (plus an optional station-wide
+# `max_active` cap); queued drives start in submission order as slots free
+# up. Every drive keeps its own progress and ends with its own WipeResult or
+# error, and one drive failing never stops the others.
+
+import os
+import re
+import stat
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+
+from .autotune import disk_sys_dir
+from .engine import WipeEngine
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+PCI_ADDRESS = re.compile(r'^[0-9a-f]{4}:[0-9a-f]{2}:[0-9a-f]{2}\.[0-9a-f]$')
+
+
+def controller_of(target):
+    """Key of the controller/bus `target` sits behind; drives with the same key share bandwidth.
+
+    Block devices resolve to the last PCI function on their sysfs path (the
+    HBA, NVMe function or USB host controller), or the parent device for
+    platform hosts such as eMMC. Files group by the device holding them.
+    """
+    st = os.stat(target)
+    if not stat.S_ISBLK(st.st_mode):
+        return f"file:{os.major(st.st_dev)}:{os.minor(st.st_dev)}"
+    sys_dir = disk_sys_dir(target)
+    pci = [part for part in sys_dir.split(os.sep) if PCI_ADDRESS.match(part)]
+    if pci:
+        return f"pci:{pci[-1]}"
+    device = os.path.realpath(os.path.join(sys_dir, 'device'))
+    if os.path.exists(device):
+        return f"host:{os.path.dirname(device)}"
+    return f"block:{os.path.basename(sys_dir)}"
+
+
+@dataclass
+class DriveJob:
+    target: str
+    algorithm: str = 'NIST'
+    controller: str = None  # filled in from controller_of() when not given
+    options: dict = field(default_factory=dict)  # WipeEngine keyword arguments
+    verifier: object = None
+    state: str = QUEUED
+    progress: object = None  # latest engine.WipeProgress
+    result: object = None  # engine.WipeResult once the wipe finished
+    error: str = ''
+    started_at: float = None
+    finished_at: float = None
+
+    @property
+    def bytes_done(self):
+        if self.result is not None:
+            return self.result.bytes_written
+        return self.progress.bytes_done if self.progress is not None else 0
+
+    @property
+    def percent(self):
+        if self.state == SUCCEEDED:
+            return 100.0
+        return self.progress.percent if self.progress is not None else 0.0
+
+
+@dataclass
+class StationResult:
+    jobs: list
+    seconds: float
+
+    @property
+    def bytes_written(self):
+        return sum(job.bytes_done for job in self.jobs)
+
+    @property
+    def throughput(self):
+        return self.bytes_written / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        succeeded = sum(job.state == SUCCEEDED for job in self.jobs)
+        return (f"{len(self.jobs)} drive(s): {succeeded} wiped, {len(self.jobs) - succeeded} failed; "
+                f"{self.bytes_written} bytes written in {self.seconds:.1f} s "
+                f"at {self.throughput / 1e6:.1f} MB/s station throughput.")
+
+
+class WipeScheduler:
+    """Runs DriveJobs concurrently, at most `per_controller` at a time per controller.
+
+    `wipe(job, report)` performs one drive's wipe and returns its WipeResult
+    (by default a WipeEngine built from job.options); `on_progress` and
+    `on_finished` are called with the job from the worker threads.
+    """
+
+    def __init__(self, per_controller=1, max_active=None, wipe=None, on_progress=None, on_finished=None,
+                 progress_interval=1.0):
+        if per_controller < 1:
+            raise ValueError("per_controller must be at least 1.")
+        self.per_controller = per_controller
+        self.max_active = max_active
+        self.wipe = wipe or self._wipe
+        self.on_progress = on_progress
+        self.on_finished = on_finished
+        self.progress_interval = progress_interval
+        self.jobs = []
+        self._lock = threading.Lock()
+        self._started = None
+
+    def run(self, jobs):
+        """Wipes every job and blocks until all are done."""
+        self.jobs = list(jobs)
+        targets = [os.path.realpath(job.target) for job in self.jobs]
+        if len(set(targets)) != len(targets):
+            raise ValueError("A drive can only be scheduled once per run.")
+
+        queues = {}
+        for job in self.jobs:
+            if job.controller is None:
+                try:
+                    job.controller = controller_of(job.target)
+                except OSError:
+                    job.controller = f"unknown:{job.target}"  # the wipe itself reports the error
+            queues.setdefault(job.controller, deque()).append(job)
+
+        slots = threading.BoundedSemaphore(self.max_active) if self.max_active else nullcontext()
+        threads = [
+            threading.Thread(target=self._drain, args=(queue, slots), name=f"wipe-{controller}", daemon=True)
+            for controller, queue in queues.items()
+            for _ in range(min(self.per_controller, len(queue)))
+        ]
+        self._started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return StationResult(self.jobs, time.monotonic() - self._started)
+
+    def throughput(self):
+        """Live station throughput: bytes written by all drives so far / time since the run started."""
+        if self._started is None:
+            return 0.0
+        elapsed = time.monotonic() - self._started
+        return sum(job.bytes_done for job in self.jobs) / elapsed if elapsed else 0.0
+
+    def _drain(self, queue, slots):
+        while True:
+            with self._lock:
+                if not queue:
+                    return
+                job = queue.popleft()
+            with slots:
+                self._execute(job)
+
+    def _execute(self, job):
+        job.state, job.started_at = RUNNING, time.monotonic()
+        self._notify(self.on_progress, job)
+
+        def report(progress):
+            job.progress = progress
+            self._notify(self.on_progress, job)
+
+        try:
+            job.result = self.wipe(job, report)
+        except Exception as e:  # one drive failing must not stop the others
+            job.state, job.error = FAILED, str(e) or type(e).__name__
+        else:
+            job.state = SUCCEEDED
+        job.finished_at = time.monotonic()
+        self._notify(self.on_finished, job)
+
+    def _wipe(self, job, report):
+        engine = WipeEngine(progress=report, progress_interval=self.progress_interval, **job.options)
+        return engine.wipe(job.target, job.algorithm, verifier=job.verifier)
+
+    def _notify(self, callback, job):
+        if callback is None:
+            return
+        try:
+            callback(job)
+        except Exception as e:
+            print(f"Wipe scheduler callback failed for {job.target}: {e}")
@@ -0,0 +1,122 @@
+# ddp_wipe/sparse.py
+#
+# Extent discovery and deallocation for sparse-aware wipes.
+#
+# A hole in a sparse file (or image, or thin volume exposed as a file) has no
+# blocks behind it: it reads as zeros and holds no old data, so overwriting
+# it only burns write bandwidth and, on thin storage, allocates space the
+# wipe is meant to leave free. SEEK_DATA/SEEK_HOLE list the extents that do
+# hold data; after the wipe, extents can be handed back with
+# FALLOC_FL_PUNCH_HOLE (files) or BLKDISCARD (block devices), and a
+# free-space wipe's fill can be released from thin storage with FITRIM.
+#
+# Everything degrades safely: where the OS or filesystem cannot report holes
+# the whole target counts as data, and a failed deallocation only means
+# nothing was released.
+
+import errno
+import fcntl
+import os
+import stat
+import struct
+
+SEEK_DATA = getattr(os, 'SEEK_DATA', 3)
+SEEK_HOLE = getattr(os, 'SEEK_HOLE', 4)
+FALLOC_FL_KEEP_SIZE = 0x01
+FALLOC_FL_PUNCH_HOLE = 0x02
+BLKDISCARD = 0x1277  # _IO(0x12, 119)
+FITRIM = 0xC0185879  # _IOWR('X', 121, struct fstrim_range)
+DISCARD_ALIGNMENT = 4096
+
+_libc = None
+
+
+def data_extents(fd, size):
+    """[(offset, length)] of the ranges of the first `size` bytes that hold data, in order."""
+    extents, offset = [], 0
+    try:
+        while offset < size:
+            try:
+                start = os.lseek(fd, offset, SEEK_DATA)
+            except OSError as e:
+                if e.errno == errno.ENXIO:  # no data after `offset`
+                    break
+                raise
+            if start >= size:
+                break
+            end = min(os.lseek(fd, start, SEEK_HOLE), size)
+            extents.append((start, end - start))
+            offset = end
+    except OSError as e:
+        if e.errno in (errno.EINVAL, errno.ENOTSUP, errno.EOPNOTSUPP, errno.ESPIPE):
+            return [(0, size)] if size else []  # holes can't be reported: treat everything as data
+        raise
+    return extents
+
+
+def extent_bytes(extents):
+    return sum(length for _, length in extents)
+
+
+def _fallocate():
+    global _libc
+    import ctypes  # Lazy: ctypes.util alone costs more than the rest of the agent's startup
+    if _libc is None:
+        import ctypes.util
+        name = ctypes.util.find_library('c')
+        _libc = ctypes.CDLL(name, use_errno=True) if name else False
+    if not _libc or not hasattr(_libc, 'fallocate'):
+        return None
+    fallocate = _libc.fallocate
+    fallocate.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_longlong, ctypes.c_longlong]
+    return fallocate
+
+
+def punch_hole(fd, offset, length):
+    """Releases a range of a regular file (size unchanged). Returns True on success."""
+    fallocate = _fallocate()
+    if fallocate is None:
+        return False
+    return fallocate(fd, FALLOC_FL_PUNCH_HOLE | FALLOC_FL_KEEP_SIZE, offset, length) == 0
+
+
+def discard(fd, offset, length):
+    """BLKDISCARD (TRIM/UNMAP) of a block device range, shrunk to 4 KiB alignment. Returns True on success."""
+    start = -(-offset // DISCARD_ALIGNMENT) * DISCARD_ALIGNMENT
+    end = (offset + length) // DISCARD_ALIGNMENT * DISCARD_ALIGNMENT
+    if end <= start:
+        return False
+    try:
+        fcntl.ioctl(fd, BLKDISCARD, struct.pack('QQ', start, end - start))
+    except OSError:
+        return False
+    return True
+
+
+def deallocate(fd, extents):
+    """Punches (files) or discards (block devices) every extent. Returns the bytes released."""
+    mode = os.fstat(fd).st_mode
+    release = discard if stat.S_ISBLK(mode) else punch_hole if stat.S_ISREG(mode) else None
+    if release is None:
+        return 0
+    return sum(length for offset, length in extents if release(fd, offset, length))
+
+
+def fstrim(directory):
+    """FITRIM: discards every free block of the filesystem holding `directory`.
+
+    Returns the bytes the filesystem reports as trimmed, or 0 when it can't
+    (unsupported, or no CAP_SYS_ADMIN).
+    """
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return 0
+    try:
+        arg = bytearray(struct.pack('QQQ', 0, 0xFFFFFFFFFFFFFFFF, 0))
+        fcntl.ioctl(fd, FITRIM, arg)
+        return struct.unpack('QQQ', arg)[1]
+    except OSError:
+        return 0
+    finally:
+        os.close(fd)
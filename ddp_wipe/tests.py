@@ -0,0 +1,520 @@
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+import unittest.mock
+
+from .autotune import TuneCache, tune
+from .cli import build_parser, main as cli_main
+from .engine import ALIGNMENT, WipeEngine, WipeError
+from .outbox import Outbox, OutboxFlusher
+from .sparse import data_extents
+from . import patterns
+from .patterns import ConstantPattern, KeystreamPattern
+from .scheduler import FAILED, SUCCEEDED, DriveJob, WipeScheduler, controller_of
+from .verify import Verifier, sample_size
+
+
+class WipeEngineTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def make_target(self, size):
+        path = os.path.join(self.tmp.name, "target.img")
+        with open(path, 'wb') as f:
+            f.write(b'\xAB' * size)
+        return path
+
+    def test_dod_runs_three_passes_over_unaligned_target(self):
+        size = 3 * 64 * 1024 + 123
+        path = self.make_target(size)
+        seen = []
+
+        result = WipeEngine(block_size=64 * 1024, progress=seen.append, progress_interval=0).wipe(path, 'DOD')
+
+        self.assertEqual([p.label for p in result.passes], ['zeros', 'ones', 'random'])
+        self.assertEqual(result.bytes_written, 3 * size)
+        self.assertEqual(os.path.getsize(path), size)
+        self.assertEqual(seen[-1].bytes_done, seen[-1].bytes_total)
+        self.assertEqual({p.pass_index for p in seen}, {1, 2, 3})
+
+    def test_quick_leaves_zeros(self):
+        path = self.make_target(ALIGNMENT * 5)
+        WipeEngine(block_size=ALIGNMENT * 2, direct=True).wipe(path, 'QUICK')
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), bytes(ALIGNMENT * 5))
+
+    def test_free_space_wipe_removes_fill_file(self):
+        result = WipeEngine(block_size=ALIGNMENT).wipe_free_space(self.tmp.name, 'DOD', limit=ALIGNMENT * 3)
+        self.assertEqual(result.bytes_written, 3 * ALIGNMENT * 3)
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_unknown_algorithm(self):
+        with self.assertRaises(WipeError):
+            WipeEngine().wipe(self.make_target(10), 'ROT13')
+
+    def test_queued_writes_cover_the_whole_target(self):
+        size = 9 * ALIGNMENT + 77
+        path = self.make_target(size)
+        result = WipeEngine(block_size=ALIGNMENT, queue_depth=4).wipe(path, 'DOD')
+        self.assertEqual(result.bytes_written, 3 * size)
+        WipeEngine(block_size=ALIGNMENT, queue_depth=3).wipe(path, 'QUICK')
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), bytes(size))
+
+    def test_queued_free_space_wipe(self):
+        result = WipeEngine(block_size=ALIGNMENT, queue_depth=4).wipe_free_space(self.tmp.name, 'QUICK', limit=ALIGNMENT * 10)
+        self.assertEqual(result.bytes_written, ALIGNMENT * 10)
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+
+class Interrupted(Exception):
+    pass
+
+
+class ResumableWipeTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.journals = os.path.join(self.tmp.name, "journals")
+        self.options = dict(block_size=ALIGNMENT, journal_dir=self.journals,
+                            checkpoint_bytes=8 * ALIGNMENT, checkpoint_seconds=3600)
+
+    def stop_at(self, pass_index, bytes_done, action):
+        def progress(p):
+            if p.pass_index == pass_index and p.bytes_done >= bytes_done:
+                action()
+        return progress
+
+    def test_interrupted_wipe_resumes_from_its_last_checkpoint(self):
+        size = 40 * ALIGNMENT
+        path = os.path.join(self.tmp.name, "target.img")
+        with open(path, 'wb') as f:
+            f.write(b'\xAB' * size)
+
+        def crash():
+            raise Interrupted()
+        engine = WipeEngine(progress=self.stop_at(3, 2 * size + 20 * ALIGNMENT, crash), progress_interval=0, **self.options)
+        with self.assertRaises(Interrupted):
+            engine.wipe(path, 'DOD')
+        self.assertEqual(len(os.listdir(self.journals)), 1)
+
+        result = WipeEngine(**self.options).wipe(path, 'DOD', verifier=Verifier(block_size=ALIGNMENT))
+        self.assertEqual(result.resumed, [[3, 16 * ALIGNMENT]])  # the last checkpoint before the crash
+        self.assertEqual([p.bytes_written for p in result.passes], [size] * 3)
+        self.assertEqual(result.verification.mismatched_blocks, 0)  # resumed with the same keystream seed
+        self.assertIn(f"pass 3 after {16 * ALIGNMENT} bytes", result.summary())
+        self.assertEqual(os.listdir(self.journals), [])
+
+    def test_agent_resumes_without_recalibrating(self):
+        from .agent import WipeAgent
+        size = 40 * ALIGNMENT
+        path = os.path.join(self.tmp.name, "target.img")
+        with open(path, 'wb') as f:
+            f.write(b'\xAB' * size)
+
+        def crash():
+            raise Interrupted()
+        engine = WipeEngine(progress=self.stop_at(2, size + 20 * ALIGNMENT, crash), progress_interval=0,
+                            queue_depth=2, **self.options)
+        with self.assertRaises(Interrupted):
+            engine.wipe(path, 'DOD')
+
+        agent = WipeAgent("TEST", os.path.join(self.tmp.name, "outbox.sqlite3"), verify=False,
+                          tune_cache_path=os.path.join(self.tmp.name, "tune.json"), journal_dir=self.journals,
+                          log=lambda message: None)
+        self.assertEqual(agent.resume_geometry(path), {'block_size': ALIGNMENT, 'queue_depth': 2})
+        with unittest.mock.patch.object(agent, 'tune_geometry', side_effect=AssertionError("calibrated")):
+            result = agent.wipe_drive(DriveJob(target=path, algorithm='DOD'), lambda progress: None)
+        self.assertEqual(result.resumed, [[2, 16 * ALIGNMENT]])
+        self.assertEqual((result.block_size, result.queue_depth), (ALIGNMENT, 2))
+        self.assertIsNone(agent.resume_geometry(path))
+
+    @unittest.skipUnless(hasattr(os, 'fork'), "needs fork() to simulate a crash")
+    def test_free_space_wipe_resumes_after_a_crash(self):
+        target_dir = os.path.join(self.tmp.name, "fs")
+        os.mkdir(target_dir)
+        limit = 40 * ALIGNMENT
+        pid = os.fork()
+        if pid == 0:  # killed mid-pass: no cleanup runs, the fill file and journal stay behind
+            engine = WipeEngine(progress=self.stop_at(2, limit + 30 * ALIGNMENT, lambda: os._exit(1)),
+                                progress_interval=0, **self.options)
+            engine.wipe_free_space(target_dir, 'DOD', limit=limit)
+            os._exit(0)
+        os.waitpid(pid, 0)
+        self.assertEqual(os.listdir(target_dir), ["temp_wipe.dat"])
+
+        result = WipeEngine(**self.options).wipe_free_space(target_dir, 'DOD', limit=limit)
+        self.assertEqual(result.resumed, [[2, 24 * ALIGNMENT]])
+        self.assertEqual([p.bytes_written for p in result.passes], [limit] * 3)
+        self.assertEqual(os.listdir(target_dir), [])
+        self.assertEqual(os.listdir(self.journals), [])
+
+
+class AutotuneTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.target = os.path.join(self.tmp.name, "target.img")
+        with open(self.target, 'wb') as f:
+            f.write(b'\xAB' * 256 * 1024)
+
+    def test_calibrates_once_per_model(self):
+        cache = TuneCache(os.path.join(self.tmp.name, "tune.json"))
+        options = dict(block_sizes=(ALIGNMENT, 16 * ALIGNMENT), queue_depths=(1, 2), sample_bytes=128 * 1024)
+
+        first = tune(self.target, cache=cache, **options)
+        self.assertFalse(first.cached)
+        self.assertEqual(len(first.trials), 4)
+        self.assertIn([first.block_size, first.queue_depth], [t[:2] for t in first.trials])
+
+        with open(self.target, 'r+b') as f:
+            f.write(b'marker')
+        again = tune(self.target, cache=TuneCache(cache.path), **options)  # reloaded from disk
+        self.assertTrue(again.cached)
+        self.assertEqual((again.block_size, again.queue_depth), (first.block_size, first.queue_depth))
+        with open(self.target, 'rb') as f:
+            self.assertEqual(f.read(6), b'marker')  # a cache hit writes nothing
+
+    def test_concurrent_drives_of_one_model_calibrate_once(self):
+        from . import autotune
+        cache = TuneCache(os.path.join(self.tmp.name, "tune.json"))
+        real_calibrate, calls = autotune.calibrate, []
+
+        def slow_calibrate(target, **options):
+            calls.append(target)
+            time.sleep(0.05)
+            return real_calibrate(target, block_sizes=(ALIGNMENT,), queue_depths=(1,), sample_bytes=ALIGNMENT, **options)
+
+        results = []
+        with unittest.mock.patch.object(autotune, 'calibrate', slow_calibrate):
+            threads = [threading.Thread(target=lambda: results.append(tune(self.target, cache=cache, model="same")))
+                       for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(g.cached for g in results), [False, True, True, True])
+
+
+class WipeSchedulerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def make_target(self, name, size):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'wb') as f:
+            f.write(b'\xAB' * size)
+        return path
+
+    def test_caps_concurrency_per_controller(self):
+        lock = threading.Lock()
+        active, peaks = {}, {}
+
+        def wipe(job, report):
+            with lock:
+                active[job.controller] = active.get(job.controller, 0) + 1
+                peaks[job.controller] = max(peaks.get(job.controller, 0), active[job.controller])
+                peaks['station'] = max(peaks.get('station', 0), sum(active.values()))
+            time.sleep(0.05)
+            with lock:
+                active[job.controller] -= 1
+
+        jobs = [DriveJob(target=f"/dev/bay{i}", controller='hba0' if i < 4 else 'nvme0') for i in range(6)]
+        WipeScheduler(per_controller=2, wipe=wipe).run(jobs)
+        self.assertEqual(peaks, {'hba0': 2, 'nvme0': 2, 'station': 4})
+        self.assertTrue(all(job.state == SUCCEEDED for job in jobs))
+
+        peaks.clear()
+        WipeScheduler(per_controller=2, max_active=3, wipe=wipe).run(jobs)
+        self.assertEqual(peaks['station'], 3)
+
+    def test_each_drive_gets_its_own_result_and_failures_stay_isolated(self):
+        sizes = {'bay0.img': 5 * ALIGNMENT, 'bay1.img': 3 * ALIGNMENT + 9}
+        jobs = [DriveJob(target=self.make_target(name, size), algorithm='DOD', options={'block_size': ALIGNMENT})
+                for name, size in sizes.items()]
+        jobs.append(DriveJob(target=os.path.join(self.tmp.name, "missing.img"), controller='usb0'))
+        finished = []
+
+        station = WipeScheduler(per_controller=1, on_finished=finished.append, progress_interval=0).run(jobs)
+
+        self.assertEqual(jobs[0].controller, controller_of(jobs[1].target))  # same filesystem, same queue
+        self.assertEqual([job.state for job in jobs], [SUCCEEDED, SUCCEEDED, FAILED])
+        self.assertIn("missing.img", jobs[2].error)
+        self.assertEqual([job.result.bytes_written for job in jobs[:2]], [3 * size for size in sizes.values()])
+        self.assertEqual(sorted(finished, key=jobs.index), jobs)
+        self.assertEqual(station.bytes_written, 3 * sum(sizes.values()))
+        self.assertIn("2 wiped, 1 failed", station.summary())
+
+    def test_a_drive_cannot_be_scheduled_twice(self):
+        with self.assertRaises(ValueError):
+            WipeScheduler().run([DriveJob(target="/dev/sdb"), DriveJob(target="/dev/sdb")])
+
+
+class KeystreamPatternTests(unittest.TestCase):
+
+    def check_random_access(self, generator):
+        pattern = KeystreamPattern(generator=generator)
+        whole = bytearray(200 * 1024)
+        pattern.fill(whole, 4096)
+        again = KeystreamPattern(pattern.seed_hex, generator)  # regenerated from the recorded seed
+        for offset, n in ((4096, 10), (4096 + 70, 65 * 1024), (4096 + 65535, 3), (4096 + 150 * 1024, 50 * 1024)):
+            part = bytearray(n)
+            again.fill(part, offset)
+            self.assertEqual(part, whole[offset - 4096:offset - 4096 + n])
+        other = bytearray(len(whole))
+        KeystreamPattern(generator=generator).fill(other, 4096)
+        self.assertNotEqual(other, whole)
+
+    @unittest.skipIf(patterns._chacha20() is None, "cryptography is not installed")
+    def test_chacha20_keystream_is_random_access(self):
+        self.check_random_access('chacha20')
+        pattern = KeystreamPattern(generator='chacha20')
+        across, tail = bytearray(256), bytearray(128)
+        pattern.fill(across, patterns.CHACHA_STRIPE - 128)
+        pattern.fill(tail, patterns.CHACHA_STRIPE)
+        self.assertEqual(across[128:], tail)
+
+    def test_shake128_keystream_is_random_access(self):
+        self.check_random_access('shake128')
+
+
+class VerifierTests(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "target.img")
+        with open(self.path, 'wb') as f:
+            f.write(bytes(64 * ALIGNMENT))
+
+    def corrupt_block(self, index):
+        with open(self.path, 'r+b') as f:
+            f.seek(index * ALIGNMENT + 17)
+            f.write(b'residue')
+
+    def test_full_read_back_counts_mismatched_blocks(self):
+        self.assertEqual(Verifier(block_size=ALIGNMENT).verify(self.path, ConstantPattern(0)).mismatched_blocks, 0)
+        self.corrupt_block(40)
+        result = Verifier(block_size=ALIGNMENT).verify(self.path, ConstantPattern(0))
+        self.assertEqual((result.mode, result.mismatched_blocks, result.coverage), ('full', 1, 1.0))
+
+    def test_sampled_read_back_reads_a_subset(self):
+        verifier = Verifier(block_size=ALIGNMENT, confidence=0.9, defect_rate=0.2, seed=7)
+        result = verifier.verify(self.path, ConstantPattern(0))
+        self.assertEqual(result.mode, 'sample')
+        self.assertLessEqual(result.blocks_checked, sample_size(0.9, 0.2) + 2)
+        self.assertLess(result.coverage, 0.25)
+        self.assertEqual(result.digest, verifier.verify(self.path, ConstantPattern(0)).digest)
+
+    def test_random_pass_is_verified_against_its_recorded_seed(self):
+        result = WipeEngine(block_size=ALIGNMENT).wipe(self.path, 'NIST', verifier=Verifier(block_size=ALIGNMENT))
+        seed = result.passes[0].seed
+        self.assertEqual(result.verification.mismatched_blocks, 0)
+        self.assertIn(f"seed {seed}", result.summary())
+
+        self.corrupt_block(9)
+        pattern = KeystreamPattern(seed, result.passes[0].generator)
+        self.assertEqual(Verifier(block_size=ALIGNMENT).verify(self.path, pattern).mismatched_blocks, 1)
+
+    def test_engine_runs_verifier_after_last_pass(self):
+        result = WipeEngine(block_size=ALIGNMENT).wipe(self.path, 'DOD', verifier=Verifier(block_size=ALIGNMENT))
+        self.assertEqual(result.verification.blocks_checked, 64)
+        self.assertIn("Verification (full)", result.summary())
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self._body = body
+
+    def json(self):
+        return self._body
+
+
+class FakeHub:
+    """Stands in for requests.Session: answers like /mint/batch/, or fails while offline."""
+
+    def __init__(self):
+        self.online = False
+        self.requests = []
+
+    def post(self, url, json, timeout):
+        if not self.online:
+            raise ConnectionError("hub unreachable")
+        self.requests.append(json)
+        results = [{"index": i, "status": 409, "same_payload": cert.get('resent', False)}
+                   if cert['imei_serial'].startswith("DUP") else {"index": i, "status": 201}
+                   for i, cert in enumerate(json)]
+        return FakeResponse(207, {"results": results})
+
+
+class OutboxTests(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "outbox.sqlite3")
+        self.outbox = Outbox(self.path)
+        self.addCleanup(self.outbox.close)
+
+    def test_offline_certificates_survive_and_sync_in_batches(self):
+        hub = FakeHub()
+        flusher = OutboxFlusher(self.outbox, "http://hub/api/v1/mint/batch/", batch_size=4, session=hub, log=lambda m: None)
+        for i in range(9):
+            self.outbox.enqueue({"imei_serial": f"DEV-{i}"})
+        self.outbox.enqueue({"imei_serial": "DUP"})
+        self.outbox.enqueue({"imei_serial": "FAILED-WIPE"}, sync=False)
+
+        with self.assertRaises(ConnectionError):
+            flusher.flush_once()
+        self.outbox.close()
+        self.outbox = Outbox(self.path)  # agent restarted while offline: nothing lost
+        flusher.outbox = self.outbox
+        self.assertEqual(self.outbox.counts(), {"pending": 10, "sent": 0})
+
+        hub.online = True
+        while flusher.flush_once():
+            pass
+        self.assertEqual([len(batch) for batch in hub.requests], [4, 4, 2])
+        self.assertEqual(self.outbox.counts(), {"pending": 0, "sent": 10})
+
+    def test_conflicting_certificate_is_not_taken_as_delivered(self):
+        hub, logged = FakeHub(), []
+        hub.online = True
+        flusher = OutboxFlusher(self.outbox, "http://hub/api/v1/mint/batch/", session=hub, log=logged.append)
+        self.outbox.enqueue({"imei_serial": "DUP-RESENT", "resent": True})
+        self.outbox.enqueue({"imei_serial": "DUP-OTHER-DRIVE"})
+        flusher.flush_once()
+        errors = self.outbox._db.execute("SELECT imei_serial, last_error FROM certificates ORDER BY id").fetchall()
+        self.assertIsNone(errors[0][1])
+        self.assertTrue(errors[1][1].startswith("conflict"))
+        self.assertIn("DUP-OTHER-DRIVE", logged[0])
+
+
+class FreeSpaceTrimTests(unittest.TestCase):
+
+    def test_trim_is_reported_apart_from_sparse(self):
+        with tempfile.TemporaryDirectory() as directory:
+            result = WipeEngine(block_size=ALIGNMENT).wipe_free_space(directory, 'QUICK', limit=4 * ALIGNMENT,
+                                                                       deallocate=True)
+        self.assertTrue(result.trimmed)
+        self.assertFalse(result.sparse)
+        self.assertIn("FITRIM", result.summary())
+        self.assertNotIn("Sparse", result.summary())
+
+
+class SparseWipeTests(unittest.TestCase):
+
+    SIZE = 1024 * 1024
+    DATA = [(0, 2 * ALIGNMENT), (512 * 1024, 3 * ALIGNMENT)]
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "sparse.img")
+        with open(self.path, 'wb') as f:
+            f.truncate(self.SIZE)
+            for offset, length in self.DATA:
+                f.seek(offset)
+                f.write(b'\xAB' * length)
+        if self.extents() != self.DATA:
+            self.skipTest("filesystem does not report holes")
+
+    def extents(self):
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            return data_extents(fd, self.SIZE)
+        finally:
+            os.close(fd)
+
+    def test_only_mapped_extents_are_overwritten(self):
+        mapped = sum(length for _, length in self.DATA)
+        result = WipeEngine(block_size=ALIGNMENT, queue_depth=2).wipe(
+            self.path, 'DOD', sparse=True, verifier=Verifier(block_size=ALIGNMENT))
+
+        self.assertEqual([p.bytes_written for p in result.passes], [mapped] * 3)
+        self.assertEqual(result.skipped_bytes, self.SIZE - mapped)
+        self.assertEqual(self.extents(), self.DATA)  # holes stayed holes
+        self.assertEqual(result.verification.size, mapped)
+        self.assertIn(f"{self.SIZE - mapped} unmapped bytes skipped", result.summary())
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        self.assertNotIn(b'\xAB' * 16, data)
+
+    def test_deallocate_punches_the_wiped_extents(self):
+        result = WipeEngine(block_size=ALIGNMENT).wipe(self.path, 'QUICK', sparse=True, deallocate=True)
+        if result.deallocated_bytes:
+            self.assertEqual(self.extents(), [])
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), bytes(self.SIZE))
+
+    def test_cli_sparse_wipe_leaves_holes_alone(self):
+        outbox_path = os.path.join(self.tmp.name, "outbox.sqlite3")
+        status = cli_main([self.path, '--sparse', '--yes', '--no-tune', '--outbox', outbox_path,
+                           '--journal-dir', self.tmp.name], stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(status, 0)
+        self.assertEqual(self.extents(), self.DATA)
+        outbox = Outbox(outbox_path)
+        self.addCleanup(outbox.close)
+        (_, cert), = outbox.pending(1)
+        self.assertIn("unmapped bytes skipped", cert['verification_log'])
+
+
+class HeadlessCliTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_wipes_certifies_and_reports_json_lines(self):
+        targets = []
+        for name in ("a.img", "b.img"):
+            targets.append(os.path.join(self.tmp.name, name))
+            with open(targets[-1], 'wb') as f:
+                f.write(b'\xAB' * 200000)
+        outbox_path = os.path.join(self.tmp.name, "outbox.sqlite3")
+        stdout, stderr = io.StringIO(), io.StringIO()
+
+        status = cli_main(targets + ['--algorithm', 'DOD', '--yes', '--no-tune', '--outbox', outbox_path,
+                                     '--journal-dir', self.tmp.name, '--progress-interval', '0'],
+                          stdout=stdout, stderr=stderr)
+
+        self.assertEqual(status, 0)
+        events = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual(events[0]['event'], 'start')
+        self.assertEqual(events[-1]['event'], 'station')
+        drives = [e for e in events if e['event'] == 'drive']
+        self.assertEqual(sorted(e['target'] for e in drives), targets)
+        self.assertTrue(all(e['certified'] and e['state'] == SUCCEEDED for e in drives))
+        self.assertIn('progress', {e['event'] for e in events})
+        outbox = Outbox(outbox_path)
+        self.addCleanup(outbox.close)
+        self.assertEqual(outbox.counts()['pending'], 2)
+        for target in targets:
+            with open(target, 'rb') as f:
+                self.assertNotIn(b'\xAB' * 16, f.read())
+
+    def test_default_device_id_is_new_every_run(self):
+        first, second = (build_parser().parse_args(['/dev/sdb']).device_id for _ in range(2))
+        self.assertNotEqual(first, second)
+        self.assertLessEqual(len(f"{first}-sdb"), 50)  # fits the hub's imei_serial
+
+    def test_refuses_to_wipe_without_confirmation(self):
+        target = os.path.join(self.tmp.name, "c.img")
+        with open(target, 'wb') as f:
+            f.write(b'\xAB' * 4096)
+        with self.assertRaises(SystemExit), unittest.mock.patch('sys.stderr', io.StringIO()):
+            cli_main([target], stdout=io.StringIO())
+        with open(target, 'rb') as f:
+            self.assertEqual(f.read(), b'\xAB' * 4096)
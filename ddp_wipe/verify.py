@@ -0,0 +1,182 @@
+# ddp_wipe/verify.py
+#
+# Read-back verification of a wiped target.
+#
+# Either every block or a random sample of blocks is read back into one reused
+# buffer and compared against the pattern of the final pass. A full read-back
+# doubles wipe time, so the default is a sample sized from a confidence level:
+# with k blocks drawn at random, a target where at least `defect_rate` of the
+# blocks were left unwiped is caught with probability 1 - (1 - defect_rate)**k,
+# whatever the size of the drive.
+
+import hashlib
+import math
+import mmap
+import os
+import random
+import time
+from bisect import bisect_right
+from dataclasses import dataclass
+
+DEFAULT_VERIFY_BLOCK_SIZE = 1024 * 1024
+
+_numpy = None
+
+
+def _np():
+    """NumPy if installed (vectorized compare), else False. Imported lazily to keep startup fast."""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy
+
+
+def sample_size(confidence, defect_rate):
+    """Blocks to sample so a `defect_rate` fraction of bad blocks is seen with `confidence`."""
+    if not 0 < confidence < 1 or not 0 < defect_rate < 1:
+        raise ValueError("confidence and defect_rate must be between 0 and 1")
+    return math.ceil(math.log(1 - confidence) / math.log(1 - defect_rate))
+
+
+def blocks_equal(actual, expected):
+    """True when two equal-length buffers hold the same bytes."""
+    np = _np()
+    if np and len(actual) % 8 == 0:
+        return bool(np.array_equal(np.frombuffer(actual, dtype=np.uint64), np.frombuffer(expected, dtype=np.uint64)))
+    return actual == expected  # memoryview comparison runs in C without copying
+
+
+@dataclass
+class VerificationResult:
+    mode: str  # 'full' or 'sample'
+    block_size: int
+    blocks_total: int
+    blocks_checked: int
+    bytes_checked: int
+    size: int  # bytes the checked blocks are drawn from (data extents only, for a sparse wipe)
+    mismatched_blocks: object  # int, or None when the pattern can't be regenerated
+    digest: str  # SHA-256 over (offset, bytes) of every block read, in offset order
+    seconds: float
+
+    @property
+    def coverage(self):
+        return self.bytes_checked / self.size if self.size else 1.0
+
+    @property
+    def passed(self):
+        return self.mismatched_blocks == 0
+
+    def summary(self):
+        if self.mismatched_blocks is None:
+            outcome = "pattern not reproducible, digest only"
+        else:
+            outcome = f"{self.mismatched_blocks} mismatched block(s)"
+        return (f"Verification ({self.mode}): {self.blocks_checked}/{self.blocks_total} blocks, "
+                f"{self.coverage:.2%} coverage, {outcome}, digest {self.digest[:16]}...")
+
+
+class Verifier:
+    """Reads back a target (fully or sampled) and compares it with the expected pattern.
+
+    `confidence`/`defect_rate` select sampled mode; leave `confidence` as None
+    for a full read-back. `seed` makes the sample reproducible.
+    """
+
+    def __init__(self, block_size=DEFAULT_VERIFY_BLOCK_SIZE, confidence=None, defect_rate=0.0001, seed=None):
+        self.block_size = block_size
+        self.confidence = confidence
+        self.defect_rate = defect_rate
+        self.seed = seed
+
+    def _blocks(self, size, extents):
+        """(mode, blocks_total, [(offset, length), ...]) of the blocks to read back.
+
+        Blocks are cut per extent, so a sparse target is only sampled where it
+        holds data; without `extents` the whole target is one extent.
+        """
+        extents = [(0, size)] if extents is None else extents
+        firsts, blocks_total = [], 0  # index of each extent's first block
+        for _, length in extents:
+            firsts.append(blocks_total)
+            blocks_total += -(-length // self.block_size)
+
+        def block(i):
+            e = bisect_right(firsts, i) - 1
+            start, length = extents[e]
+            offset = start + (i - firsts[e]) * self.block_size
+            return offset, min(self.block_size, start + length - offset)
+
+        k = blocks_total if self.confidence is None else sample_size(self.confidence, self.defect_rate)
+        if k >= blocks_total:
+            return 'full', blocks_total, (block(i) for i in range(blocks_total))
+        picked = set(random.Random(self.seed).sample(range(blocks_total), k))
+        picked.update((0, blocks_total - 1))  # always check both ends of the target
+        return 'sample', blocks_total, (block(i) for i in sorted(picked))  # sorted: read in one forward sweep
+
+    def verify(self, target, pattern, length=None, extents=None):
+        """Reads `target` back and compares it with `pattern` (the final pass's pattern source).
+
+        `extents` ([(offset, length)], e.g. from a sparse wipe) limits the read-back to those ranges.
+        """
+        started = time.perf_counter()
+        reproducible = getattr(pattern, 'reproducible', False)
+        actual_buffer = mmap.mmap(-1, self.block_size)
+        expected_buffer = mmap.mmap(-1, self.block_size)
+        actual, expected = memoryview(actual_buffer), memoryview(expected_buffer)
+        digest = hashlib.sha256()
+        mismatches = blocks_checked = bytes_checked = 0
+        read_view = expected_view = None
+
+        try:
+            with open(target, 'rb', buffering=0) as f:
+                size = length if length is not None else f.seek(0, os.SEEK_END)
+                if hasattr(os, 'posix_fadvise'):
+                    # Drop cached pages so the read-back comes from the media, not from RAM
+                    os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+                mode, blocks_total, blocks = self._blocks(size, extents)
+                if reproducible and pattern.constant:
+                    pattern.fill(expected)
+
+                for offset, n in blocks:
+                    read_view = actual if n == self.block_size else actual[:n]
+                    f.seek(offset)
+                    got = 0
+                    while got < n:
+                        chunk = f.readinto(read_view[got:])
+                        if not chunk:
+                            break
+                        got += chunk
+
+                    digest.update(offset.to_bytes(8, 'little'))
+                    digest.update(read_view[:got])
+                    blocks_checked += 1
+                    bytes_checked += got
+
+                    if reproducible:
+                        expected_view = expected if n == self.block_size else expected[:n]
+                        if not pattern.constant:
+                            pattern.fill(expected_view, offset)
+                        if got != n or not blocks_equal(read_view, expected_view):
+                            mismatches += 1
+        finally:
+            read_view = expected_view = None
+            actual.release()
+            expected.release()
+            actual_buffer.close()
+            expected_buffer.close()
+
+        return VerificationResult(
+            mode=mode,
+            block_size=self.block_size,
+            blocks_total=blocks_total,
+            blocks_checked=blocks_checked,
+            bytes_checked=bytes_checked,
+            size=size if extents is None else sum(length for _, length in extents),
+            mismatched_blocks=mismatches if reproducible else None,
+            digest=digest.hexdigest(),
+            seconds=time.perf_counter() - started,
+        )
@@ -2,6 +2,8 @@
 ASGI config for device_passport_hub project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Run the hub through it (e.g. ``uvicorn device_passport_hub.asgi:application``)
+so wipe progress streams are served from the event loop.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
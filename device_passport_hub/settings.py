@@ -34,6 +34,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     # CORS Middleware must be first
     'corsheaders.middleware.CorsMiddleware', 
+    'core_passport.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,13 +63,33 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'device_passport_hub.wsgi.application'
+# Serve through ASGI (e.g. `uvicorn device_passport_hub.asgi:application`) so wipe
+# progress streams (/api/v1/jobs/<id>/stream/) don't tie up a thread per watcher
+ASGI_APPLICATION = 'device_passport_hub.asgi.application'
 
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # WAL: readers never block the writer; NORMAL is durable in WAL mode bar an OS crash
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+            # Take the write lock at BEGIN so a transaction never fails to upgrade mid-way
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,  # seconds to wait for the write lock before "database is locked"
+        },
+    }
+}
+
+# Rendered passport pages are cached here (core_passport/cache.py). With more than
+# one hub process use a shared backend (Redis/Memcached) so invalidation reaches all.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+DDP_DETAIL_CACHE_TIMEOUT = 3600  # seconds
+DDP_DETAIL_EVENTS_PAGE = 20  # events rendered server-side; the rest load from the events API
 
 # ... (Password validation settings remain unchanged)
 
@@ -96,4 +117,54 @@ REST_FRAMEWORK = {
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
     ],
-}
\ No newline at end of file
+}
+
+# Upper bound on items accepted by /api/v1/mint/batch/ in one request
+DDP_MINT_BATCH_MAX = 1000
+
+# /api/v1/events/ingest/: events per lookup + bulk insert, and error lines echoed back
+DDP_EVENT_INGEST_CHUNK = 1000
+DDP_EVENT_INGEST_MAX_ERRORS = 100
+
+# Wipe engine I/O geometry for local-wipe-and-mint (block size must be a multiple of 4096)
+DDP_WIPE_BLOCK_SIZE = 4 * 1024 * 1024
+DDP_WIPE_DIRECT_IO = False
+# Writes kept in flight per wipe (1 = synchronous); ddp_wipe/autotune.py measures the best value per drive
+DDP_WIPE_QUEUE_DEPTH = 1
+# Trim the freed space after a free-space wipe (FITRIM) so thin/TRIM storage isn't left fully allocated
+DDP_WIPE_DEALLOCATE = False
+# Checkpoint journals of running wipes: after a crash, `manage.py resume_wipe_jobs` continues from the
+# last checkpoint. Each checkpoint costs two fsyncs; one is taken per this many bytes or seconds.
+DDP_WIPE_JOURNAL_DIR = BASE_DIR / 'wipe_journals'
+DDP_WIPE_CHECKPOINT_BYTES = 1024 * 1024 * 1024
+DDP_WIPE_CHECKPOINT_SECONDS = 30.0
+
+# Background wipe jobs (core_passport/jobs.py)
+DDP_WIPE_WORKERS = 2  # concurrent wipes per hub process
+DDP_WIPE_MAX_ACTIVE_JOBS = 8  # queued + running; further requests get 503
+DDP_WIPE_PROGRESS_INTERVAL = 1.0  # seconds between progress writes
+DDP_WIPE_FREE_SPACE_LIMIT = None  # bytes; None fills the disk
+DDP_WIPE_JOBS_EAGER = False  # run jobs inline (tests/debugging)
+DDP_SSE_KEEPALIVE = 15.0  # seconds between stream frames when no progress arrives
+
+# Read-back verification after each hub wipe (ddp_wipe/verify.py):
+# 'sample' reads enough random blocks to catch DDP_VERIFY_DEFECT_RATE unwiped
+# blocks with DDP_VERIFY_CONFIDENCE; 'full' reads everything; 'off' skips it.
+DDP_VERIFY_MODE = 'sample'
+DDP_VERIFY_CONFIDENCE = 0.999
+DDP_VERIFY_DEFECT_RATE = 0.0001
+
+# Per-route latency / query metrics, exposed in Prometheus format at /metrics
+DDP_METRICS_ENABLED = True
+
+# Single mints arriving within this window (seconds) are committed together (core_passport/coalescer.py); 0 disables
+DDP_MINT_COALESCE_WINDOW = 0.002
+DDP_MINT_COALESCE_MAX = 200
+
+# Idempotency-Key replay window for /api/v1/mint/ (seconds) and how often expired keys are evicted
+DDP_IDEMPOTENCY_TTL = 24 * 3600
+DDP_IDEMPOTENCY_PURGE_INTERVAL = 300
+
+# Ed25519 key that signs every minted passport (needs `cryptography`; create it with
+# `manage.py generate_signing_key`). Without it passports are minted unsigned.
+DDP_SIGNING_KEY_PATH = BASE_DIR / 'ddp_signing_key.pem'
\ No newline at end of file
@@ -3,9 +3,14 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from core_passport.views import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     
     # This line connects your API app under the /api/v1/ prefix
     path('api/v1/', include('core_passport.urls')), 
+
+    # Prometheus scrape target (per-process metrics)
+    path('metrics', metrics_view, name='metrics'),
 ]
\ No newline at end of file